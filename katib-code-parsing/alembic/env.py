@@ -1,4 +1,5 @@
 import asyncio
+import os
 from logging.config import fileConfig
 
 from alembic import context
@@ -13,6 +14,11 @@ from app.models.parsing_result import Base as ParsingResultBase
 # access to the values within the .ini file in use.
 config = context.config
 
+# DATABASE_URL (as used by the application) overrides sqlalchemy.url
+if os.getenv("DATABASE_URL"):
+    # (escaped for the ini interpolation, as URL-encoded passwords contain "%")
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"].replace("%", "%%"))
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
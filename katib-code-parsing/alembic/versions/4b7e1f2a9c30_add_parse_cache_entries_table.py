@@ -0,0 +1,51 @@
+"""Add parse_cache_entries table
+
+Revision ID: 4b7e1f2a9c30
+Revises: 29d4644d3908
+Create Date: 2026-10-18 10:02:11.418203
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e1f2a9c30'
+down_revision: Union[str, Sequence[str], None] = '29d4644d3908'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'parse_cache_entries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('code_hash', sa.String(length=64), nullable=False),
+        sa.Column('model_name', sa.String(), nullable=False),
+        sa.Column('prompt_version', sa.String(), nullable=False),
+        sa.Column('content', sa.JSON(), nullable=False),
+        sa.Column('hit_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_hit_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_parse_cache_entries_id'), 'parse_cache_entries', ['id'], unique=False)
+    op.create_index(
+        op.f('ix_parse_cache_entries_cache_key'), 'parse_cache_entries', ['cache_key'], unique=True
+    )
+    op.create_index(
+        op.f('ix_parse_cache_entries_code_hash'), 'parse_cache_entries', ['code_hash'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_parse_cache_entries_code_hash'), table_name='parse_cache_entries')
+    op.drop_index(op.f('ix_parse_cache_entries_cache_key'), table_name='parse_cache_entries')
+    op.drop_index(op.f('ix_parse_cache_entries_id'), table_name='parse_cache_entries')
+    op.drop_table('parse_cache_entries')
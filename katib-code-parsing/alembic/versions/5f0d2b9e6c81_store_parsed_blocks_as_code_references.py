@@ -0,0 +1,186 @@
+"""Store parsed blocks as code references
+
+Revision ID: 5f0d2b9e6c81
+Revises: e71b4c08a5f3
+Create Date: 2026-10-18 16:48:05.771932
+
+"""
+
+import itertools
+import json
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '5f0d2b9e6c81'
+down_revision: Union[str, Sequence[str], None] = 'e71b4c08a5f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+parsing_result_versions = sa.table(
+    'parsing_result_versions',
+    sa.column('id', sa.Integer()),
+    sa.column('parsing_result_id', sa.Integer()),
+    sa.column('content', sa.JSON()),
+)
+parsing_results = sa.table(
+    'parsing_results',
+    sa.column('id', sa.Integer()),
+    sa.column('code_version_id', sa.Integer()),
+)
+code_versions = sa.table(
+    'code_versions',
+    sa.column('id', sa.Integer()),
+    sa.column('content', sa.Text()),
+)
+
+# A frozen copy of the block reference format of app.services.block_refs at this
+# revision, so that later changes to the application do not change the migration.
+# A block is stored as {"segments": [...]}, each segment either a [start_line,
+# start_column, end_line, end_column] range into the code version or literal text.
+BLOCK_KEYS = ("parameter", "model_block", "data_block")
+SEGMENTS = "segments"
+
+Segment = Union[List[int], str]
+
+
+class _LineIndex:
+    def __init__(self, code_content: str) -> None:
+        self.lines = code_content.split("\n")
+        self.starts = list(itertools.accumulate((len(line) + 1 for line in self.lines[:-1]), initial=0))
+        self.by_text: Dict[str, List[int]] = {}
+        self.by_dedented: Dict[str, List[int]] = {}
+        for number, line in enumerate(self.lines, start=1):
+            self.by_text.setdefault(line, []).append(number)
+            dedented = line.lstrip()
+            if dedented != line:
+                self.by_dedented.setdefault(dedented, []).append(number)
+
+    def offset(self, line: int, column: int) -> int:
+        return self.starts[line - 1] + column
+
+
+def _longest_run(index: _LineIndex, text_lines: List[str], first: int, after: int) -> Optional[Tuple[List[int], int]]:
+    text = text_lines[first]
+    candidates = [(number, 0) for number in index.by_text.get(text, [])]
+    candidates += [(number, len(index.lines[number - 1]) - len(text)) for number in index.by_dedented.get(text, [])]
+    candidates.sort(key=lambda candidate: (candidate[0] < after, candidate[0]))
+
+    best: Optional[Tuple[List[int], int]] = None
+    for number, column in candidates:
+        length, end_column = 1, len(index.lines[number - 1])
+        while first + length < len(text_lines) and number + length <= len(index.lines):
+            text_line, code_line = text_lines[first + length], index.lines[number + length - 1]
+            if text_line == code_line:
+                length, end_column = length + 1, len(code_line)
+                continue
+            if text_line and code_line.startswith(text_line):
+                length, end_column = length + 1, len(text_line)
+            break
+        if best is None or length > best[1]:
+            best = [number, column, number + length - 1, end_column], length
+            if first + length == len(text_lines):
+                break
+    return best
+
+
+def _encode_block(text: str, index: _LineIndex) -> Optional[List[Segment]]:
+    text_lines = text.split("\n")
+    segments: List[Segment] = []
+    literal = ""
+    line, after = 0, 1
+    while line < len(text_lines):
+        run = _longest_run(index, text_lines, line, after) if text_lines[line] else None
+        if run is None:
+            literal += text_lines[line]
+            line += 1
+        else:
+            if literal:
+                segments.append(literal)
+            segments.append(run[0])
+            literal = ""
+            after = run[0][2]
+            line += run[1]
+        if line < len(text_lines):
+            literal += "\n"
+    if literal:
+        segments.append(literal)
+
+    if len(json.dumps(segments)) >= len(json.dumps(text)):
+        return None
+    return segments
+
+
+def _decode_block(segments: List[Segment], code_content: str, index: _LineIndex) -> str:
+    parts = []
+    for segment in segments:
+        if isinstance(segment, str):
+            parts.append(segment)
+        else:
+            start_line, start_column, end_line, end_column = segment
+            parts.append(code_content[index.offset(start_line, start_column) : index.offset(end_line, end_column)])
+    return "".join(parts)
+
+
+def _is_block_ref(value: object) -> bool:
+    return isinstance(value, dict) and isinstance(value.get(SEGMENTS), list)
+
+
+def compact_blocks(content: dict, code_content: str) -> dict:
+    compacted = dict(content)
+    index = _LineIndex(code_content)
+    for key in BLOCK_KEYS:
+        text = compacted.get(key)
+        if not isinstance(text, str) or not text:
+            continue
+        segments = _encode_block(text, index)
+        if segments is not None and _decode_block(segments, code_content, index) == text:
+            compacted[key] = {SEGMENTS: segments}
+    return compacted
+
+
+def inline_blocks(content: dict, code_content: str) -> dict:
+    if not any(_is_block_ref(content.get(key)) for key in BLOCK_KEYS):
+        return content
+    inlined = dict(content)
+    index = _LineIndex(code_content)
+    for key in BLOCK_KEYS:
+        if _is_block_ref(inlined.get(key)):
+            inlined[key] = _decode_block(inlined[key][SEGMENTS], code_content, index)
+    return inlined
+
+
+def _rewrite_contents(rewrite) -> None:
+    # Rewrites the content of every parsing result version with the code it was parsed from
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(parsing_result_versions.c.id, parsing_result_versions.c.content, code_versions.c.content)
+        .select_from(
+            parsing_result_versions.join(
+                parsing_results, parsing_results.c.id == parsing_result_versions.c.parsing_result_id
+            ).join(code_versions, code_versions.c.id == parsing_results.c.code_version_id)
+        )
+    ).all()
+    for version_id, content, code_content in rows:
+        if not isinstance(content, dict):
+            continue
+        rewritten = rewrite(content, code_content)
+        if rewritten != content:
+            bind.execute(
+                parsing_result_versions.update()
+                .where(parsing_result_versions.c.id == version_id)
+                .values(content=rewritten)
+            )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _rewrite_contents(compact_blocks)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _rewrite_contents(inline_blocks)
@@ -0,0 +1,55 @@
+"""Add parse_jobs table
+
+Revision ID: 8d2f6a1c4e57
+Revises: 4b7e1f2a9c30
+Create Date: 2026-10-18 11:24:37.205914
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2f6a1c4e57'
+down_revision: Union[str, Sequence[str], None] = '4b7e1f2a9c30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'parse_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('code_version_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('lease_owner', sa.String(), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('parsing_result_id', sa.Integer(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ['code_version_id'],
+            ['code_versions.id'],
+        ),
+        sa.ForeignKeyConstraint(
+            ['parsing_result_id'],
+            ['parsing_results.id'],
+        ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_parse_jobs_id'), 'parse_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_parse_jobs_status'), 'parse_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_parse_jobs_status'), table_name='parse_jobs')
+    op.drop_index(op.f('ix_parse_jobs_id'), table_name='parse_jobs')
+    op.drop_table('parse_jobs')
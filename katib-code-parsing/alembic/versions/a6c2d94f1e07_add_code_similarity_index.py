@@ -0,0 +1,128 @@
+"""Add code similarity (MinHash/LSH) index
+
+Revision ID: a6c2d94f1e07
+Revises: 5f0d2b9e6c81
+Create Date: 2026-10-18 18:21:37.402196
+
+"""
+
+import hashlib
+import keyword
+import random
+import re
+from typing import List, Sequence, Set, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c2d94f1e07'
+down_revision: Union[str, Sequence[str], None] = '5f0d2b9e6c81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+code_versions = sa.table(
+    'code_versions',
+    sa.column('id', sa.Integer()),
+    sa.column('content', sa.Text()),
+)
+
+# A frozen copy of the signatures of app.services.minhash at this revision, so
+# that later changes to the application do not change the migration.
+SHINGLE_SIZE = 5
+LSH_BANDS = 16
+LSH_ROWS = 4
+NUM_PERMUTATIONS = LSH_BANDS * LSH_ROWS
+
+CODE_TOKEN_PATTERN = re.compile(
+    r"#[^\n]*"
+    r"|[rbfuRBFU]{0,2}(?:'''.*?'''|\"\"\".*?\"\"\"|'(?:\\.|[^'\\\n])*'|\"(?:\\.|[^\"\\\n])*\")"
+    r"|[A-Za-z_]\w*"
+    r"|\d[\w.]*"
+    r"|[^\w\s]",
+    re.DOTALL,
+)
+
+MERSENNE_PRIME = (1 << 61) - 1
+_random = random.Random(20261018)
+PERMUTATIONS = [(_random.randrange(1, MERSENNE_PRIME), _random.randrange(MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+
+def _code_tokens(code_content: str) -> List[str]:
+    tokens: List[str] = []
+    for token in CODE_TOKEN_PATTERN.findall(code_content):
+        if token.startswith("#"):
+            continue
+        if token[0].isdigit():
+            tokens.append("0")
+        elif token[-1] in "'\"":
+            tokens.append('"')
+        elif token[0].isalpha() or token[0] == "_":
+            tokens.append(token if keyword.iskeyword(token) or (tokens and tokens[-1] == ".") else "_")
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def _shingle_hashes(code_content: str) -> Set[int]:
+    tokens = _code_tokens(code_content)
+    size = min(SHINGLE_SIZE, len(tokens))
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(tokens[index : index + size]).encode(), digest_size=8).digest(), "big")
+        for index in range(len(tokens) - size + 1)
+    }
+
+
+def compute_signature(code_content: str) -> List[int]:
+    hashes = _shingle_hashes(code_content) or {0}
+    return [min((a * value + b) % MERSENNE_PRIME for value in hashes) for a, b in PERMUTATIONS]
+
+
+def lsh_buckets(signature: List[int]) -> List[str]:
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = ",".join(str(value) for value in signature[band * LSH_ROWS : (band + 1) * LSH_ROWS])
+        buckets.append(f"{band}:{hashlib.blake2b(rows.encode(), digest_size=8).hexdigest()}")
+    return buckets
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    code_signatures = op.create_table(
+        'code_signatures',
+        sa.Column('code_version_id', sa.Integer(), nullable=False),
+        sa.Column('signature', sa.JSON(), nullable=False),
+        sa.ForeignKeyConstraint(['code_version_id'], ['code_versions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('code_version_id'),
+    )
+    code_lsh_buckets = op.create_table(
+        'code_lsh_buckets',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('code_version_id', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.String(length=32), nullable=False),
+        sa.ForeignKeyConstraint(['code_version_id'], ['code_versions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_code_lsh_buckets_bucket'), 'code_lsh_buckets', ['bucket'], unique=False)
+    op.create_index(
+        op.f('ix_code_lsh_buckets_code_version_id'), 'code_lsh_buckets', ['code_version_id'], unique=False
+    )
+
+    # Index the existing versions
+    bind = op.get_bind()
+    for code_version_id, content in bind.execute(sa.select(code_versions.c.id, code_versions.c.content)).all():
+        signature = compute_signature(content)
+        bind.execute(code_signatures.insert().values(code_version_id=code_version_id, signature=signature))
+        bind.execute(
+            code_lsh_buckets.insert(),
+            [{'code_version_id': code_version_id, 'bucket': bucket} for bucket in lsh_buckets(signature)],
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_code_lsh_buckets_code_version_id'), table_name='code_lsh_buckets')
+    op.drop_index(op.f('ix_code_lsh_buckets_bucket'), table_name='code_lsh_buckets')
+    op.drop_table('code_lsh_buckets')
+    op.drop_table('code_signatures')
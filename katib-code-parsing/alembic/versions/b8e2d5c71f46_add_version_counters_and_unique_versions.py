@@ -0,0 +1,81 @@
+"""Add version counters and unique version numbers
+
+Revision ID: b8e2d5c71f46
+Revises: f3c8a1d6b905
+Create Date: 2026-10-18 22:14:08.517340
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e2d5c71f46'
+down_revision: Union[str, Sequence[str], None] = 'f3c8a1d6b905'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (parent table, version table, version column referencing the parent)
+VERSIONED = [
+    ('codes', 'code_versions', 'code_id'),
+    ('parsing_results', 'parsing_result_versions', 'parsing_result_id'),
+]
+
+
+def _renumber_duplicates(bind: sa.Connection, versions: sa.TableClause, parent_id: sa.ColumnClause) -> None:
+    # Versions that got the same number in a race move after the latest version, in id order
+    rows = bind.execute(sa.select(versions.c.id, parent_id, versions.c.version).order_by(parent_id, versions.c.id)).all()
+    latest = {}
+    for _, parent, version in rows:
+        latest[parent] = max(latest.get(parent, 0), version)
+    seen = set()
+    for version_id, parent, version in rows:
+        if (parent, version) in seen:
+            latest[parent] += 1
+            bind.execute(versions.update().where(versions.c.id == version_id).values(version=latest[parent]))
+        else:
+            seen.add((parent, version))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    for parent_table, version_table, parent_column in VERSIONED:
+        with op.batch_alter_table(parent_table) as batch_op:
+            batch_op.add_column(sa.Column('latest_version', sa.Integer(), server_default='0', nullable=False))
+
+        versions = sa.table(
+            version_table,
+            sa.column('id', sa.Integer()),
+            sa.column(parent_column, sa.Integer()),
+            sa.column('version', sa.Integer()),
+        )
+        parents = sa.table(parent_table, sa.column('id', sa.Integer()), sa.column('latest_version', sa.Integer()))
+        _renumber_duplicates(bind, versions, versions.c[parent_column])
+        bind.execute(
+            parents.update().values(
+                latest_version=sa.select(sa.func.coalesce(sa.func.max(versions.c.version), 0))
+                .where(versions.c[parent_column] == parents.c.id)
+                .scalar_subquery()
+            )
+        )
+
+        with op.batch_alter_table(version_table) as batch_op:
+            batch_op.create_unique_constraint(f'uq_{version_table}_{parent_column}_version', [parent_column, 'version'])
+
+    with op.batch_alter_table('parsing_results') as batch_op:
+        batch_op.create_index(batch_op.f('ix_parsing_results_code_version_id'), ['code_version_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('parsing_results') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_parsing_results_code_version_id'))
+    for parent_table, version_table, parent_column in VERSIONED:
+        with op.batch_alter_table(version_table) as batch_op:
+            batch_op.drop_constraint(f'uq_{version_table}_{parent_column}_version', type_='unique')
+        with op.batch_alter_table(parent_table) as batch_op:
+            batch_op.drop_column('latest_version')
@@ -0,0 +1,61 @@
+"""Add parse_metrics table
+
+Revision ID: c3a9e5d17b24
+Revises: 8d2f6a1c4e57
+Create Date: 2026-10-18 14:02:51.318420
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a9e5d17b24'
+down_revision: Union[str, Sequence[str], None] = '8d2f6a1c4e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'parse_metrics',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('parsing_result_version_id', sa.Integer(), nullable=True),
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('model', sa.String(), nullable=True),
+        sa.Column('llm_requests', sa.Integer(), nullable=False),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+        sa.Column('completion_tokens', sa.Integer(), nullable=False),
+        sa.Column('latency_ms', sa.Float(), nullable=False),
+        sa.Column('llm_latency_ms', sa.Float(), nullable=False),
+        sa.Column('queue_wait_ms', sa.Float(), nullable=False),
+        sa.Column('retries', sa.Integer(), nullable=False),
+        sa.Column('coalesced', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ['parsing_result_version_id'],
+            ['parsing_result_versions.id'],
+            ondelete='SET NULL',
+        ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_parse_metrics_created_at'), 'parse_metrics', ['created_at'], unique=False)
+    op.create_index(op.f('ix_parse_metrics_id'), 'parse_metrics', ['id'], unique=False)
+    op.create_index(
+        op.f('ix_parse_metrics_parsing_result_version_id'),
+        'parse_metrics',
+        ['parsing_result_version_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_parse_metrics_parsing_result_version_id'), table_name='parse_metrics')
+    op.drop_index(op.f('ix_parse_metrics_id'), table_name='parse_metrics')
+    op.drop_index(op.f('ix_parse_metrics_created_at'), table_name='parse_metrics')
+    op.drop_table('parse_metrics')
@@ -0,0 +1,50 @@
+"""Store the full parse request of parse jobs
+
+Revision ID: c7f4a2e9d318
+Revises: b8e2d5c71f46
+Create Date: 2026-10-19 09:12:45.381027
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7f4a2e9d318'
+down_revision: Union[str, Sequence[str], None] = 'b8e2d5c71f46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+parse_jobs = sa.table(
+    'parse_jobs',
+    sa.column('id', sa.Integer()),
+    sa.column('name', sa.String()),
+    sa.column('request', sa.JSON()),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('parse_jobs') as batch_op:
+        batch_op.add_column(sa.Column('request', sa.JSON(), nullable=True))
+
+    # Existing jobs were queued with the default options
+    bind = op.get_bind()
+    for job_id, name in bind.execute(sa.select(parse_jobs.c.id, parse_jobs.c.name)).all():
+        bind.execute(
+            parse_jobs.update()
+            .where(parse_jobs.c.id == job_id)
+            .values(request={'name': name, 'incremental': False, 'hedge_after_ms': None, 'deadline_ms': None})
+        )
+
+    with op.batch_alter_table('parse_jobs') as batch_op:
+        batch_op.alter_column('request', existing_type=sa.JSON(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('parse_jobs') as batch_op:
+        batch_op.drop_column('request')
@@ -0,0 +1,128 @@
+"""Store code version contents as deduplicated blobs
+
+Revision ID: d94b1a7e3c52
+Revises: a6c2d94f1e07
+Create Date: 2026-10-18 19:42:10.518306
+
+"""
+
+import hashlib
+import zlib
+from typing import Sequence, Tuple, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'd94b1a7e3c52'
+down_revision: Union[str, Sequence[str], None] = 'a6c2d94f1e07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+code_versions = sa.table(
+    'code_versions',
+    sa.column('id', sa.Integer()),
+    sa.column('content', sa.Text()),
+    sa.column('content_hash', sa.String(length=64)),
+)
+
+# A frozen copy of the blob encoding of app.models.code_blob at this revision, so
+# that later changes to the application do not change the migration.
+COMPRESSION_LEVEL = 6
+
+
+def hash_content(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def compress_content(content: str) -> Tuple[bytes, str]:
+    raw = content.encode('utf-8')
+    compressed = zlib.compress(raw, COMPRESSION_LEVEL)
+    if len(compressed) < len(raw):
+        return compressed, 'zlib'
+    return raw, 'none'
+
+
+def decompress_content(data: bytes, compression: str) -> str:
+    if compression == 'zlib':
+        data = zlib.decompress(data)
+    elif compression != 'none':
+        raise ValueError(f'Unknown code blob compression: {compression}')
+    return data.decode('utf-8')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    code_blobs = op.create_table(
+        'code_blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('compression', sa.String(length=16), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('stored_size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('sha256'),
+    )
+    with op.batch_alter_table('code_versions') as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+    # Move the existing contents into blobs, one per distinct text
+    bind = op.get_bind()
+    stored = set()
+    for code_version_id, content in bind.execute(sa.select(code_versions.c.id, code_versions.c.content)).all():
+        sha256 = hash_content(content)
+        if sha256 not in stored:
+            data, compression = compress_content(content)
+            bind.execute(
+                code_blobs.insert().values(
+                    sha256=sha256,
+                    data=data,
+                    compression=compression,
+                    size=len(content.encode('utf-8')),
+                    stored_size=len(data),
+                    created_at=sa.func.current_timestamp(),
+                )
+            )
+            stored.add(sha256)
+        bind.execute(
+            code_versions.update().where(code_versions.c.id == code_version_id).values(content_hash=sha256)
+        )
+
+    with op.batch_alter_table('code_versions') as batch_op:
+        batch_op.alter_column('content_hash', existing_type=sa.String(length=64), nullable=False)
+        batch_op.create_index(batch_op.f('ix_code_versions_content_hash'), ['content_hash'], unique=False)
+        batch_op.create_foreign_key('fk_code_versions_content_hash_code_blobs', 'code_blobs', ['content_hash'], ['sha256'])
+        batch_op.drop_column('content')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    code_blobs = sa.table(
+        'code_blobs',
+        sa.column('sha256', sa.String(length=64)),
+        sa.column('data', sa.LargeBinary()),
+        sa.column('compression', sa.String(length=16)),
+    )
+    with op.batch_alter_table('code_versions') as batch_op:
+        batch_op.add_column(sa.Column('content', sa.Text(), nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(code_versions.c.id, code_blobs.c.data, code_blobs.c.compression).select_from(
+            code_versions.join(code_blobs, code_blobs.c.sha256 == code_versions.c.content_hash)
+        )
+    ).all()
+    for code_version_id, data, compression in rows:
+        bind.execute(
+            code_versions.update()
+            .where(code_versions.c.id == code_version_id)
+            .values(content=decompress_content(data, compression))
+        )
+
+    with op.batch_alter_table('code_versions') as batch_op:
+        batch_op.alter_column('content', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_constraint('fk_code_versions_content_hash_code_blobs', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_code_versions_content_hash'))
+        batch_op.drop_column('content_hash')
+    op.drop_table('code_blobs')
@@ -0,0 +1,30 @@
+"""Add model_tier to parse_metrics
+
+Revision ID: e71b4c08a5f3
+Revises: c3a9e5d17b24
+Create Date: 2026-10-18 15:37:12.604118
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e71b4c08a5f3'
+down_revision: Union[str, Sequence[str], None] = 'c3a9e5d17b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('parse_metrics', sa.Column('model_tier', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('parse_metrics') as batch_op:
+        batch_op.drop_column('model_tier')
@@ -0,0 +1,139 @@
+"""Add delta version chains
+
+Revision ID: f3c8a1d6b905
+Revises: d94b1a7e3c52
+Create Date: 2026-10-18 21:03:44.290617
+
+"""
+
+import json
+import zlib
+from typing import Any, List, Sequence, Tuple, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1d6b905'
+down_revision: Union[str, Sequence[str], None] = 'd94b1a7e3c52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+code_blobs = sa.table(
+    'code_blobs',
+    sa.column('sha256', sa.String(length=64)),
+    sa.column('data', sa.LargeBinary()),
+    sa.column('compression', sa.String(length=16)),
+    sa.column('stored_size', sa.Integer()),
+    sa.column('base_sha256', sa.String(length=64)),
+    sa.column('chain_depth', sa.Integer()),
+)
+parsing_result_versions = sa.table(
+    'parsing_result_versions',
+    sa.column('id', sa.Integer()),
+    sa.column('content', sa.JSON()),
+    sa.column('base_version_id', sa.Integer()),
+    sa.column('chain_depth', sa.Integer()),
+)
+
+# A frozen copy of the blob encoding of app.models.code_blob and of the delta
+# format of app.models.version_storage at this revision, so that later changes
+# to the application do not change the migration.
+COMPRESSION_LEVEL = 6
+
+
+def compress_content(content: str) -> Tuple[bytes, str]:
+    raw = content.encode('utf-8')
+    compressed = zlib.compress(raw, COMPRESSION_LEVEL)
+    if len(compressed) < len(raw):
+        return compressed, 'zlib'
+    return raw, 'none'
+
+
+def decompress_content(data: bytes, compression: str) -> str:
+    if compression == 'zlib':
+        data = zlib.decompress(data)
+    elif compression != 'none':
+        raise ValueError(f'Unknown code blob compression: {compression}')
+    return data.decode('utf-8')
+
+
+def apply_delta(base: str, delta: List[Any]) -> str:
+    base_lines = base.splitlines(keepends=True)
+    return ''.join(op if isinstance(op, str) else ''.join(base_lines[op[0] : op[1]]) for op in delta)
+
+
+def dump_json(content: Any) -> str:
+    return json.dumps(content, sort_keys=True, indent=0, ensure_ascii=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing contents stay stored in full (depth 0)
+    with op.batch_alter_table('code_blobs') as batch_op:
+        batch_op.add_column(sa.Column('base_sha256', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('chain_depth', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_code_blobs_base_sha256'), ['base_sha256'], unique=False)
+        batch_op.create_foreign_key('fk_code_blobs_base_sha256_code_blobs', 'code_blobs', ['base_sha256'], ['sha256'])
+    with op.batch_alter_table('parsing_result_versions') as batch_op:
+        batch_op.add_column(sa.Column('base_version_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('chain_depth', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(
+            batch_op.f('ix_parsing_result_versions_base_version_id'), ['base_version_id'], unique=False
+        )
+        batch_op.create_foreign_key(
+            'fk_parsing_result_versions_base_version_id_parsing_result_versions',
+            'parsing_result_versions',
+            ['base_version_id'],
+            ['id'],
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Store every delta in full again, bases first
+    bind = op.get_bind()
+    texts = {}
+    for sha256, data, compression, base_sha256 in bind.execute(
+        sa.select(code_blobs.c.sha256, code_blobs.c.data, code_blobs.c.compression, code_blobs.c.base_sha256)
+        .order_by(code_blobs.c.chain_depth)
+    ).all():
+        text = decompress_content(data, compression)
+        if base_sha256 is not None:
+            text = apply_delta(texts[base_sha256], json.loads(text))
+            data, compression = compress_content(text)
+            bind.execute(
+                code_blobs.update()
+                .where(code_blobs.c.sha256 == sha256)
+                .values(data=data, compression=compression, stored_size=len(data))
+            )
+        texts[sha256] = text
+
+    contents = {}
+    for version_id, content, base_version_id in bind.execute(
+        sa.select(
+            parsing_result_versions.c.id, parsing_result_versions.c.content, parsing_result_versions.c.base_version_id
+        ).order_by(parsing_result_versions.c.chain_depth)
+    ).all():
+        if base_version_id is not None:
+            content = json.loads(apply_delta(dump_json(contents[base_version_id]), content))
+            bind.execute(
+                parsing_result_versions.update()
+                .where(parsing_result_versions.c.id == version_id)
+                .values(content=content)
+            )
+        contents[version_id] = content
+
+    with op.batch_alter_table('parsing_result_versions') as batch_op:
+        batch_op.drop_constraint(
+            'fk_parsing_result_versions_base_version_id_parsing_result_versions', type_='foreignkey'
+        )
+        batch_op.drop_index(batch_op.f('ix_parsing_result_versions_base_version_id'))
+        batch_op.drop_column('chain_depth')
+        batch_op.drop_column('base_version_id')
+    with op.batch_alter_table('code_blobs') as batch_op:
+        batch_op.drop_constraint('fk_code_blobs_base_sha256_code_blobs', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_code_blobs_base_sha256'))
+        batch_op.drop_column('chain_depth')
+        batch_op.drop_column('base_sha256')
@@ -0,0 +1,40 @@
+from typing import Optional
+
+
+class LLMServiceError(Exception):
+    """
+    Base class of the errors raised when the LLM cannot produce a parse.
+    """
+
+    status_code = 503
+
+
+class LLMRateLimitError(LLMServiceError):
+    """
+    The provider kept rate limiting the request after every retry.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMUnavailableError(LLMServiceError):
+    """
+    The provider timed out, could not be reached or kept failing with server errors.
+    """
+
+
+class LLMResponseError(LLMServiceError):
+    """
+    The provider answered, but not with a usable parse result.
+    """
+
+    status_code = 502
+
+
+class QueryBudgetExceededError(Exception):
+    """
+    A request ran more SQL statements than its endpoint's declared budget
+    (only raised when query budgets are enforced, i.e. in tests).
+    """
@@ -1,17 +1,89 @@
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Dict
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-DATABASE_URL = "sqlite+aiosqlite:///./katib_parser.db"
+from app.common.constants import (
+    DATABASE_ECHO,
+    DATABASE_MAX_OVERFLOW,
+    DATABASE_POOL_RECYCLE,
+    DATABASE_POOL_SIZE,
+    DATABASE_POOL_TIMEOUT,
+    DATABASE_URL,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_SYNCHRONOUS,
+)
+
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    # Applied in this order: busy_timeout first, so that switching the journal mode waits for other connections
+    return {
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "journal_mode": SQLITE_JOURNAL_MODE,
+        "synchronous": SQLITE_SYNCHRONOUS,
+        "mmap_size": SQLITE_MMAP_SIZE,
+        "cache_size": SQLITE_CACHE_SIZE,
+    }
+
+
+def _configure_sqlite_connection(dbapi_connection: Any, connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def create_database_engine(url: str = DATABASE_URL, echo: bool = DATABASE_ECHO, **engine_options: Any) -> AsyncEngine:
+    """
+    Creates the async engine for a database URL.
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+    SQLite connections are configured with the SQLITE_* pragmas (WAL journal,
+    busy timeout, ...) as they open. Pooled databases get a pool sized by the
+    DATABASE_POOL_* settings; in-memory SQLite databases keep their single
+    shared connection.
+
+    Args:
+        engine_options: Passed to `create_async_engine`, overriding the defaults.
+    """
+    database_url = make_url(url)
+    is_sqlite = database_url.get_backend_name() == "sqlite"
+    options: Dict[str, Any] = {"echo": echo}
+    if not (is_sqlite and database_url.database in (None, "", ":memory:")):
+        options.update(
+            pool_size=DATABASE_POOL_SIZE,
+            max_overflow=DATABASE_MAX_OVERFLOW,
+            pool_timeout=DATABASE_POOL_TIMEOUT,
+            pool_recycle=DATABASE_POOL_RECYCLE,
+        )
+    options.update(engine_options)
+
+    engine = create_async_engine(database_url, **options)
+    if is_sqlite:
+        event.listen(engine.sync_engine, "connect", _configure_sqlite_connection)
+    return engine
+
+
+engine = create_database_engine()
 
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
 )
 
 
+def get_session_factory() -> sessionmaker:
+    """
+    Returns the session factory, for endpoints that need several concurrent sessions.
+    """
+    return AsyncSessionLocal
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypeVar
+
+from app.common.constants import ANALYSIS_OFFLOAD_MIN_CHARS, ANALYSIS_WORKERS
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+ANALYSIS_OFFLOADED = "analysis.offloaded"
+ANALYSIS_INLINE = "analysis.inline"
+
+# Shared by every request; created on first use so that processes that never analyze a large script never start it
+_executor: Optional[ProcessPoolExecutor] = None
+_workers = ANALYSIS_WORKERS
+_min_chars = ANALYSIS_OFFLOAD_MIN_CHARS
+
+
+def get_analysis_executor() -> Optional[ProcessPoolExecutor]:
+    """
+    The process pool CPU-bound analysis runs in, or None if offloading is disabled.
+    """
+    global _executor
+    if _executor is None and _workers > 0:
+        # Workers are spawned rather than forked: the server process has threads (SQLite, HTTP
+        # clients) whose locks a fork could copy in a held state
+        _executor = ProcessPoolExecutor(max_workers=_workers, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def configure_analysis_executor(workers: Optional[int] = None, min_chars: Optional[int] = None) -> None:
+    """
+    Resizes the analysis pool (0 workers runs everything inline) and changes the
+    size from which scripts are offloaded. The current pool is shut down.
+    """
+    global _workers, _min_chars
+    if workers is not None and workers < 0:
+        raise ValueError("workers must not be negative")
+    shutdown_analysis_executor()
+    _workers = ANALYSIS_WORKERS if workers is None else workers
+    _min_chars = ANALYSIS_OFFLOAD_MIN_CHARS if min_chars is None else min_chars
+
+
+def shutdown_analysis_executor(wait: bool = True) -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=True)
+        _executor = None
+
+
+async def run_analysis(func: Callable[..., T], *args: Any, size: int) -> T:
+    """
+    Runs a CPU-bound analysis function in the process pool, so that it does not
+    block the event loop, or inline when the input is small.
+
+    Args:
+        func: A module-level function; it, its arguments and its result are pickled.
+        size: Size of the input (characters of code), compared to the offload threshold.
+    """
+    global _executor
+    executor = get_analysis_executor() if size >= _min_chars else None
+    if executor is None:
+        metrics.increment(ANALYSIS_INLINE)
+        return func(*args)
+
+    metrics.increment(ANALYSIS_OFFLOADED)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a new pool next time and analyze this input here
+        if _executor is executor:
+            logger.warning("Analysis process pool is broken, restarting it")
+            _executor = None
+            executor.shutdown(wait=False)
+        return func(*args)
@@ -0,0 +1,28 @@
+import threading
+from collections import Counter
+from typing import Dict
+
+# In-process counters for the parsing pipeline (cache hits, fast-path parses, ...).
+# They are reset on process restart; persistent per-parse data lives in the database.
+_lock = threading.Lock()
+_counters: Counter = Counter()
+
+
+def increment(name: str, value: int = 1) -> None:
+    with _lock:
+        _counters[name] += value
+
+
+def get_counter(name: str) -> int:
+    with _lock:
+        return _counters[name]
+
+
+def snapshot() -> Dict[str, int]:
+    with _lock:
+        return dict(_counters)
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
@@ -0,0 +1,62 @@
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+# Priorities of outbound LLM requests; lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_SPECULATIVE = 2
+
+
+@dataclass
+class ParseContext:
+    """
+    Per-parse state shared by the layers a parse goes through (router, parsing
+    service, LLM scheduler) without threading it through every call.
+    """
+
+    priority: int = PRIORITY_INTERACTIVE
+    # Seconds spent waiting in the LLM scheduler queue, summed over all LLM requests of the parse
+    queue_wait: float = 0.0
+    retries: int = 0
+    # Usage of the LLM requests made by this parse
+    model: Optional[str] = None
+    model_tier: Optional[str] = None  # tier of the model that produced the result
+    llm_requests: int = 0
+    llm_latency: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+_current: contextvars.ContextVar[Optional[ParseContext]] = contextvars.ContextVar("parse_context", default=None)
+
+
+def current_parse_context() -> Optional[ParseContext]:
+    return _current.get()
+
+
+@contextmanager
+def ensure_parse_context(priority: int = PRIORITY_INTERACTIVE) -> Iterator[ParseContext]:
+    """
+    Reuses the caller's context if there is one, otherwise runs with a fresh one.
+    """
+    context = current_parse_context()
+    if context is not None:
+        yield context
+    else:
+        with parse_context(priority) as context:
+            yield context
+
+
+@contextmanager
+def parse_context(priority: int = PRIORITY_INTERACTIVE) -> Iterator[ParseContext]:
+    """
+    Runs the enclosed parse with a fresh context. Tasks created inside inherit it.
+    """
+    context = ParseContext(priority=priority)
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
@@ -0,0 +1,194 @@
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.common.constants import SQL_QUERY_BUDGET_ENFORCE, SQL_SLOW_QUERY_MS
+from app.common.exceptions import QueryBudgetExceededError
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+DB_STATEMENTS = "db.statements"
+SLOW_QUERIES = "db.slow_queries"
+QUERY_BUDGETS_EXCEEDED = "db.query_budget_exceeded"
+
+# Statements are logged and reported up to this many characters
+STATEMENT_PREVIEW_CHARS = 300
+
+
+@dataclass
+class QueryStats:
+    """
+    SQL statements run on behalf of one request (in any session or engine).
+    """
+
+    statements: int = 0
+    duration: float = 0.0
+    slowest: float = 0.0
+    slowest_statement: Optional[str] = None
+    # Statements the endpoint declared it needs at most (see `query_budget`)
+    budget: Optional[int] = None
+
+
+_current: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("query_stats", default=None)
+
+_lock = threading.Lock()
+_endpoints: Dict[str, Dict[str, Any]] = {}
+_slow_query_ms = SQL_SLOW_QUERY_MS
+_enforce_budgets = SQL_QUERY_BUDGET_ENFORCE
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Collects the statements run inside the block (and in tasks it starts) into a new QueryStats.
+    """
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def configure_query_stats(slow_query_ms: Optional[float] = None, enforce_budgets: Optional[bool] = None) -> None:
+    """
+    Changes the slow query threshold (0 disables the log) and whether query
+    budgets fail requests. Unset values go back to their configured default.
+    """
+    global _slow_query_ms, _enforce_budgets
+    _slow_query_ms = SQL_SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms
+    _enforce_budgets = SQL_QUERY_BUDGET_ENFORCE if enforce_budgets is None else enforce_budgets
+
+
+def _preview(statement: str) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= STATEMENT_PREVIEW_CHARS else statement[:STATEMENT_PREVIEW_CHARS] + "..."
+
+
+def record_statement(statement: str, duration: float) -> None:
+    metrics.increment(DB_STATEMENTS)
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.duration += duration
+        if duration >= stats.slowest:
+            stats.slowest = duration
+            stats.slowest_statement = statement
+    if _slow_query_ms and duration * 1000 >= _slow_query_ms:
+        metrics.increment(SLOW_QUERIES)
+        # Parameters are left out: they hold user code
+        logger.warning("Slow query (%.1f ms): %s", duration * 1000, _preview(statement))
+
+
+def _before_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+) -> None:
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool
+) -> None:
+    record_statement(statement, time.perf_counter() - context._query_started)
+
+
+def install_sql_instrumentation() -> None:
+    """
+    Times every statement of every engine. Idempotent.
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def query_budget(max_statements: int) -> Callable[[], None]:
+    """
+    FastAPI dependency declaring how many SQL statements a request to the
+    endpoint may run, e.g. `dependencies=[Depends(query_budget(3))]`.
+    """
+
+    def declare_query_budget() -> None:
+        stats = _current.get()
+        if stats is not None:
+            stats.budget = max_statements
+
+    return declare_query_budget
+
+
+def allow_extra_statement() -> None:
+    """
+    Raises the query budget of the current request by one, for a statement
+    that depends on what is stored rather than on the endpoint (e.g. reading
+    the delta chain of a version).
+    """
+    stats = _current.get()
+    if stats is not None and stats.budget is not None:
+        stats.budget += 1
+
+
+def finish_request(endpoint: str, stats: QueryStats) -> None:
+    """
+    Adds a finished request to the per-endpoint statistics and checks its query budget.
+
+    Raises:
+        QueryBudgetExceededError: The budget was exceeded and budgets are enforced.
+    """
+    with _lock:
+        entry = _endpoints.setdefault(
+            endpoint,
+            {"requests": 0, "statements": 0, "max_statements": 0, "duration": 0.0, "slowest": 0.0, "slowest_statement": None},
+        )
+        entry["requests"] += 1
+        entry["statements"] += stats.statements
+        entry["max_statements"] = max(entry["max_statements"], stats.statements)
+        entry["duration"] += stats.duration
+        if stats.slowest_statement is not None and stats.slowest >= entry["slowest"]:
+            entry["slowest"] = stats.slowest
+            entry["slowest_statement"] = _preview(stats.slowest_statement)
+
+    if stats.budget is None or stats.statements <= stats.budget:
+        return
+    metrics.increment(QUERY_BUDGETS_EXCEEDED)
+    message = f"{endpoint} ran {stats.statements} SQL statements, over its budget of {stats.budget}"
+    if _enforce_budgets:
+        raise QueryBudgetExceededError(message)
+    logger.warning(message)
+
+
+def get_query_stats() -> dict:
+    with _lock:
+        endpoints = {
+            endpoint: {
+                "requests": entry["requests"],
+                "statements": entry["statements"],
+                "avg_statements": entry["statements"] / entry["requests"],
+                "max_statements": entry["max_statements"],
+                "db_time_ms": entry["duration"] * 1000,
+                "slowest_ms": entry["slowest"] * 1000,
+                "slowest_statement": entry["slowest_statement"],
+            }
+            for endpoint, entry in sorted(_endpoints.items())
+        }
+    return {
+        "statements": metrics.get_counter(DB_STATEMENTS),
+        "slow_queries": metrics.get_counter(SLOW_QUERIES),
+        "query_budget_exceeded": metrics.get_counter(QUERY_BUDGETS_EXCEEDED),
+        "endpoints": endpoints,
+    }
+
+
+def reset_query_stats() -> None:
+    with _lock:
+        _endpoints.clear()
@@ -1,12 +1,41 @@
-from fastapi import FastAPI
+import math
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 
+from app.common.constants import PARSE_JOB_WORKERS
+from app.common.exceptions import LLMRateLimitError, LLMServiceError
+from app.core.database import AsyncSessionLocal
+from app.core.executor import shutdown_analysis_executor
+from app.core.query_stats import finish_request, install_sql_instrumentation, track_queries
 from app.routers import code_router, code_version_router, parsing_router
+from app.services import llm_service, parsing_service
+from app.services.parse_job_service import ParseJobWorkerPool
+from app.services.version_storage import install_version_storage
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    parse_job_workers = ParseJobWorkerPool(AsyncSessionLocal, concurrency=PARSE_JOB_WORKERS)
+    parse_job_workers.start()
+    yield
+    await parse_job_workers.stop()
+    await parsing_service.cancel_speculative_parses()
+    await llm_service.close_llm_client()
+    shutdown_analysis_executor()
+
+
+install_sql_instrumentation()
+install_version_storage(AsyncSessionLocal)
 
 app = FastAPI(
     title="Katib Code Parsing API",
     description="API for parsing ML code and managing related data for Katib.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -22,6 +51,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def report_sql_queries(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    # Statements of streamed responses that run after the headers are sent are not included
+    with track_queries() as stats:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    if route is not None:
+        finish_request(f"{request.method} {getattr(route, 'path', request.url.path)}", stats)
+    response.headers["X-DB-Queries"] = str(stats.statements)
+    response.headers["X-DB-Time-Ms"] = f"{stats.duration * 1000:.1f}"
+    response.headers["X-DB-Slowest-Ms"] = f"{stats.slowest * 1000:.1f}"
+    return response
+
+
+@app.exception_handler(LLMServiceError)
+async def llm_service_error_handler(request: Request, exc: LLMServiceError) -> JSONResponse:
+    headers = {}
+    if isinstance(exc, LLMRateLimitError) and exc.retry_after is not None:
+        headers["Retry-After"] = str(math.ceil(exc.retry_after))
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)}, headers=headers)
+
+
 app.include_router(code_router.router, prefix="/codes", tags=["codes"])
 app.include_router(
     code_version_router.router,
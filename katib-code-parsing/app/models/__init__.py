@@ -1,5 +1,22 @@
 from .base import Base
 from .code import Code, CodeVersion
+from .code_blob import CodeBlob
+from .code_signature import CodeLSHBucket, CodeSignature
+from .parse_cache import ParseCacheEntry
+from .parse_job import ParseJob
+from .parse_metric import ParseMetric
 from .parsing_result import ParsingResult, ParsingResultVersion
 
-__all__ = ["Base", "Code", "CodeVersion", "ParsingResult", "ParsingResultVersion"]
+__all__ = [
+    "Base",
+    "Code",
+    "CodeBlob",
+    "CodeLSHBucket",
+    "CodeSignature",
+    "CodeVersion",
+    "ParseCacheEntry",
+    "ParseJob",
+    "ParseMetric",
+    "ParsingResult",
+    "ParsingResultVersion",
+]
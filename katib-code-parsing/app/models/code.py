@@ -1,15 +1,17 @@
 import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from .base import Base
+from .code_blob import CodeBlob
 
 
 class Code(Base):
     __tablename__ = "codes"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False)
+    latest_version = Column(Integer, nullable=False, default=0)  # last version number handed out, see version_numbering
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     updated_at = Column(
         DateTime,
@@ -21,14 +23,29 @@ class Code(Base):
 
 class CodeVersion(Base):
     __tablename__ = "code_versions"
+    # Also the index of the code_id foreign key and of the latest-version lookups
+    __table_args__ = (UniqueConstraint("code_id", "version", name="uq_code_versions_code_id_version"),)
     id = Column(Integer, primary_key=True, index=True)
     code_id = Column(Integer, ForeignKey("codes.id"), nullable=False)
     version = Column(Integer, nullable=False)
-    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), ForeignKey("code_blobs.sha256"), index=True, nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     code = relationship("Code", back_populates="versions")
+    # Loaded with the version, so that its content is always available
+    blob = relationship("CodeBlob", lazy="joined", innerjoin=True)
     parsing_results = relationship(
         "ParsingResult",
         back_populates="code_version",
         cascade="all, delete-orphan",
     )
+    signature = relationship("CodeSignature", back_populates="code_version", uselist=False, cascade="all, delete-orphan")
+    lsh_buckets = relationship("CodeLSHBucket", back_populates="code_version", cascade="all, delete-orphan")
+
+    @property
+    def content(self) -> str:
+        return self.blob.text
+
+    @content.setter
+    def content(self, content: str) -> None:
+        self.blob = CodeBlob.from_content(content)
+
@@ -0,0 +1,73 @@
+import datetime
+import hashlib
+import zlib
+from typing import Optional, Tuple
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary, String
+
+from app.common.constants import CODE_BLOB_COMPRESSION_LEVEL
+
+from .base import Base
+
+
+def hash_content(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def compress_content(content: str) -> Tuple[bytes, str]:
+    """
+    Returns the stored bytes of a text and their compression ("zlib" or "none").
+    """
+    raw = content.encode("utf-8")
+    compressed = zlib.compress(raw, CODE_BLOB_COMPRESSION_LEVEL)
+    if len(compressed) < len(raw):
+        return compressed, "zlib"
+    return raw, "none"
+
+
+def decompress_content(data: bytes, compression: str) -> str:
+    if compression == "zlib":
+        data = zlib.decompress(data)
+    elif compression != "none":
+        raise ValueError(f"Unknown code blob compression: {compression}")
+    return data.decode("utf-8")
+
+
+class CodeBlob(Base):
+    # Content of code versions, stored once per distinct text (versions reference it by hash)
+    __tablename__ = "code_blobs"
+    sha256 = Column(String(64), primary_key=True)
+    data = Column(LargeBinary, nullable=False)  # the text, or a delta against the base blob (see services.version_storage)
+    compression = Column(String(16), nullable=False)  # zlib or none
+    size = Column(Integer, nullable=False)  # bytes of the UTF-8 text
+    stored_size = Column(Integer, nullable=False)  # bytes of data
+    base_sha256 = Column(String(64), ForeignKey("code_blobs.sha256"), index=True, nullable=True)
+    chain_depth = Column(Integer, nullable=False, default=0)  # deltas since the last full text
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # Decompressed (and delta-resolved) text, set per loaded instance; not a column
+    __allow_unmapped__ = True
+    _text: Optional[str]
+
+    @classmethod
+    def from_content(cls, content: str) -> "CodeBlob":
+        data, compression = compress_content(content)
+        blob = cls(
+            sha256=hash_content(content),
+            data=data,
+            compression=compression,
+            size=len(content.encode("utf-8")),
+            stored_size=len(data),
+        )
+        blob._text = content
+        return blob
+
+    @property
+    def text(self) -> str:
+        # Blobs never change, so the text is decompressed once per loaded instance
+        text = self.__dict__.get("_text")
+        if text is None:
+            if self.base_sha256 is not None:
+                # Set when the blob is loaded, see services.version_storage
+                raise RuntimeError(f"Delta chain of code blob {self.sha256} was not resolved")
+            text = self._text = decompress_content(self.data, self.compression)
+        return text
@@ -0,0 +1,21 @@
+from sqlalchemy import JSON, Column, ForeignKey, Integer, String
+from sqlalchemy.orm import relationship
+
+from .base import Base
+
+
+class CodeSignature(Base):
+    # MinHash signature of a code version's token shingles, see app/services/minhash.py
+    __tablename__ = "code_signatures"
+    code_version_id = Column(Integer, ForeignKey("code_versions.id", ondelete="CASCADE"), primary_key=True)
+    signature = Column(JSON, nullable=False)
+    code_version = relationship("CodeVersion", back_populates="signature")
+
+
+class CodeLSHBucket(Base):
+    # One row per LSH band of a signature; versions sharing a bucket are near-duplicate candidates
+    __tablename__ = "code_lsh_buckets"
+    id = Column(Integer, primary_key=True)
+    code_version_id = Column(Integer, ForeignKey("code_versions.id", ondelete="CASCADE"), index=True, nullable=False)
+    bucket = Column(String(32), index=True, nullable=False)  # "<band>:<hash of the band's rows>"
+    code_version = relationship("CodeVersion", back_populates="lsh_buckets")
@@ -0,0 +1,18 @@
+import datetime
+
+from sqlalchemy import JSON, Column, DateTime, Integer, String
+
+from .base import Base
+
+
+class ParseCacheEntry(Base):
+    __tablename__ = "parse_cache_entries"
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, index=True, nullable=False)
+    code_hash = Column(String(64), index=True, nullable=False)
+    model_name = Column(String, nullable=False)
+    prompt_version = Column(String, nullable=False)
+    content = Column(JSON, nullable=False)
+    hit_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    last_hit_at = Column(DateTime, nullable=True)
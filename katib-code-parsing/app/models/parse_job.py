@@ -0,0 +1,25 @@
+import datetime
+
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Text
+
+from .base import Base
+
+
+class ParseJob(Base):
+    __tablename__ = "parse_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    code_version_id = Column(Integer, ForeignKey("code_versions.id"), nullable=False)
+    name = Column(String, nullable=False)
+    request = Column(JSON, nullable=False)  # the ParsingResultCreate payload the job was queued with
+    status = Column(String, index=True, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    parsing_result_id = Column(Integer, ForeignKey("parsing_results.id"), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(
+        DateTime,
+        default=datetime.datetime.utcnow,
+        onupdate=datetime.datetime.utcnow,
+    )
@@ -0,0 +1,26 @@
+import datetime
+
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String
+
+from .base import Base
+
+
+class ParseMetric(Base):
+    # Kept when the parsing result is deleted, so usage and cost can still be accounted for
+    __tablename__ = "parse_metrics"
+    id = Column(Integer, primary_key=True, index=True)
+    parsing_result_version_id = Column(
+        Integer, ForeignKey("parsing_result_versions.id", ondelete="SET NULL"), index=True, nullable=True
+    )
+    source = Column(String, nullable=False)  # cache, incremental, fast_path or llm
+    model = Column(String, nullable=True)  # None if no LLM request was made
+    model_tier = Column(String, nullable=True)  # small or large, see model_router
+    llm_requests = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Float, nullable=False)  # wall clock of the whole parse
+    llm_latency_ms = Column(Float, nullable=False, default=0.0)
+    queue_wait_ms = Column(Float, nullable=False, default=0.0)
+    retries = Column(Integer, nullable=False, default=0)
+    coalesced = Column(Boolean, nullable=False, default=False)  # shared another request's LLM call
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
@@ -1,6 +1,6 @@
 import datetime
 
-from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -9,8 +9,9 @@ from .base import Base
 class ParsingResult(Base):
     __tablename__ = "parsing_results"
     id = Column(Integer, primary_key=True, index=True)
-    code_version_id = Column(Integer, ForeignKey("code_versions.id"), nullable=False)
+    code_version_id = Column(Integer, ForeignKey("code_versions.id"), index=True, nullable=False)
     name = Column(String, nullable=False)
+    latest_version = Column(Integer, nullable=False, default=0)  # last version number handed out, see version_numbering
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     code_version = relationship("CodeVersion", back_populates="parsing_results")
     versions = relationship(
@@ -22,9 +23,15 @@ class ParsingResult(Base):
 
 class ParsingResultVersion(Base):
     __tablename__ = "parsing_result_versions"
+    __table_args__ = (
+        UniqueConstraint("parsing_result_id", "version", name="uq_parsing_result_versions_parsing_result_id_version"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     parsing_result_id = Column(Integer, ForeignKey("parsing_results.id"), nullable=False)
     version = Column(Integer, nullable=False)
-    content = Column(JSON, nullable=False)  # JSON content
+    content = Column(JSON, nullable=False)  # JSON content, or a delta against the base version (see services.version_storage)
+    # Restricting: the versions based on a deleted one are rewritten in full first (see services.version_storage)
+    base_version_id = Column(Integer, ForeignKey("parsing_result_versions.id"), index=True, nullable=True)
+    chain_depth = Column(Integer, nullable=False, default=0)  # deltas since the last full version
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     parsing_result = relationship("ParsingResult", back_populates="versions")
@@ -1,21 +1,30 @@
-from typing import List
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 
-from app.core.database import get_db
-from app.schemas.code import CodeBase, CodeCreate, CodeInDB
-from app.services import code_service
+from app.core.database import get_db, get_session_factory
+from app.core.query_stats import query_budget
+from app.schemas.code import CodeBase, CodeCreate, CodeInDB, CodeStorageStats
+from app.services import code_blob_service, code_service, parsing_service
 
 router = APIRouter()
 
 
-@router.post("/", response_model=CodeInDB, status_code=201)
-async def create_code(code: CodeCreate, db: AsyncSession = Depends(get_db)) -> CodeInDB:
-    return await code_service.create_code(db=db, code=code)
+@router.post("/", response_model=CodeInDB, status_code=201, dependencies=[Depends(query_budget(9))])
+async def create_code(
+    code: CodeCreate,
+    speculative_parse: Optional[bool] = None,
+    db: AsyncSession = Depends(get_db),
+    session_factory: sessionmaker = Depends(get_session_factory),
+) -> CodeInDB:
+    db_code = await code_service.create_code(db=db, code=code)
+    parsing_service.schedule_speculative_parse(session_factory, code.content, speculative_parse)
+    return db_code
 
 
-@router.get("/", response_model=List[CodeInDB])
+@router.get("/", response_model=List[CodeInDB], dependencies=[Depends(query_budget(4))])
 async def read_codes(
     skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)
 ) -> List[CodeInDB]:
@@ -23,7 +32,12 @@ async def read_codes(
     return [CodeInDB.model_validate(code) for code in codes]
 
 
-@router.get("/{code_id}", response_model=CodeInDB)
+@router.get("/storage/stats", response_model=CodeStorageStats)
+async def read_storage_stats(db: AsyncSession = Depends(get_db)) -> CodeStorageStats:
+    return CodeStorageStats(**await code_blob_service.get_storage_stats(db))
+
+
+@router.get("/{code_id}", response_model=CodeInDB, dependencies=[Depends(query_budget(4))])
 async def read_code(code_id: int, db: AsyncSession = Depends(get_db)) -> CodeInDB:
     db_code = await code_service.get_code(db, code_id=code_id)
     if db_code is None:
@@ -31,7 +45,7 @@ async def read_code(code_id: int, db: AsyncSession = Depends(get_db)) -> CodeInD
     return db_code
 
 
-@router.put("/{code_id}", response_model=CodeInDB)
+@router.put("/{code_id}", response_model=CodeInDB, dependencies=[Depends(query_budget(4))])
 async def update_code(code_id: int, code: CodeBase, db: AsyncSession = Depends(get_db)) -> CodeInDB:
     db_code = await code_service.update_code(db, code_id=code_id, code=code)
     if db_code is None:
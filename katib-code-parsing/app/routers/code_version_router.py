@@ -1,27 +1,52 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 
-from app.core.database import get_db
-from app.schemas.code import CodeVersionCreate, CodeVersionInDB
-from app.services import code_version_service
+from app.core.database import get_db, get_session_factory
+from app.core.query_stats import query_budget
+from app.schemas.code import CodeVersionCreate, CodeVersionInDB, SimilarCodeVersion
+from app.services import code_version_service, parsing_service
 
 router = APIRouter()
 
 
-@router.post("/", response_model=CodeVersionInDB, status_code=201)
+@router.post("/", response_model=CodeVersionInDB, status_code=201, dependencies=[Depends(query_budget(8))])
 async def create_code_version(
     code_id: int,
     version: CodeVersionCreate,
+    speculative_parse: Optional[bool] = None,
     db: AsyncSession = Depends(get_db),
+    session_factory: sessionmaker = Depends(get_session_factory),
 ) -> CodeVersionInDB:
     db_code_version = await code_version_service.create_code_version(
         db=db, code_id=code_id, version=version
     )
     if db_code_version is None:
         raise HTTPException(status_code=404, detail="Parent code not found")
+    parsing_service.schedule_speculative_parse(session_factory, version.content, speculative_parse)
     return db_code_version
 
 
+@router.get(
+    "/{version_id}/similar", response_model=List[SimilarCodeVersion], dependencies=[Depends(query_budget(4))]
+)
+async def read_similar_code_versions(
+    code_id: int,
+    version_id: int,
+    min_similarity: Optional[float] = Query(None, ge=0, le=1),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+) -> List[SimilarCodeVersion]:
+    similar = await code_version_service.get_similar_code_versions(
+        db, code_id=code_id, version_id=version_id, min_similarity=min_similarity, limit=limit
+    )
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Code version not found")
+    return [SimilarCodeVersion(**entry) for entry in similar]
+
+
 @router.delete("/{version_id}", status_code=204)
 async def delete_code_version(version_id: int, db: AsyncSession = Depends(get_db)) -> None:
     db_code_version = await code_version_service.delete_code_version(db, version_id=version_id)
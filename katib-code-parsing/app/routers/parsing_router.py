@@ -1,15 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
+import datetime
+import json
+from typing import AsyncIterator, Literal, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 
-from app.core.database import get_db
+from app.common.constants import PARSE_BATCH_CONCURRENCY
+from app.core.database import get_db, get_session_factory
+from app.core.parse_context import parse_context
+from app.core.query_stats import get_query_stats, query_budget
+from app.schemas.llm_scheduler import LLMSchedulerStats, ModelRouterStats
+from app.schemas.parse_cache import ParseCacheInvalidation, ParseCacheStats, ParseSourceStats
+from app.schemas.parse_job import ParseJobInDB
+from app.schemas.parse_metric import ParseMetricsSummary
 from app.schemas.parsing_result import (
+    ParsingBatchCreate,
     ParsingResultBase,
     ParsingResultCreate,
     ParsingResultInDB,
     ParsingResultVersionCreate,
     ParsingResultVersionInDB,
 )
-from app.services import parsing_service
+from app.schemas.query_stats import QueryStatsSummary
+from app.services import (
+    code_service,
+    code_version_service,
+    parse_cache_service,
+    parse_job_service,
+    parse_metrics_service,
+    parsing_service,
+)
+from app.services.llm_scheduler import get_llm_scheduler
+from app.services.model_router import get_model_router
 
 router = APIRouter()
 
@@ -18,31 +43,125 @@ router = APIRouter()
     "/code-versions/{code_version_id}",
     response_model=ParsingResultInDB,
     status_code=201,
+    responses={202: {"model": ParseJobInDB, "description": "Parse job queued (mode=job)"}},
+    dependencies=[Depends(query_budget(12))],
 )
 async def create_parsing_result(
     code_version_id: int,
     result_create: ParsingResultCreate,
+    response: Response,
+    mode: Literal["sync", "job"] = "sync",
+    inline: bool = True,
     db: AsyncSession = Depends(get_db),
-) -> ParsingResultInDB:
-    db_result = await parsing_service.create_parsing_result(
-        db=db, code_version_id=code_version_id, result_create=result_create
-    )
+    session_factory: sessionmaker = Depends(get_session_factory),
+) -> Union[ParsingResultInDB, JSONResponse]:
+    if mode == "job":
+        db_job = await parse_job_service.enqueue_parse_job(
+            db=db, code_version_id=code_version_id, result_create=result_create
+        )
+        if db_job is None:
+            raise HTTPException(status_code=404, detail="Code version not found")
+        return JSONResponse(
+            status_code=202,
+            content=jsonable_encoder(ParseJobInDB.model_validate(db_job)),
+            headers={"Location": f"/parsing/jobs/{db_job.id}"},
+        )
+
+    with parse_context() as context:
+        db_result = await parsing_service.create_parsing_result(
+            db=db, code_version_id=code_version_id, result_create=result_create, session_factory=session_factory
+        )
     if db_result is None:
         raise HTTPException(status_code=404, detail="Code version not found")
+    response.headers["X-LLM-Queue-Wait-Ms"] = f"{context.queue_wait * 1000:.1f}"
+    if not inline:
+        db_result = await parsing_service.get_parsing_result(db, result_id=int(db_result.id), inline=False)
+        if db_result is None:
+            raise HTTPException(status_code=404, detail="Parsing result not found")
     return db_result
 
 
-@router.get("/results/{result_id}", response_model=ParsingResultInDB)
+@router.post("/code-versions/{code_version_id}/stream", response_class=StreamingResponse)
+async def stream_parsing_result(
+    code_version_id: int,
+    result_create: ParsingResultCreate,
+    db: AsyncSession = Depends(get_db),
+    session_factory: sessionmaker = Depends(get_session_factory),
+) -> StreamingResponse:
+    """
+    Parses a code version and pushes Server-Sent Events as the result fields become available.
+    """
+    if result_create.hedge_after_ms is not None or result_create.deadline_ms is not None:
+        # Streamed fields cannot be taken back for a hedged response or a degraded result
+        raise HTTPException(status_code=422, detail="hedge_after_ms and deadline_ms are not supported when streaming")
+    if await code_version_service.get_code_version(db, version_id=code_version_id) is None:
+        raise HTTPException(status_code=404, detail="Code version not found")
+
+    async def events() -> AsyncIterator[str]:
+        async for event, data in parsing_service.stream_parsing_result(session_factory, code_version_id, result_create):
+            if event == "result":
+                data = ParsingResultInDB.model_validate(data).model_dump(mode="json")
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/batch", response_class=StreamingResponse)
+async def create_parsing_results_batch(
+    batch: ParsingBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    session_factory: sessionmaker = Depends(get_session_factory),
+) -> StreamingResponse:
+    """
+    Parses several code versions and streams one NDJSON line per finished item.
+    """
+    if batch.code_id is not None:
+        if await code_service.get_code(db, code_id=batch.code_id) is None:
+            raise HTTPException(status_code=404, detail="Code not found")
+        code_version_ids = await code_version_service.get_unparsed_code_version_ids(db, code_id=batch.code_id)
+    else:
+        code_version_ids = batch.code_version_ids or []
+
+    async def ndjson_lines() -> AsyncIterator[str]:
+        async for item in parsing_service.stream_parsing_results(
+            session_factory,
+            code_version_ids,
+            ParsingResultCreate(
+                name=batch.name,
+                incremental=batch.incremental,
+                hedge_after_ms=batch.hedge_after_ms,
+                deadline_ms=batch.deadline_ms,
+            ),
+            concurrency=batch.concurrency or PARSE_BATCH_CONCURRENCY,
+        ):
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@router.get("/jobs/{job_id}", response_model=ParseJobInDB, dependencies=[Depends(query_budget(1))])
+async def read_parse_job(job_id: int, db: AsyncSession = Depends(get_db)) -> ParseJobInDB:
+    db_job = await parse_job_service.get_parse_job(db, job_id=job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Parse job not found")
+    return db_job
+
+
+@router.get("/results/{result_id}", response_model=ParsingResultInDB, dependencies=[Depends(query_budget(3))])
 async def read_parsing_result(
-    result_id: int, db: AsyncSession = Depends(get_db)
+    result_id: int, inline: bool = True, db: AsyncSession = Depends(get_db)
 ) -> ParsingResultInDB:
-    db_result = await parsing_service.get_parsing_result(db, result_id=result_id)
+    db_result = await parsing_service.get_parsing_result(db, result_id=result_id, inline=inline)
     if db_result is None:
         raise HTTPException(status_code=404, detail="Parsing result not found")
     return db_result
 
 
-@router.put("/results/{result_id}", response_model=ParsingResultInDB)
+@router.put("/results/{result_id}", response_model=ParsingResultInDB, dependencies=[Depends(query_budget(4))])
 async def update_parsing_result(
     result_id: int,
     result: ParsingResultBase,
@@ -66,14 +185,16 @@ async def delete_parsing_result(result_id: int, db: AsyncSession = Depends(get_d
     "/results/{result_id}/versions",
     response_model=ParsingResultVersionInDB,
     status_code=201,
+    dependencies=[Depends(query_budget(4))],
 )
 async def create_parsing_result_version(
     result_id: int,
     version: ParsingResultVersionCreate,
+    inline: bool = True,
     db: AsyncSession = Depends(get_db),
 ) -> ParsingResultVersionInDB:
     db_result_version = await parsing_service.create_parsing_result_version(
-        db=db, result_id=result_id, version=version
+        db=db, result_id=result_id, version=version, inline=inline
     )
     if db_result_version is None:
         raise HTTPException(status_code=404, detail="Parsing result not found")
@@ -90,3 +211,48 @@ async def delete_parsing_result_version(
     if db_result_version is None:
         raise HTTPException(status_code=404, detail="Parsing result version not found")
     return
+
+
+@router.get("/stats", response_model=ParseSourceStats)
+async def read_parse_source_stats() -> ParseSourceStats:
+    return ParseSourceStats(**parsing_service.get_parse_source_stats())
+
+
+@router.get("/metrics/summary", response_model=ParseMetricsSummary)
+async def read_parse_metrics_summary(
+    window_minutes: int = Query(60, ge=1),
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    db: AsyncSession = Depends(get_db),
+) -> ParseMetricsSummary:
+    until = until or datetime.datetime.utcnow()
+    since = since or until - datetime.timedelta(minutes=window_minutes)
+    return ParseMetricsSummary(**await parse_metrics_service.summarize_parse_metrics(db, since, until))
+
+
+@router.get("/llm/scheduler", response_model=LLMSchedulerStats)
+async def read_llm_scheduler_stats() -> LLMSchedulerStats:
+    return LLMSchedulerStats(**get_llm_scheduler().stats())
+
+
+@router.get("/llm/router", response_model=ModelRouterStats)
+async def read_model_router_stats() -> ModelRouterStats:
+    return ModelRouterStats(**get_model_router().stats())
+
+
+@router.get("/db/stats", response_model=QueryStatsSummary)
+async def read_query_stats() -> QueryStatsSummary:
+    return QueryStatsSummary(**get_query_stats())
+
+
+@router.get("/cache/stats", response_model=ParseCacheStats)
+async def read_parse_cache_stats(db: AsyncSession = Depends(get_db)) -> ParseCacheStats:
+    return ParseCacheStats(**await parse_cache_service.get_cache_stats(db))
+
+
+@router.delete("/cache", response_model=ParseCacheInvalidation)
+async def invalidate_parse_cache(
+    stale_only: bool = False, db: AsyncSession = Depends(get_db)
+) -> ParseCacheInvalidation:
+    deleted = await parse_cache_service.invalidate_cache(db, stale_only=stale_only)
+    return ParseCacheInvalidation(deleted=deleted)
@@ -25,6 +25,26 @@ class CodeVersionInDB(CodeVersionBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class SimilarCodeVersion(BaseModel):
+    code_id: int
+    code_version_id: int
+    version: int
+    similarity: float  # estimated Jaccard similarity of the token shingles
+    parsed: bool
+
+
+class CodeStorageStats(BaseModel):
+    versions: int
+    blobs: int  # distinct contents
+    delta_blobs: int  # stored as a delta against another content
+    logical_bytes: int  # contents of all versions, as uploaded
+    unique_bytes: int  # distinct contents, uncompressed
+    stored_bytes: int  # distinct contents, compressed (or delta-encoded)
+    dedup_ratio: float  # logical_bytes / unique_bytes
+    compression_ratio: float  # unique_bytes / stored_bytes
+    saved_bytes: int
+
+
 class CodeBase(BaseModel):
     name: str
 
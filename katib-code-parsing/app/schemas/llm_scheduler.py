@@ -0,0 +1,28 @@
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class LLMSchedulerStats(BaseModel):
+    queue_depth: int
+    queue_depth_by_priority: Dict[str, int]
+    requests_per_minute: float
+    tokens_per_minute: float
+    waits: int  # number of recent requests the wait statistics cover
+    wait_avg_ms: float
+    wait_p95_ms: float
+    wait_max_ms: float
+    retries: int
+    rate_limited: int
+
+
+class ModelTierStats(BaseModel):
+    model: str
+    attempts: int  # recent outputs of the tier the success rate covers
+    successes: int
+    success_rate: Optional[float] = None
+
+
+class ModelRouterStats(BaseModel):
+    tiers: Dict[str, ModelTierStats]
+    escalations: int
@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+
+
+class ParseCacheStats(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+    entries: int
+
+
+class ParseCacheInvalidation(BaseModel):
+    deleted: int
+
+
+class ParseSourceStats(BaseModel):
+    total: int
+    cache: int
+    incremental: int
+    fast_path: int
+    similar: int
+    llm: int
+    degraded: int
+    fast_path_share: float
+    # LLM outputs decoded, outputs that needed a local repair, and outputs rejected even after repair
+    llm_outputs: int
+    repaired_outputs: int
+    invalid_outputs: int
+    repair_rate: float
+    # Speculative pre-parses started on upload, and explicit parses that waited for one or were served from one
+    speculative_started: int
+    speculative_attached: int
+    speculative_reused: int
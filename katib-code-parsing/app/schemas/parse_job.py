@@ -0,0 +1,25 @@
+import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, computed_field
+
+
+class ParseJobInDB(BaseModel):
+    id: int
+    code_version_id: int
+    name: str
+    status: str
+    attempts: int
+    parsing_result_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def result_location(self) -> Optional[str]:
+        if self.parsing_result_id is None:
+            return None
+        return f"/parsing/results/{self.parsing_result_id}"
@@ -0,0 +1,29 @@
+import datetime
+from typing import Dict
+
+from pydantic import BaseModel
+
+
+class Percentiles(BaseModel):
+    p50: float
+    p90: float
+    p95: float
+    p99: float
+
+
+class ParseMetricsSummary(BaseModel):
+    since: datetime.datetime
+    until: datetime.datetime
+    count: int
+    by_source: Dict[str, int]
+    by_model_tier: Dict[str, int]  # parses whose result came from an LLM call of their own
+    coalesced: int
+    latency_ms: Percentiles  # wall clock of the whole parse
+    # Only over the parses that made LLM requests
+    llm_latency_ms: Percentiles
+    queue_wait_ms: Percentiles
+    total_tokens: Percentiles
+    llm_requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    retries: int
@@ -1,7 +1,9 @@
 import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+from app.common.constants import PARSE_BATCH_MAX_CONCURRENCY
 
 
 class ParsingResultVersionBase(BaseModel):
@@ -20,12 +22,31 @@ class ParsingResultVersionInDB(ParsingResultVersionBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class LLMParseOutput(BaseModel):
+    """
+    The fields a usable LLM parse result must have, checked strictly (no type
+    coercion) after the local repair pass. Other keys are kept as they are.
+    """
+
+    model_config = ConfigDict(strict=True)
+
+    name: str
+    framework: str
+    metric: List[str]
+    parameter: str
+    model_block: str
+    data_block: str
+
+
 class ParsingResultBase(BaseModel):
     name: str
 
 
 class ParsingResultCreate(ParsingResultBase):
-    pass
+    incremental: bool = False  # reuse the unchanged blocks of the previous version's parse
+    # Per-request overrides of LLM_HEDGE_* and LLM_PARSE_DEADLINE; 0 disables hedging or the deadline
+    hedge_after_ms: Optional[int] = Field(default=None, ge=0)
+    deadline_ms: Optional[int] = Field(default=None, ge=0)
 
 
 class ParsingResultInDB(ParsingResultBase):
@@ -35,3 +56,20 @@ class ParsingResultInDB(ParsingResultBase):
     versions: List[ParsingResultVersionInDB] = []
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class ParsingBatchCreate(BaseModel):
+    code_version_ids: Optional[List[int]] = None
+    code_id: Optional[int] = None  # parse every not-yet-parsed version of this code
+    name: str = "Batch Parsing Result"
+    # Options of every item, as in ParsingResultCreate
+    incremental: bool = False
+    hedge_after_ms: Optional[int] = Field(default=None, ge=0)
+    deadline_ms: Optional[int] = Field(default=None, ge=0)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=PARSE_BATCH_MAX_CONCURRENCY)
+
+    @model_validator(mode="after")
+    def check_target(self) -> "ParsingBatchCreate":
+        if (self.code_version_ids is None) == (self.code_id is None):
+            raise ValueError("Exactly one of 'code_version_ids' or 'code_id' must be given")
+        return self
@@ -0,0 +1,20 @@
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class EndpointQueryStats(BaseModel):
+    requests: int
+    statements: int
+    avg_statements: float
+    max_statements: int
+    db_time_ms: float
+    slowest_ms: float
+    slowest_statement: Optional[str] = None
+
+
+class QueryStatsSummary(BaseModel):
+    statements: int  # every statement since startup, including those outside requests
+    slow_queries: int
+    query_budget_exceeded: int
+    endpoints: Dict[str, EndpointQueryStats]  # keyed on "METHOD /path/{param}"
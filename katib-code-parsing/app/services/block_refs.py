@@ -0,0 +1,170 @@
+import itertools
+import json
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.models.parsing_result import ParsingResultVersion
+from app.services.prompt_slicer import BLOCK_KEYS
+
+# A block stored by reference: {"segments": [...]}, where each segment is either a
+# [start_line, start_column, end_line, end_column] range into the code version
+# (lines 1-based, columns 0-based, end exclusive) or literal text, such as the
+# separator between two ranges or a line the LLM reworded.
+SEGMENTS = "segments"
+
+Segment = Union[List[int], str]
+
+
+class LineIndex:
+    """
+    The lines of a code version and where they start, built once and shared by all its blocks.
+    """
+
+    def __init__(self, code_content: str) -> None:
+        self.code_content = code_content
+        self.lines = code_content.split("\n")
+        self.starts = list(itertools.accumulate((len(line) + 1 for line in self.lines[:-1]), initial=0))
+        # 1-based line numbers by line text, and by text without its indentation
+        self.by_text: Dict[str, List[int]] = {}
+        self.by_dedented: Dict[str, List[int]] = {}
+        for number, line in enumerate(self.lines, start=1):
+            self.by_text.setdefault(line, []).append(number)
+            dedented = line.lstrip()
+            if dedented != line:
+                self.by_dedented.setdefault(dedented, []).append(number)
+
+    def offset(self, line: int, column: int) -> int:
+        return self.starts[line - 1] + column
+
+
+def _longest_run(index: LineIndex, text_lines: List[str], first: int, after: int) -> Optional[Tuple[List[int], int]]:
+    """
+    The longest run of text lines starting at `first` that occurs in the code:
+    its first line may be a dedented code line and its last one a prefix of one.
+
+    Returns:
+        The [start_line, start_column, end_line, end_column] range of the run and
+        its number of lines, or None if not even the first line occurs.
+    """
+    text = text_lines[first]
+    candidates = [(number, 0) for number in index.by_text.get(text, [])]
+    candidates += [(number, len(index.lines[number - 1]) - len(text)) for number in index.by_dedented.get(text, [])]
+    # Prefer occurrences following the previous range, so repeated lines map in order
+    candidates.sort(key=lambda candidate: (candidate[0] < after, candidate[0]))
+
+    best: Optional[Tuple[List[int], int]] = None
+    for number, column in candidates:
+        length, end_column = 1, len(index.lines[number - 1])
+        while first + length < len(text_lines) and number + length <= len(index.lines):
+            text_line, code_line = text_lines[first + length], index.lines[number + length - 1]
+            if text_line == code_line:
+                length, end_column = length + 1, len(code_line)
+                continue
+            if text_line and code_line.startswith(text_line):
+                length, end_column = length + 1, len(text_line)
+            break
+        if best is None or length > best[1]:
+            best = [number, column, number + length - 1, end_column], length
+            if first + length == len(text_lines):
+                break
+    return best
+
+
+def encode_block(text: str, code_content: str, index: Optional[LineIndex] = None) -> Optional[List[Segment]]:
+    """
+    Encodes a block as ranges into `code_content`, falling back to literal text
+    for what cannot be found there.
+
+    Args:
+        index: The line index of `code_content`, if already built.
+
+    Returns:
+        The segments, or None if they would not be smaller than the text itself.
+    """
+    index = index or LineIndex(code_content)
+    text_lines = text.split("\n")
+    segments: List[Segment] = []
+    literal = ""
+    line, after = 0, 1
+    while line < len(text_lines):
+        # Blank lines stay literal; they often differ from the blank lines in the source
+        run = _longest_run(index, text_lines, line, after) if text_lines[line] else None
+        if run is None:
+            literal += text_lines[line]
+            line += 1
+        else:
+            if literal:
+                segments.append(literal)
+            segments.append(run[0])
+            literal = ""
+            after = run[0][2]
+            line += run[1]
+        if line < len(text_lines):
+            literal += "\n"
+    if literal:
+        segments.append(literal)
+
+    if len(json.dumps(segments)) >= len(json.dumps(text)):
+        return None
+    return segments
+
+
+def decode_block(segments: List[Segment], code_content: str, index: Optional[LineIndex] = None) -> str:
+    index = index or LineIndex(code_content)
+    parts = []
+    for segment in segments:
+        if isinstance(segment, str):
+            parts.append(segment)
+        else:
+            start_line, start_column, end_line, end_column = segment
+            parts.append(code_content[index.offset(start_line, start_column) : index.offset(end_line, end_column)])
+    return "".join(parts)
+
+
+def is_block_ref(value: object) -> bool:
+    return isinstance(value, dict) and isinstance(value.get(SEGMENTS), list)
+
+
+def compact_blocks(content: dict, code_content: str) -> dict:
+    """
+    Replaces the code blocks of a parse result with references into the code
+    version they were parsed from, where that makes them smaller.
+    """
+    compacted = dict(content)
+    index = LineIndex(code_content)
+    for key in BLOCK_KEYS:
+        text = compacted.get(key)
+        if not isinstance(text, str) or not text:
+            continue
+        segments = encode_block(text, code_content, index)
+        # Only keep references that reproduce the text exactly
+        if segments is not None and decode_block(segments, code_content, index) == text:
+            compacted[key] = {SEGMENTS: segments}
+    return compacted
+
+
+def inline_blocks(content: dict, code_content: str) -> dict:
+    """
+    Rehydrates the block references of a stored parse result into text.
+    """
+    if not any(is_block_ref(content.get(key)) for key in BLOCK_KEYS):
+        return content
+    inlined = dict(content)
+    index = LineIndex(code_content)
+    for key in BLOCK_KEYS:
+        if is_block_ref(inlined.get(key)):
+            inlined[key] = decode_block(inlined[key][SEGMENTS], code_content, index)
+    return inlined
+
+
+def inline_versions(versions: Iterable[ParsingResultVersion], code_content: str) -> None:
+    """
+    Rehydrates loaded versions in place, without marking them as modified, so the
+    session never writes the text back.
+    """
+    for version in versions:
+        content = dict(version.content)
+        inlined = inline_blocks(content, code_content)
+        if inlined is not content:
+            set_committed_value(version, "content", inlined)
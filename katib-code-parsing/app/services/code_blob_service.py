@@ -0,0 +1,71 @@
+from typing import Iterable
+
+from sqlalchemy import delete, exists, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+from app.models.code import CodeVersion
+from app.models.code_blob import CodeBlob
+
+
+async def delete_unreferenced_blobs(db: AsyncSession, hashes: Iterable[str]) -> None:
+    """
+    Deletes the given blobs that no code version references any more, nor any
+    other blob as the base of its delta (then their bases are checked in turn).
+    Call after the versions that referenced them were deleted and flushed.
+    """
+    dependent = aliased(CodeBlob)
+    hashes = set(hashes)
+    while hashes:
+        result = await db.execute(
+            select(CodeBlob.sha256, CodeBlob.base_sha256)
+            .where(CodeBlob.sha256.in_(hashes))
+            .where(~exists().where(CodeVersion.content_hash == CodeBlob.sha256))
+            .where(~exists().where(dependent.base_sha256 == CodeBlob.sha256))
+        )
+        unreferenced = result.all()
+        if not unreferenced:
+            return
+        await db.execute(
+            delete(CodeBlob)
+            .where(CodeBlob.sha256.in_([sha256 for sha256, _ in unreferenced]))
+            .execution_options(synchronize_session="fetch")
+        )
+        hashes = {base_sha256 for _, base_sha256 in unreferenced if base_sha256 is not None}
+
+
+async def get_storage_stats(db: AsyncSession) -> dict:
+    """
+    Returns how much the code version contents take before and after
+    deduplication and compression (including delta storage).
+    """
+    versions, logical_bytes = (
+        await db.execute(
+            select(func.count(CodeVersion.id), func.coalesce(func.sum(CodeBlob.size), 0)).join(
+                CodeBlob, CodeBlob.sha256 == CodeVersion.content_hash
+            )
+        )
+    ).one()
+    blobs, delta_blobs, unique_bytes, stored_bytes = (
+        await db.execute(
+            select(
+                func.count(CodeBlob.sha256),
+                func.count(CodeBlob.base_sha256),
+                func.coalesce(func.sum(CodeBlob.size), 0),
+                func.coalesce(func.sum(CodeBlob.stored_size), 0),
+            )
+        )
+    ).one()
+    return {
+        "versions": versions,
+        "blobs": blobs,
+        "delta_blobs": delta_blobs,
+        "logical_bytes": logical_bytes,
+        "unique_bytes": unique_bytes,
+        "stored_bytes": stored_bytes,
+        # Ratios of 1.0 mean no savings
+        "dedup_ratio": logical_bytes / unique_bytes if unique_bytes else 1.0,
+        "compression_ratio": unique_bytes / stored_bytes if stored_bytes else 1.0,
+        "saved_bytes": logical_bytes - stored_bytes,
+    }
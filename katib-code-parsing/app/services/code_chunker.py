@@ -0,0 +1,101 @@
+import ast
+from collections import Counter
+from typing import Callable, List, Optional
+
+from app.services.prompt_slicer import BLOCK_KEYS, SlicedCode
+
+UNKNOWN_FRAMEWORKS = {"", "unknown", "none"}
+
+
+def top_level_units(code_content: str, sliced: Optional[SlicedCode] = None) -> List[str]:
+    """
+    Splits a script into units that must not be separated: one per top-level
+    statement, with the comments and decorators right above it. Code that does
+    not parse is split into lines.
+
+    Args:
+        sliced: If given, the units hold the sliced lines of each statement instead of the original ones.
+    """
+    lines = code_content.splitlines()
+    try:
+        tree = ast.parse(code_content)
+    except (SyntaxError, ValueError):
+        tree = None
+
+    # Last original line of each unit; lines between two statements belong to the next one
+    ends = [node.end_lineno or node.lineno for node in tree.body] if tree and tree.body else list(range(1, len(lines) + 1))
+    if ends:
+        ends[-1] = max(ends[-1], len(lines))
+
+    if sliced is None:
+        numbered = list(enumerate(lines, start=1))
+    else:
+        numbered = list(zip(sliced.line_map, sliced.text.split("\n"), strict=True))
+
+    units: List[List[str]] = [[] for _ in ends]
+    unit = 0
+    for number, line in numbered:
+        while unit < len(ends) - 1 and number > ends[unit]:
+            unit += 1
+        units[unit].append(line)
+    return ["\n".join(unit_lines) for unit_lines in units if any(line.strip() for line in unit_lines)]
+
+
+def pack_chunks(units: List[str], max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """
+    Greedily packs consecutive units into chunks of at most `max_tokens`.
+    A unit larger than the limit on its own is split between lines.
+    """
+    separator = count_tokens("\n")
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for unit in units:
+        pieces = [unit]
+        if count_tokens(unit) > max_tokens:
+            pieces = pack_chunks(unit.split("\n"), max_tokens, count_tokens) if "\n" in unit else [unit]
+        for piece in pieces:
+            tokens = count_tokens(piece)
+            if current and current_tokens + separator + tokens > max_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current_tokens += tokens + (separator if current else 0)
+            current.append(piece)
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def reduce_chunk_results(results: List[dict]) -> dict:
+    """
+    Merges the per-chunk parse results, in chunk order, into one result.
+
+    The framework is the most common one reported (ties go to the earliest
+    chunk), metrics are the ordered union, and each code block is the
+    concatenation of its non-empty per-chunk candidates.
+    """
+    frameworks = [
+        str(result.get("framework"))
+        for result in results
+        if str(result.get("framework") or "").lower() not in UNKNOWN_FRAMEWORKS
+    ]
+    counts = Counter(frameworks)
+    framework = max(frameworks, key=lambda name: (counts[name], -frameworks.index(name)), default="unknown")
+
+    metrics: List[str] = []
+    for result in results:
+        metric = result.get("metric", result.get("metrics", []))
+        for name in [metric] if isinstance(metric, str) else metric or []:
+            if name not in metrics:
+                metrics.append(name)
+
+    names = [result["name"] for result in results if result.get("name") and result["name"] != "unnamed_code"]
+    merged = {"name": names[0] if names else "unnamed_code", "framework": framework, "metric": metrics}
+    for key in BLOCK_KEYS:
+        candidates: List[str] = []
+        for result in results:
+            block = result.get(key)
+            if isinstance(block, str) and block.strip() and block not in candidates:
+                candidates.append(block)
+        merged[key] = "\n\n".join(candidates)
+    return merged
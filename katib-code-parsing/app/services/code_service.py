@@ -6,18 +6,28 @@ from sqlalchemy.future import select
 from app.models.code import Code, CodeVersion
 from app.models.parsing_result import ParsingResult
 from app.schemas.code import CodeBase, CodeCreate
+from app.services.block_refs import inline_versions
+from app.services.code_blob_service import delete_unreferenced_blobs
+from app.services.similarity_service import index_code_version
+
+
+def _inline_parsing_results(codes: List[Code]) -> None:
+    # Parsing result versions store their blocks as references into the code version
+    for code in codes:
+        for code_version in code.versions:
+            for parsing_result in code_version.parsing_results:
+                inline_versions(parsing_result.versions, str(code_version.content))
 
 
 async def create_code(db: AsyncSession, code: CodeCreate) -> Code:
-    db_code = Code(name=code.name)
+    db_code = Code(name=code.name, latest_version=1)
     db.add(db_code)
-    await db.commit()
-    await db.refresh(db_code)
+    await db.flush()
 
     db_code_version = CodeVersion(code_id=db_code.id, version=1, content=code.content)
     db.add(db_code_version)
     await db.commit()
-    await db.refresh(db_code)
+    await index_code_version(db, db_code_version)
 
     # Fetch the code with its versions eagerly loaded
     from sqlalchemy.orm import selectinload
@@ -49,7 +59,9 @@ async def get_codes(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[C
         .offset(skip)
         .limit(limit)
     )
-    return result.scalars().all()
+    codes = list(result.scalars().all())
+    _inline_parsing_results(codes)
+    return codes
 
 
 async def get_code(db: AsyncSession, code_id: int) -> Optional[Code]:
@@ -64,21 +76,28 @@ async def get_code(db: AsyncSession, code_id: int) -> Optional[Code]:
         )
         .filter(Code.id == code_id)
     )
-    return result.scalars().first()
+    db_code = result.scalars().first()
+    if db_code is not None:
+        _inline_parsing_results([db_code])
+    return db_code
 
 
 async def update_code(db: AsyncSession, code_id: int, code: CodeBase) -> Optional[Code]:
     db_code = await get_code(db, code_id)
     if db_code:
         db_code.name = code.name  # type: ignore
+        # The loaded versions (with inlined parsing results) stay as they are; a refresh would reload them all
         await db.commit()
-        await db.refresh(db_code)
     return db_code
 
 
 async def delete_code(db: AsyncSession, code_id: int) -> Optional[Code]:
     db_code = await get_code(db, code_id)
     if db_code:
+        hashes = [code_version.content_hash for code_version in db_code.versions]
         await db.delete(db_code)
+        await db.flush()
+        # Contents shared with other versions are kept
+        await delete_unreferenced_blobs(db, hashes)
         await db.commit()
     return db_code
@@ -1,38 +1,33 @@
-from typing import Optional
+from typing import List, Optional
 
+from sqlalchemy import exists
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.models.code import CodeVersion
+from app.models.code import Code, CodeVersion
+from app.models.parsing_result import ParsingResult
 from app.schemas.code import CodeVersionCreate
-from app.services.code_service import get_code as get_parent_code
+from app.services.code_blob_service import delete_unreferenced_blobs
+from app.services.similarity_service import find_similar_versions, index_code_version
+from app.services.version_numbering import allocate_version
 
 
 async def create_code_version(
     db: AsyncSession, code_id: int, version: CodeVersionCreate
 ) -> CodeVersion:
-    # Check if the parent code exists
-    parent_code = await get_parent_code(db, code_id)
-    if not parent_code:
+    # Reserve the next version number; None if the parent code does not exist
+    next_version = await allocate_version(db, Code, code_id, CodeVersion, CodeVersion.code_id)
+    if next_version is None:
         return None  # Indicate that the parent code does not exist
 
-    # Get the latest version number for the code
-    result = await db.execute(
-        select(CodeVersion.version)
-        .filter(CodeVersion.code_id == code_id)
-        .order_by(CodeVersion.version.desc())
-        .limit(1)
-    )
-    latest_version = result.scalars().first() or 0
-
     db_code_version = CodeVersion(
         code_id=code_id,
-        version=latest_version + 1,
+        version=next_version,
         content=version.content,
     )
     db.add(db_code_version)
     await db.commit()
-    await db.refresh(db_code_version)
+    await index_code_version(db, db_code_version)
 
     from sqlalchemy.orm import selectinload
 
@@ -51,9 +46,58 @@ async def get_code_version(db: AsyncSession, version_id: int) -> Optional[CodeVe
     return result.scalars().first()
 
 
+async def get_unparsed_code_version_ids(db: AsyncSession, code_id: int) -> List[int]:
+    result = await db.execute(
+        select(CodeVersion.id)
+        .outerjoin(ParsingResult, ParsingResult.code_version_id == CodeVersion.id)
+        .filter(CodeVersion.code_id == code_id)
+        .filter(ParsingResult.id.is_(None))
+        .order_by(CodeVersion.version)
+    )
+    return list(result.scalars().all())
+
+
+async def get_similar_code_versions(
+    db: AsyncSession, code_id: int, version_id: int, min_similarity: Optional[float] = None, limit: int = 10
+) -> Optional[List[dict]]:
+    """
+    Returns the near-duplicates of a code version across all codes, most similar first,
+    or None if the version does not exist or belongs to another code.
+    """
+    code_version = await get_code_version(db, version_id)
+    if code_version is None or code_version.code_id != code_id:
+        return None
+    similar = await find_similar_versions(db, code_version, min_similarity=min_similarity, limit=limit)
+    if not similar:
+        return []
+
+    result = await db.execute(
+        select(
+            CodeVersion.id,
+            CodeVersion.code_id,
+            CodeVersion.version,
+            exists().where(ParsingResult.code_version_id == CodeVersion.id),
+        ).filter(CodeVersion.id.in_([code_version_id for code_version_id, _ in similar]))
+    )
+    rows = {row[0]: row for row in result.all()}
+    return [
+        {
+            "code_id": rows[code_version_id][1],
+            "code_version_id": code_version_id,
+            "version": rows[code_version_id][2],
+            "similarity": round(similarity, 3),
+            "parsed": bool(rows[code_version_id][3]),
+        }
+        for code_version_id, similarity in similar
+        if code_version_id in rows
+    ]
+
+
 async def delete_code_version(db: AsyncSession, version_id: int) -> Optional[CodeVersion]:
     db_code_version = await get_code_version(db, version_id)
     if db_code_version:
         await db.delete(db_code_version)
+        await db.flush()
+        await delete_unreferenced_blobs(db, [str(db_code_version.content_hash)])
         await db.commit()
     return db_code_version
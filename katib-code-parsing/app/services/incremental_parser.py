@@ -0,0 +1,272 @@
+import ast
+import difflib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from app.common.constants import INCREMENTAL_MIN_SIMILARITY
+from app.core.executor import run_analysis
+from app.services.llm_service import parse_blocks_with_llm
+from app.services.prompt_slicer import BLOCK_KEYS, identity_slice, map_block_to_original
+from app.services.static_parser import detect_framework, extract_metrics, extract_parameters, node_lines
+
+# Blocks made of whole top-level statements; "parameter" is nested inside a function
+TOP_LEVEL_BLOCK_KEYS = ("model_block", "data_block")
+
+Span = List[int]
+
+
+@dataclass
+class LineDiff:
+    """
+    Line-level diff between two versions of a script (1-based line numbers).
+    """
+
+    opcodes: Sequence[Tuple[str, int, int, int, int]]
+    similarity: float
+    # Old lines that were replaced or deleted
+    changed: Set[int] = field(default_factory=set)
+    # Old line after which new lines were inserted (0 means before the first line)
+    insertions: Set[int] = field(default_factory=set)
+    # New lines that were added or replaced
+    added: Set[int] = field(default_factory=set)
+
+
+def diff_lines(old_lines: List[str], new_lines: List[str]) -> LineDiff:
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    diff = LineDiff(opcodes=matcher.get_opcodes(), similarity=matcher.ratio())
+    for tag, i1, i2, j1, j2 in diff.opcodes:
+        if tag == "equal":
+            continue
+        diff.changed.update(range(i1 + 1, i2 + 1))
+        diff.added.update(number for number in range(j1 + 1, j2 + 1) if new_lines[number - 1].strip())
+        if tag == "insert":
+            diff.insertions.add(i1)
+    return diff
+
+
+def _map_line(diff: LineDiff, number: int, end: bool) -> int:
+    # Position of an old line in the new code; a changed line maps to the edge of its replacement
+    for tag, i1, i2, j1, j2 in diff.opcodes:
+        if i1 < number <= i2:
+            if tag == "equal":
+                return j1 + number - i1
+            return j2 if end else j1 + 1
+    return 0
+
+
+def map_span(diff: LineDiff, span: Span) -> Optional[Span]:
+    """
+    Maps an old [start, end] span onto the new code, including any lines
+    inserted or replaced inside it. Returns None if the span was deleted.
+    """
+    start, end = _map_line(diff, span[0], end=False), _map_line(diff, span[1], end=True)
+    if start == 0 or end < start:
+        return None
+    return [start, end]
+
+
+def _span_changed(diff: LineDiff, span: Span) -> bool:
+    start, end = span
+    return any(start <= number <= end for number in diff.changed) or any(
+        start <= position < end for position in diff.insertions
+    )
+
+
+def _locate_blocks(previous_result: dict, old_lines: List[str]) -> Optional[Dict[str, List[Span]]]:
+    # Spans of the previous blocks in the previous code, from `block_spans` or by matching their text
+    recorded = previous_result.get("block_spans") or {}
+    identity = identity_slice(old_lines)
+    located: Dict[str, List[Span]] = {}
+    for key in BLOCK_KEYS:
+        block = previous_result.get(key)
+        if not isinstance(block, str) or not block.strip():
+            continue
+        if recorded.get(key):
+            located[key] = [list(span) for span in recorded[key]]
+            continue
+        mapped = map_block_to_original(block, identity)
+        if mapped is None:
+            return None
+        located[key] = mapped[1]
+    return located
+
+
+def _snap_to_statements(tree: ast.Module, lines: List[str], spans: List[Span]) -> List[Span]:
+    # Widens spans to the whole top-level statements they touch, joining spans separated only by blank lines
+    snapped: List[Span] = []
+    for start, end in spans:
+        for node in tree.body:
+            node_start, node_end = node_lines(node)
+            if node_start <= end and node_end >= start:
+                start, end = min(start, node_start), max(end, node_end)
+        if snapped and not any(line.strip() for line in lines[snapped[-1][1] : start - 1]):
+            snapped[-1][1] = max(snapped[-1][1], end)
+        else:
+            snapped.append([start, end])
+    return snapped
+
+
+def _spans_text(lines: List[str], spans: List[Span]) -> str:
+    return "\n\n".join("\n".join(lines[start - 1 : end]) for start, end in spans)
+
+
+def _covered(spans: Dict[str, List[Span]]) -> Set[int]:
+    return {number for block in spans.values() for start, end in block for number in range(start, end + 1)}
+
+
+def _group_lines(numbers: Set[int]) -> List[Span]:
+    spans: List[Span] = []
+    for number in sorted(numbers):
+        if spans and number == spans[-1][1] + 1:
+            spans[-1][1] = number
+        else:
+            spans.append([number, number])
+    return spans
+
+
+@dataclass
+class BlocksRequest:
+    """
+    Blocks of the new code that `rederive_blocks` needs the LLM to extract from an excerpt.
+    """
+
+    excerpt: str
+    keys: List[str]
+
+
+async def parse_incrementally(previous_code: str, previous_result: dict, code_content: str) -> Optional[dict]:
+    """
+    Re-parses a new version of a script against the parse result of a previous version.
+
+    Blocks whose source span did not change are reused as they are. Changed
+    blocks are re-derived with the AST (argument definitions and whole top-level
+    statements) when the new code parses, otherwise with a reduced LLM prompt
+    covering only the changed lines.
+
+    Returns:
+        The new result with an `incremental` entry listing the reused and
+        re-derived blocks, or None if the versions differ too much (or the
+        previous blocks cannot be located) and a full parse is needed.
+    """
+    # The diff and the AST work run in the analysis process pool; only the LLM call happens here
+    result = await run_analysis(rederive_blocks, previous_code, previous_result, code_content, size=len(code_content))
+    if isinstance(result, BlocksRequest):
+        blocks = await parse_blocks_with_llm(result.excerpt, result.keys)
+        result = await run_analysis(
+            rederive_blocks, previous_code, previous_result, code_content, blocks, size=len(code_content)
+        )
+    return result if isinstance(result, dict) else None
+
+
+def rederive_blocks(
+    previous_code: str, previous_result: dict, code_content: str, llm_blocks: Optional[Dict[str, str]] = None
+) -> Union[dict, BlocksRequest, None]:
+    """
+    The CPU-bound part of `parse_incrementally`.
+
+    Returns:
+        The new result, None if a full parse is needed, or a BlocksRequest if
+        the new code does not parse and some blocks need the LLM; calling again
+        with the blocks it extracted as `llm_blocks` completes the result.
+    """
+    old_lines = previous_code.splitlines()
+    new_lines = code_content.splitlines()
+    located = _locate_blocks(previous_result, old_lines)
+    if not located:
+        return None
+    diff = diff_lines(old_lines, new_lines)
+    if diff.similarity < INCREMENTAL_MIN_SIMILARITY:
+        return None
+
+    try:
+        new_tree: Optional[ast.Module] = ast.parse(code_content)
+    except (SyntaxError, ValueError):
+        new_tree = None
+
+    result = {key: value for key, value in previous_result.items() if key not in ("incremental", "confidence")}
+    new_spans: Dict[str, List[Span]] = {}
+    reused: List[str] = []
+    changed: List[str] = []
+    for key, spans in located.items():
+        mapped = [span for span in (map_span(diff, span) for span in spans) if span is not None]
+        new_spans[key] = mapped
+        if any(_span_changed(diff, span) for span in spans):
+            changed.append(key)
+        else:
+            reused.append(key)
+
+    if new_tree is not None:
+        for key in changed:
+            if key == "parameter":
+                result[key] = extract_parameters(new_tree, new_lines)
+                found = map_block_to_original(result[key], identity_slice(new_lines)) if result[key] else None
+                new_spans[key] = found[1] if found else []
+            else:
+                new_spans[key] = _snap_to_statements(new_tree, new_lines, new_spans[key])
+                result[key] = _spans_text(new_lines, new_spans[key])
+        # Top-level statements added outside every block join the block right before them
+        unclaimed = diff.added - _covered(new_spans)
+        for start, end in _snap_to_statements(new_tree, new_lines, _group_lines(unclaimed)):
+            if not any(number in unclaimed for number in range(start, end + 1)):
+                continue
+            owner = max(
+                (key for key in TOP_LEVEL_BLOCK_KEYS if new_spans.get(key) and new_spans[key][0][0] < start),
+                key=lambda key: new_spans[key][-1][1],
+                default=None,
+            )
+            if owner is None:
+                owner = next((key for key in TOP_LEVEL_BLOCK_KEYS if new_spans.get(key)), None)
+            if owner is None:
+                return None
+            new_spans[owner] = _snap_to_statements(new_tree, new_lines, sorted(new_spans[owner] + [[start, end]]))
+            result[owner] = _spans_text(new_lines, new_spans[owner])
+            if owner in reused:
+                reused.remove(owner)
+                changed.append(owner)
+    else:
+        # Without an AST the top-level blocks keep their remapped region, and only the
+        # argument definitions and code added outside every block go to the LLM
+        for key in changed:
+            if key != "parameter":
+                result[key] = _spans_text(new_lines, new_spans[key])
+        unclaimed = diff.added - _covered(new_spans)
+        keys = list(BLOCK_KEYS) if unclaimed else [key for key in changed if key == "parameter"]
+        if keys:
+            excerpt_lines = unclaimed | (_covered({"parameter": new_spans["parameter"]}) if "parameter" in changed else set())
+            if llm_blocks is None:
+                return BlocksRequest(excerpt=_spans_text(new_lines, _group_lines(excerpt_lines)), keys=keys)
+            identity = identity_slice(new_lines)
+            for key in keys:
+                found = map_block_to_original(llm_blocks.get(key) or "", identity)
+                if key == "parameter" and "parameter" in changed:
+                    new_spans[key] = found[1] if found else []
+                elif found is None:
+                    continue
+                else:
+                    # Code added outside every block joins the block the LLM assigned it to
+                    new_spans[key] = _group_lines(_covered({key: new_spans.get(key, []) + found[1]}))
+                result[key] = _spans_text(new_lines, new_spans[key])
+                if key in reused:
+                    reused.remove(key)
+                    changed.append(key)
+
+    # Framework and metrics only change if their static signal did
+    if new_tree is not None:
+        try:
+            old_tree = ast.parse(previous_code)
+        except (SyntaxError, ValueError):
+            old_tree = None
+        if old_tree is not None:
+            framework = detect_framework(new_tree)
+            if framework is not None and framework != detect_framework(old_tree):
+                result["framework"] = framework
+            metrics = extract_metrics(new_tree)
+            if metrics and metrics != extract_metrics(old_tree):
+                result["metric"] = metrics
+
+    result["block_spans"] = {key: spans for key, spans in new_spans.items() if spans}
+    result["incremental"] = {
+        "reused_blocks": [key for key in BLOCK_KEYS if key in reused],
+        "rederived_blocks": [key for key in BLOCK_KEYS if key in changed],
+    }
+    return result
@@ -0,0 +1,60 @@
+import json
+from typing import Any, List, Tuple
+
+
+class JsonMemberScanner:
+    """
+    Incrementally scans a JSON object as it is streamed and returns each
+    top-level member as soon as its value is complete.
+
+    Nested objects, arrays and escaped quotes inside strings are tracked, so a
+    member is only parsed once the comma (or closing brace) that ends it arrives.
+    """
+
+    def __init__(self) -> None:
+        self.buffer = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start = -1
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Adds a chunk of the streamed text.
+
+        Returns:
+            The (key, value) pairs of the members completed by this chunk.
+        """
+        self.buffer += chunk
+        members: List[Tuple[str, Any]] = []
+        while self._position < len(self.buffer):
+            char = self.buffer[self._position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1 and char == "{":
+                    self._member_start = self._position + 1
+            elif char in "}]":
+                if self._depth == 1:
+                    members.extend(self._close_member())
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                members.extend(self._close_member())
+                self._member_start = self._position + 1
+            self._position += 1
+        return members
+
+    def _close_member(self) -> List[Tuple[str, Any]]:
+        text = self.buffer[self._member_start : self._position].strip()
+        if self._member_start < 0 or not text:
+            return []
+        return list(json.loads("{" + text + "}").items())
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, List, Optional
+
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from app.common.exceptions import LLMUnavailableError
+
+BACKEND_LIVE = "live"
+BACKEND_RECORD = "record"
+BACKEND_REPLAY = "replay"
+BACKEND_MODES = (BACKEND_LIVE, BACKEND_RECORD, BACKEND_REPLAY)
+
+# Kinds of recorded answers; a prompt may have been sent both ways
+COMPLETION = "completion"
+CHUNKS = "chunks"
+
+
+def prompt_hash(model: str, messages: List[dict]) -> str:
+    """
+    The cassette key of a request: only the model and the messages decide the answer.
+    """
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Cassette:
+    """
+    Recorded LLM answers keyed by prompt hash, stored as one JSON file.
+
+    New answers are kept in memory until `flush`, so recording does not
+    rewrite the whole file on every request.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.entries: Dict[str, Dict[str, Any]] = json.loads(self.path.read_text()) if self.path.exists() else {}
+
+    def get(self, key: str, kind: str) -> Optional[Any]:
+        return self.entries.get(key, {}).get(kind)
+
+    def put(self, key: str, kind: str, value: Any) -> None:
+        with self._lock:
+            self.entries.setdefault(key, {})[kind] = value
+            self._dirty = True
+
+    def flush(self) -> None:
+        """
+        Writes the answers recorded since the last flush, if any.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Write a sibling file and swap it in, so an interrupted run never leaves a truncated cassette
+            temporary = self.path.with_suffix(self.path.suffix + ".tmp")
+            temporary.write_text(json.dumps(self.entries, indent=1, sort_keys=True, ensure_ascii=False))
+            os.replace(temporary, self.path)
+            self._dirty = False
+
+
+class LLMBackend(ABC):
+    """
+    Answers chat completion requests (the keyword arguments of
+    `chat.completions.create`). Subclasses decide where the answers come from.
+    """
+
+    @abstractmethod
+    async def complete(self, **params: Any) -> ChatCompletion: ...
+
+    @abstractmethod
+    async def stream(self, **params: Any) -> AsyncIterable[ChatCompletionChunk]: ...
+
+    def close(self) -> None:  # noqa: B027 - optional hook, most backends hold nothing
+        """
+        Saves whatever the backend still holds in memory. It stays usable.
+        """
+
+
+class LiveBackend(LLMBackend):
+    """
+    Sends the requests to the provider.
+    """
+
+    def __init__(self, client: Callable[[], AsyncOpenAI]) -> None:
+        self._client = client
+
+    async def complete(self, **params: Any) -> ChatCompletion:
+        return await self._client().chat.completions.create(**params)
+
+    async def stream(self, **params: Any) -> AsyncIterable[ChatCompletionChunk]:
+        return await self._client().chat.completions.create(stream=True, **params)
+
+
+class RecordingBackend(LLMBackend):
+    """
+    Sends the requests to the provider and saves every answer to the cassette.
+    """
+
+    def __init__(self, live: LLMBackend, cassette: Cassette) -> None:
+        self.live = live
+        self.cassette = cassette
+
+    async def complete(self, **params: Any) -> ChatCompletion:
+        response = await self.live.complete(**params)
+        self.cassette.put(prompt_hash(params["model"], params["messages"]), COMPLETION, response.model_dump(mode="json"))
+        return response
+
+    async def stream(self, **params: Any) -> AsyncIterable[ChatCompletionChunk]:
+        stream = await self.live.stream(**params)
+        return self._record(prompt_hash(params["model"], params["messages"]), stream)
+
+    async def _record(self, key: str, stream: AsyncIterable[ChatCompletionChunk]) -> AsyncIterator[ChatCompletionChunk]:
+        chunks = []
+        async for chunk in stream:
+            chunks.append(chunk.model_dump(mode="json"))
+            yield chunk
+        # Only streams read to the end are recorded
+        self.cassette.put(key, CHUNKS, chunks)
+
+    def close(self) -> None:
+        self.cassette.flush()
+
+
+class ReplayBackend(LLMBackend):
+    """
+    Answers from the cassette, without network access.
+
+    Raises:
+        LLMUnavailableError: A request was not recorded.
+    """
+
+    def __init__(self, cassette: Cassette) -> None:
+        self.cassette = cassette
+
+    def _recorded(self, params: Dict[str, Any], kind: str) -> Any:
+        key = prompt_hash(params["model"], params["messages"])
+        recorded = self.cassette.get(key, kind)
+        if recorded is None:
+            raise LLMUnavailableError(f"No recorded LLM {kind} for prompt {key[:12]} in {self.cassette.path}")
+        return recorded
+
+    async def complete(self, **params: Any) -> ChatCompletion:
+        return ChatCompletion.model_validate(self._recorded(params, COMPLETION))
+
+    async def stream(self, **params: Any) -> AsyncIterable[ChatCompletionChunk]:
+        return _replay_chunks([ChatCompletionChunk.model_validate(chunk) for chunk in self._recorded(params, CHUNKS)])
+
+
+async def _replay_chunks(chunks: List[ChatCompletionChunk]) -> AsyncIterator[ChatCompletionChunk]:
+    for chunk in chunks:
+        yield chunk
+
+
+def create_backend(mode: str, client: Callable[[], AsyncOpenAI], cassette_path: Optional[str] = None) -> LLMBackend:
+    """
+    Args:
+        mode: One of BACKEND_MODES.
+        client: Returns the shared provider client (used by live and record).
+        cassette_path: The cassette file, required by record and replay.
+    """
+    if mode not in BACKEND_MODES:
+        raise ValueError(f"Unknown LLM backend {mode!r}, expected one of {', '.join(BACKEND_MODES)}")
+    if mode == BACKEND_LIVE:
+        return LiveBackend(client)
+    if not cassette_path:
+        raise ValueError(f"The {mode} LLM backend needs a cassette file")
+    if mode == BACKEND_RECORD:
+        return RecordingBackend(LiveBackend(client), Cassette(cassette_path))
+    return ReplayBackend(Cassette(cassette_path))
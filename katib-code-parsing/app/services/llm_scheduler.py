@@ -0,0 +1,295 @@
+import asyncio
+import email.utils
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+import openai
+
+from app.common.constants import (
+    LLM_MAX_RETRIES,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_TOKENS_PER_MINUTE,
+)
+from app.common.exceptions import LLMRateLimitError, LLMUnavailableError
+from app.core import metrics
+from app.core.parse_context import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_SPECULATIVE,
+    ParseContext,
+    current_parse_context,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch", PRIORITY_SPECULATIVE: "speculative"}
+
+# Provider errors worth retrying; anything else (bad request, authentication, ...) fails right away
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+# Number of recent queue waits kept for the statistics
+WAIT_SAMPLES = 1000
+
+
+class TokenBucket:
+    """
+    Allows `per_minute` units per minute with bursts of up to one minute's worth.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Seconds until `amount` units are available (requests larger than the
+        bucket only need a full bucket).
+        """
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def consume(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+
+@dataclass
+class _ModelQueue:
+    requests: TokenBucket
+    tokens: TokenBucket
+    # Heap of [priority, sequence, parse context] waiters; the head is the next request allowed through
+    waiting: List[List[Any]] = field(default_factory=list)
+    # Set from a provider Retry-After: nothing is sent to this model before then
+    paused_until: float = 0.0
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Reads the delay the provider asked for from a `retry-after-ms` or
+    `retry-after` (seconds or HTTP date) response header.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            retry_at = email.utils.parsedate_to_datetime(value)
+            return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMScheduler:
+    """
+    Admits outbound LLM requests under per-model requests-per-minute and
+    tokens-per-minute budgets, serving queued requests by priority (interactive
+    parses before batch and speculative ones, FIFO within a priority), and
+    retries provider failures with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+        max_retries: int = LLM_MAX_RETRIES,
+        base_delay: float = LLM_RETRY_BASE_DELAY,
+        max_delay: float = LLM_RETRY_MAX_DELAY,
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.loop = asyncio.get_running_loop()
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._condition = asyncio.Condition()
+        self._sequence = itertools.count()
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _queue(self, model: str) -> _ModelQueue:
+        if model not in self._queues:
+            self._queues[model] = _ModelQueue(
+                requests=TokenBucket(self.requests_per_minute), tokens=TokenBucket(self.tokens_per_minute)
+            )
+        return self._queues[model]
+
+    def backoff(self, attempt: int) -> float:
+        # "Full jitter": a random delay up to the exponential bound
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    async def acquire(
+        self, model: str, tokens: int, priority: int = PRIORITY_INTERACTIVE, context: Optional[ParseContext] = None
+    ) -> float:
+        """
+        Waits until the request may be sent.
+
+        Args:
+            context: The parse the request belongs to, so `promote` can move it up the queue.
+
+        Returns:
+            The time spent waiting, in seconds.
+        """
+        queue = self._queue(model)
+        waiter = [priority, next(self._sequence), context]
+        started = time.monotonic()
+        async with self._condition:
+            heapq.heappush(queue.waiting, waiter)
+            try:
+                while True:
+                    timeout = None
+                    if queue.waiting[0] is waiter:
+                        now = time.monotonic()
+                        timeout = max(
+                            queue.paused_until - now,
+                            queue.requests.wait_time(1, now),
+                            queue.tokens.wait_time(tokens, now),
+                        )
+                        if timeout <= 0:
+                            heapq.heappop(queue.waiting)
+                            queue.requests.consume(1, now)
+                            queue.tokens.consume(tokens, now)
+                            self._condition.notify_all()
+                            break
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if waiter in queue.waiting:
+                    queue.waiting.remove(waiter)
+                    heapq.heapify(queue.waiting)
+                    self._condition.notify_all()
+                raise
+
+        waited = time.monotonic() - started
+        self._waits.append(waited)
+        return waited
+
+    async def promote(self, context: ParseContext, priority: int) -> None:
+        """
+        Raises the priority of a parse, including its requests already queued,
+        e.g. when an interactive request starts waiting for a speculative parse.
+        """
+        if priority >= context.priority:
+            return
+        context.priority = priority
+        async with self._condition:
+            for queue in self._queues.values():
+                for waiter in queue.waiting:
+                    if waiter[2] is context:
+                        waiter[0] = priority
+                heapq.heapify(queue.waiting)
+            self._condition.notify_all()
+
+    async def _pause(self, model: str, seconds: float) -> None:
+        queue = self._queue(model)
+        async with self._condition:
+            queue.paused_until = max(queue.paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+    async def call(
+        self, request: Callable[[], Awaitable[T]], model: str, tokens: int, priority: Optional[int] = None
+    ) -> T:
+        """
+        Sends a request through the queue, retrying rate limits, timeouts and
+        server errors. The priority defaults to the current parse context's
+        (read again for every attempt, as the parse may have been promoted).
+
+        Raises:
+            LLMRateLimitError: The provider still rate limited the request after every retry.
+            LLMUnavailableError: The provider could not be reached, kept failing or rejected the request.
+        """
+        context = current_parse_context()
+
+        for attempt in range(self.max_retries + 1):
+            if priority is not None:
+                waited = await self.acquire(model, tokens, priority)
+            else:
+                waited = await self.acquire(model, tokens, context.priority if context else PRIORITY_INTERACTIVE, context)
+            if context is not None:
+                context.queue_wait += waited
+            try:
+                return await request()
+            except RETRYABLE_ERRORS as e:
+                retry_after = retry_after_seconds(e)
+                if isinstance(e, openai.RateLimitError):
+                    self.rate_limited += 1
+                    metrics.increment("llm.rate_limited")
+                if attempt == self.max_retries:
+                    if isinstance(e, openai.RateLimitError):
+                        raise LLMRateLimitError("LLM provider rate limit exceeded", retry_after=retry_after) from e
+                    raise LLMUnavailableError(f"LLM provider unavailable: {e}") from e
+
+                self.retries += 1
+                metrics.increment("llm.retries")
+                if context is not None:
+                    context.retries += 1
+                logger.warning("LLM request failed (%s), retry %d of %d", e, attempt + 1, self.max_retries)
+                if retry_after is not None:
+                    # Hold back every request to this model, not only this one
+                    await self._pause(model, retry_after)
+                else:
+                    await asyncio.sleep(self.backoff(attempt))
+            except openai.APIError as e:
+                raise LLMUnavailableError(f"LLM request rejected: {e}") from e
+        raise AssertionError("unreachable")
+
+    def stats(self) -> dict:
+        depth_by_priority = {name: 0 for name in PRIORITY_NAMES.values()}
+        for queue in self._queues.values():
+            for waiter in queue.waiting:
+                depth_by_priority[PRIORITY_NAMES[waiter[0]]] += 1
+        waits = sorted(self._waits)
+        return {
+            "queue_depth": sum(depth_by_priority.values()),
+            "queue_depth_by_priority": depth_by_priority,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "waits": len(waits),
+            "wait_avg_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "wait_p95_ms": round(waits[int(0.95 * (len(waits) - 1))] * 1000, 1) if waits else 0.0,
+            "wait_max_ms": round(waits[-1] * 1000, 1) if waits else 0.0,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+        }
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """
+    Returns the process-wide scheduler, creating it for the running event loop.
+    """
+    global _scheduler
+    if _scheduler is None or _scheduler.loop is not asyncio.get_running_loop():
+        _scheduler = LLMScheduler()
+    return _scheduler
+
@@ -1,13 +1,175 @@
 # ruff: noqa: E501
 
-import json
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Deque, List, Optional, Tuple, TypeVar
 
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from pydantic import ValidationError
 
-from app.common.constants import OPENAI_API_KEY
+from app.common.constants import (
+    FAST_PATH_MIN_CONFIDENCE,
+    LLM_BACKEND,
+    LLM_BASE_URL,
+    LLM_CASSETTE,
+    LLM_CHUNK_TOKENS,
+    LLM_CONNECT_TIMEOUT,
+    LLM_HEDGE_AFTER,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_PERCENTILE,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_PROMPT_TOKENS,
+    LLM_MODEL,
+    LLM_PARSE_DEADLINE,
+    LLM_PROMPT_SLICING,
+    LLM_READ_TIMEOUT,
+    OPENAI_API_KEY,
+)
+from app.common.exceptions import LLMResponseError
+from app.core import metrics
+from app.core.executor import run_analysis
+from app.core.parse_context import current_parse_context
+from app.schemas.parsing_result import LLMParseOutput
+from app.services.code_chunker import pack_chunks, reduce_chunk_results, top_level_units
+from app.services.json_stream_parser import JsonMemberScanner
+from app.services.llm_backend import LLMBackend, create_backend
+from app.services.llm_scheduler import get_llm_scheduler
+from app.services.model_router import TIER_LARGE, TIER_SMALL, get_model_router
+from app.services.output_repair import canonical_key, coerce_field, decode_output, repair_fields
+from app.services.parse_metrics_service import percentile
+from app.services.prompt_slicer import BLOCK_KEYS, SlicedCode, map_block_to_original, restore_blocks, slice_code
+from app.services.static_parser import analyze_code
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# One shared client (and HTTP connection pool) per process, created lazily on first use
+_client: Optional[AsyncOpenAI] = None
+_base_url: Optional[str] = LLM_BASE_URL
+_semaphore: Optional[asyncio.Semaphore] = None
+_max_concurrency: int = LLM_MAX_CONCURRENCY
+# Where completions come from (live provider, or a recorded cassette); created lazily like the client
+_backend: Optional[LLMBackend] = None
+_backend_mode: str = LLM_BACKEND
+_cassette_path: Optional[str] = LLM_CASSETTE
+
+LLM_TIMEOUT = httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+# Bump whenever the text produced by get_llm_prompt changes, so cached parses are not reused.
+PROMPT_TEMPLATE_VERSION = "3"
+
+HEDGED_REQUESTS = "llm.hedged"
+HEDGE_WINS = "llm.hedge_wins"
+DEGRADED_PARSES = "llm.degraded"
+TIER_ESCALATIONS = "llm.tier_escalations"
+# Outputs decoded, outputs that needed a local repair, and outputs rejected even after repair
+LLM_OUTPUTS = "llm.outputs"
+REPAIRED_OUTPUTS = "llm.outputs_repaired"
+INVALID_OUTPUTS = "llm.outputs_invalid"
+
+# Latencies of recent LLM requests, from which the hedge delay is derived
+_latencies: Deque[float] = deque(maxlen=500)
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]|\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap approximation of the number of LLM tokens in a piece of code
+    (one token per identifier, number, punctuation character and line break).
+    """
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def get_llm_client() -> AsyncOpenAI:
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=_base_url,
+            timeout=LLM_TIMEOUT,
+            # Retries are left to the scheduler, which also honours Retry-After across requests
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                timeout=LLM_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                ),
+            ),
+        )
+    return _client
+
+
+def get_llm_backend() -> LLMBackend:
+    global _backend
+    if _backend is None:
+        _backend = create_backend(_backend_mode, get_llm_client, _cassette_path)
+    return _backend
+
+
+def configure_llm_backend(mode: str, cassette_path: Optional[str] = None) -> None:
+    """
+    Switches where completions come from.
+
+    Args:
+        mode: "live", "record" (live, saving every answer to the cassette) or
+            "replay" (answers from the cassette only).
+        cassette_path: The cassette file, required by record and replay.
+    """
+    global _backend, _backend_mode, _cassette_path
+    # Fail now, keeping the current backend, rather than on the first parse
+    backend = create_backend(mode, get_llm_client, cassette_path)
+    if _backend is not None:
+        _backend.close()
+    _backend = backend
+    _backend_mode = mode
+    _cassette_path = cassette_path
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(_max_concurrency)
+    return _semaphore
+
+
+async def configure_llm_client(
+    base_url: Optional[str] = None, max_concurrency: Optional[int] = None
+) -> None:
+    """
+    Replaces the shared client settings. The next call creates a fresh client.
+    Latencies observed for hedging are dropped, as they were for the old endpoint.
+
+    Args:
+        base_url: Base URL of an OpenAI-compatible API. None uses the default endpoint.
+        max_concurrency: Cap on concurrent in-flight completions.
+    """
+    global _base_url, _max_concurrency
+    await close_llm_client()
+    _latencies.clear()
+    _base_url = base_url
+    if max_concurrency is not None:
+        _max_concurrency = max_concurrency
+
+
+async def close_llm_client() -> None:
+    global _client, _semaphore
+    if _backend is not None:
+        # Saves what a recording backend has not written yet
+        _backend.close()
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _semaphore = None
 
 
 def get_llm_prompt(code_content: str) -> str:
@@ -24,7 +186,7 @@ You are a helpful assistant that parses machine learning code into logical block
 4. Isolate the code block responsible for defining the model architecture ("model_block").
 5. Isolate the code block responsible for command-line argument parsing where hyperparameters are defined ("parameter").
 6. Isolate the code block responsible for loading data, preprocessing, training, and evaluation ("data_block"). If there is a line in this code that runs the main function, add it to this block.
-7. Format the output as a single JSON object without any additional explanations or markdown formatting.
+7. Format the output as a single JSON object without any additional explanations or markdown formatting, with the keys in this order: "name", "framework", "metric", "model_block", "parameter", "data_block".
 
 **Python Code:**
 ```python
@@ -36,48 +198,486 @@ You are a helpful assistant that parses machine learning code into logical block
 """
 
 
-async def parse_code_with_llm(code_content: str) -> dict:
+def get_llm_chunk_prompt(code_chunk: str, index: int, total: int) -> str:
+    """
+    Generates the prompt for one chunk of a script too large for a single prompt.
+    """
+    return f"""
+You are a helpful assistant that parses machine learning code into logical blocks.
+
+The following code is part {index} of {total} of a larger Python script, split between top-level statements.
+
+**Instructions:**
+1. Identify the machine learning framework used in this part, or "unknown" if it cannot be told from this part alone.
+2. Extract the names of the metrics used for evaluation in this part.
+3. Copy the code of this part that defines the model architecture ("model_block").
+4. Copy the command-line argument definitions in this part where hyperparameters are defined ("parameter").
+5. Copy the code of this part that loads data, preprocesses, trains and evaluates ("data_block"), including a line that runs the main function.
+6. Use an empty string for a block that is not in this part.
+7. Format the output as a single JSON object with the keys "name", "framework", "metric", "model_block", "parameter", "data_block", without any additional explanations or markdown formatting.
+
+**Python Code (part {index} of {total}):**
+```python
+{code_chunk}
+```
+
+**JSON Output:**
+```json
+"""
+
+
+def parse_code_with_fast_path(
+    code_content: str, min_confidence: float = FAST_PATH_MIN_CONFIDENCE
+) -> Optional[dict]:
+    """
+    First-stage parser: statically analyzes the code with `ast`, without an LLM call.
+
+    Args:
+        code_content: The string content of the python code.
+        min_confidence: Results scoring below this are discarded.
+
+    Returns:
+        The parse result (with its `confidence`), or None if the LLM is needed.
+    """
+    result, confidence = analyze_code(code_content)
+    if result is None or confidence < min_confidence:
+        return None
+    result["confidence"] = confidence
+    return result
+
+
+def _get_llm_messages(prompt: str) -> List[dict]:
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant that parses machine learning code into logical blocks and outputs JSON.",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _request_tokens(prompt: str) -> int:
+    # Budgeted tokens of a request: the prompt, plus about as much again for the
+    # completion, which quotes the code blocks back
+    return 2 * estimate_tokens(prompt)
+
+
+def _count_output(repairs: List[str]) -> None:
+    metrics.increment(LLM_OUTPUTS)
+    if repairs:
+        metrics.increment(REPAIRED_OUTPUTS)
+        for kind in sorted(set(repairs)):
+            metrics.increment(f"llm.repairs.{kind}")
+
+
+def _decode_completion(content: Optional[str]) -> dict:
+    # Decodes an LLM output, repairing near misses locally instead of paying for another LLM call
+    try:
+        parsed, repairs = decode_output(content)
+        parsed_json, field_repairs = repair_fields(parsed)
+    except LLMResponseError:
+        metrics.increment(LLM_OUTPUTS)
+        metrics.increment(INVALID_OUTPUTS)
+        raise
+    _count_output(repairs + field_repairs)
+    return parsed_json
+
+
+def validate_result(parsed_json: dict) -> None:
+    """
+    Raises:
+        LLMResponseError: The (repaired) result does not match the strict output schema.
+    """
+    try:
+        LLMParseOutput.model_validate(parsed_json)
+    except ValidationError as e:
+        metrics.increment(INVALID_OUTPUTS)
+        fields = ", ".join(".".join(str(part) for part in error["loc"]) for error in e.errors())
+        raise LLMResponseError(f"LLM output does not match the result schema ({fields})") from e
+
+
+def _record_usage(usage: Optional[CompletionUsage], elapsed: float, model: str = LLM_MODEL) -> None:
+    # Adds a finished LLM request to the hedging latency samples and the current parse's accounting
+    _latencies.append(elapsed)
+    context = current_parse_context()
+    if context is None:
+        return
+    context.model = model
+    context.llm_requests += 1
+    context.llm_latency += elapsed
+    if usage is not None:
+        context.prompt_tokens += usage.prompt_tokens
+        context.completion_tokens += usage.completion_tokens
+
+
+def _record_model_tier(tier: str) -> None:
+    context = current_parse_context()
+    if context is not None:
+        context.model_tier = tier
+
+
+def get_hedge_delay() -> float:
+    """
+    Seconds a request may run before it is hedged: the LLM_HEDGE_PERCENTILE
+    latency of recent requests, or LLM_HEDGE_AFTER until enough are known.
+    0 if hedging is disabled.
+    """
+    if LLM_HEDGE_PERCENTILE <= 0:
+        return 0.0
+    if len(_latencies) < LLM_HEDGE_MIN_SAMPLES:
+        return LLM_HEDGE_AFTER
+    return percentile(sorted(_latencies), LLM_HEDGE_PERCENTILE)
+
+
+async def _hedge(send: Callable[[asyncio.Event], Awaitable[T]], hedge_after: float) -> T:
+    """
+    Sends a request and, if it is still unanswered `hedge_after` seconds after
+    it went out (time spent queued in the scheduler does not count), sends a
+    duplicate. The first successful answer wins and the other call is cancelled.
+
+    Args:
+        send: Starts one call; it sets the given event once the request is actually sent.
+        hedge_after: Hedge budget in seconds, 0 to never hedge.
+    """
+    sent = asyncio.Event()
+    primary = asyncio.ensure_future(send(sent))
+    if hedge_after <= 0:
+        return await primary
+
+    calls = {primary}
+    waiter = asyncio.ensure_future(sent.wait())
+    try:
+        await asyncio.wait({primary, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        if not primary.done():
+            await asyncio.wait({primary}, timeout=hedge_after)
+        if primary.done():
+            return primary.result()
+
+        logger.info("LLM request unanswered after %.1fs, sending a hedged request", hedge_after)
+        metrics.increment(HEDGED_REQUESTS)
+        hedge = asyncio.ensure_future(send(asyncio.Event()))
+        calls.add(hedge)
+        error: Optional[BaseException] = None
+        while calls:
+            done, calls = await asyncio.wait(calls, return_when=asyncio.FIRST_COMPLETED)
+            for call in done:
+                if call.exception() is None:
+                    if call is hedge:
+                        metrics.increment(HEDGE_WINS)
+                    return call.result()
+                error = call.exception()
+        assert error is not None
+        raise error
+    finally:
+        waiter.cancel()
+        for call in calls:
+            call.cancel()
+
+
+async def _request_json_completion(
+    prompt: str, hedge_after: Optional[float] = None, model: str = LLM_MODEL
+) -> dict:
+    def send(sent: asyncio.Event) -> Awaitable[ChatCompletion]:
+        async def request() -> ChatCompletion:
+            async with _get_semaphore():
+                sent.set()
+                started = time.perf_counter()
+                response = await get_llm_backend().complete(
+                    model=model,
+                    messages=_get_llm_messages(prompt),
+                    temperature=0,
+                    response_format={"type": "json_object"},
+                    timeout=LLM_TIMEOUT,
+                )
+                _record_usage(response.usage, time.perf_counter() - started, model)
+                return response
+
+        return get_llm_scheduler().call(request, model=model, tokens=_request_tokens(prompt))
+
+    response = await _hedge(send, get_hedge_delay() if hedge_after is None else hedge_after)
+    return _decode_completion(response.choices[0].message.content)
+
+
+def get_degraded_result(code_content: str) -> dict:
+    """
+    The best result available without the LLM: the static analysis, however
+    confident, or an empty result if the code does not parse. Marked `degraded`.
+    """
+    result, confidence = analyze_code(code_content)
+    if result is None:
+        result = {
+            "name": "unnamed_code",
+            "framework": "unknown",
+            "metric": [],
+            "parameter": "",
+            "model_block": "",
+            "data_block": "",
+        }
+    result["confidence"] = confidence
+    result["degraded"] = True
+    return result
+
+
+async def route_parse(code_content: str) -> str:
+    """
+    Returns the model tier an LLM parse of the code goes to: the large one for
+    scripts parsed in chunks, otherwise the model router's choice.
+    """
+    sliced = await run_analysis(slice_code, code_content, size=len(code_content)) if LLM_PROMPT_SLICING else None
+    prompt_tokens = estimate_tokens(get_llm_prompt(sliced.text if sliced else code_content))
+    if prompt_tokens > LLM_MAX_PROMPT_TOKENS:
+        return TIER_LARGE
+    return get_model_router().choose(code_content, prompt_tokens)
+
+
+async def parse_code_with_llm(
+    code_content: str,
+    hedge_after: Optional[float] = None,
+    deadline: Optional[float] = None,
+    model_tier: Optional[str] = None,
+) -> dict:
     """
     Parses the given machine learning code using an LLM.
 
     Args:
         code_content: The string content of the python code.
+        hedge_after: Seconds after which an unanswered LLM request is hedged
+            (0 disables hedging). Defaults to `get_hedge_delay()`.
+        deadline: Seconds after which the LLM parse is abandoned for
+            `get_degraded_result` (0 disables it). Defaults to LLM_PARSE_DEADLINE.
+        model_tier: The tier `route_parse` picked, for callers that key on it
+            beforehand. Routed here if not given.
 
     Returns:
         A dictionary containing the parsed code blocks and metadata.
+
+    Raises:
+        LLMServiceError: The provider rate limited or failed the request after
+            every retry, or did not return a usable result.
+    """
+    deadline = LLM_PARSE_DEADLINE if deadline is None else deadline
+    try:
+        return await asyncio.wait_for(_parse_code_with_llm(code_content, hedge_after, model_tier), deadline or None)
+    except asyncio.TimeoutError:
+        logger.warning("LLM parse missed its %.1fs deadline, returning a degraded result", deadline)
+        metrics.increment(DEGRADED_PARSES)
+        return await run_analysis(get_degraded_result, code_content, size=len(code_content))
+
+
+async def _parse_code_with_llm(code_content: str, hedge_after: Optional[float], model_tier: Optional[str]) -> dict:
+    sliced = await run_analysis(slice_code, code_content, size=len(code_content)) if LLM_PROMPT_SLICING else None
+    prompt = get_llm_prompt(sliced.text if sliced else code_content)
+
+    # Pre-flight: scripts over the prompt budget are parsed in chunks instead of being truncated
+    prompt_tokens = estimate_tokens(prompt)
+    if prompt_tokens > LLM_MAX_PROMPT_TOKENS:
+        parsed_json = await _parse_code_in_chunks(code_content, sliced, hedge_after)
+        validate_result(parsed_json)
+        _record_model_tier(TIER_LARGE)
+    else:
+        parsed_json = await _parse_with_model_tier(code_content, prompt, prompt_tokens, hedge_after, model_tier)
+
+    # Point the blocks back at the original (unsliced) source
+    if sliced is not None:
+        parsed_json = restore_blocks(parsed_json, sliced)
+
+    return parsed_json
+
+
+def is_valid_result(parsed_json: dict) -> bool:
+    try:
+        validate_result(parsed_json)
+    except LLMResponseError:
+        return False
+    return True
+
+
+async def _parse_with_model_tier(
+    code_content: str, prompt: str, prompt_tokens: int, hedge_after: Optional[float], model_tier: Optional[str] = None
+) -> dict:
+    """
+    Sends the prompt to `model_tier`, or the model tier the router picks.
+    Output of the small model that does not validate, even after local repair,
+    is discarded and the large model asked instead.
+
+    Raises:
+        LLMResponseError: The large model's output does not validate either.
     """
-    prompt = get_llm_prompt(code_content)
+    router = get_model_router()
+    tier = model_tier or router.choose(code_content, prompt_tokens)
+    if tier == TIER_SMALL:
+        try:
+            parsed_json = await _request_json_completion(prompt, hedge_after, router.models[tier])
+            valid = is_valid_result(parsed_json)
+        except LLMResponseError:
+            valid = False
+        router.record(tier, valid)
+        if valid:
+            _record_model_tier(tier)
+            return parsed_json
+        logger.info("Output of the small model failed validation, escalating to %s", router.models[TIER_LARGE])
+        router.record_escalation()
+        metrics.increment(TIER_ESCALATIONS)
+        tier = TIER_LARGE
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that parses machine learning code into logical blocks and outputs JSON.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0,
-            response_format={"type": "json_object"},
+        parsed_json = await _request_json_completion(prompt, hedge_after, router.models[tier])
+        validate_result(parsed_json)
+    except LLMResponseError:
+        router.record(tier, False)
+        raise
+    router.record(tier, True)
+    _record_model_tier(tier)
+    return parsed_json
+
+
+async def _parse_code_in_chunks(
+    code_content: str, sliced: Optional[SlicedCode], hedge_after: Optional[float] = None
+) -> dict:
+    units = await run_analysis(top_level_units, code_content, sliced, size=len(code_content))
+    chunks = pack_chunks(units, LLM_CHUNK_TOKENS, estimate_tokens)
+    logger.info("Parsing a %d-line script in %d chunks", len(code_content.splitlines()), len(chunks))
+    metrics.increment("llm.chunked_parses")
+    metrics.increment("llm.chunks", len(chunks))
+    results = await asyncio.gather(
+        *(
+            _request_json_completion(get_llm_chunk_prompt(chunk, index, len(chunks)), hedge_after)
+            for index, chunk in enumerate(chunks, start=1)
         )
+    )
+    return reduce_chunk_results(list(results))
 
-        response_content = response.choices[0].message.content
-        if response_content is None:
-            raise ValueError("LLM response content is empty")
 
-        parsed_json = json.loads(response_content)
+async def stream_parse_code_with_llm(
+    code_content: str, model_tier: Optional[str] = None
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Parses the code with a streaming LLM completion.
 
-        # Ensure 'name' field exists, default to 'unnamed_code' if not present
-        if "name" not in parsed_json:
-            parsed_json["name"] = "unnamed_code"
+    Args:
+        code_content: The string content of the python code.
+        model_tier: The tier `route_parse` picked. Only the large model's output
+            is streamed: the small model's may still be discarded for the large
+            one's, which cannot be taken back once pushed, so it is pushed at once.
 
-        # Rename 'metrics' to 'metric' if 'metrics' exists
-        if "metrics" in parsed_json:
-            parsed_json["metric"] = parsed_json.pop("metrics")
+    Yields:
+        A (key, value) pair for every top-level member of the result as soon as
+        it is complete (code blocks already point at the original source), then
+        ("result", parsed_json) with the full result as `parse_code_with_llm` returns it.
+    """
+    sliced = await run_analysis(slice_code, code_content, size=len(code_content)) if LLM_PROMPT_SLICING else None
+    prompt = get_llm_prompt(sliced.text if sliced else code_content)
+    if estimate_tokens(prompt) > LLM_MAX_PROMPT_TOKENS or model_tier == TIER_SMALL:
+        # Chunked parses cannot be streamed; push the merged result at once
+        merged = await parse_code_with_llm(code_content, model_tier=model_tier)
+        for key, value in merged.items():
+            if key != "block_spans":
+                yield key, value
+        yield "result", merged
+        return
 
-        return parsed_json
+    scanner = JsonMemberScanner()
+    parsed_json: dict = {}
+    block_spans: dict = {}
+    repairs: List[str] = []
 
-    except Exception as e:
-        print(f"An error occurred while parsing with LLM: {e}")
-        raise
+    semaphore = _get_semaphore()
+
+    async def request() -> AsyncIterable[ChatCompletionChunk]:
+        # Like `_request_json_completion`, the slot is taken before the request is sent;
+        # it is held until the stream is consumed, and given back if the request fails
+        await semaphore.acquire()
+        try:
+            return await get_llm_backend().stream(
+                model=LLM_MODEL,
+                messages=_get_llm_messages(prompt),
+                temperature=0,
+                response_format={"type": "json_object"},
+                timeout=LLM_TIMEOUT,
+                stream_options={"include_usage": True},
+            )
+        except BaseException:
+            semaphore.release()
+            raise
+
+    started = time.perf_counter()
+    usage: Optional[CompletionUsage] = None
+    stream = await get_llm_scheduler().call(request, model=LLM_MODEL, tokens=_request_tokens(prompt))
+    try:
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            try:
+                members = scanner.feed(chunk.choices[0].delta.content)
+            except ValueError as e:
+                metrics.increment(LLM_OUTPUTS)
+                metrics.increment(INVALID_OUTPUTS)
+                raise LLMResponseError(f"LLM returned invalid JSON: {e}") from e
+            for key, value in members:
+                canonical = canonical_key(key)
+                if canonical != key and canonical not in parsed_json:
+                    key = canonical
+                    repairs.append("key_alias")
+                value, repair = coerce_field(key, value)
+                if repair:
+                    repairs.append(repair)
+                if sliced is not None and key in BLOCK_KEYS and isinstance(value, str):
+                    mapped = map_block_to_original(value, sliced)
+                    if mapped is not None:
+                        value, block_spans[key] = mapped
+                parsed_json[key] = value
+                yield key, value
+    finally:
+        semaphore.release()
+
+    _record_usage(usage, time.perf_counter() - started)
+    if not parsed_json:
+        metrics.increment(LLM_OUTPUTS)
+        metrics.increment(INVALID_OUTPUTS)
+        raise LLMResponseError("LLM response content is empty")
+    parsed_json.setdefault("name", "unnamed_code")
+    _count_output(repairs)
+    validate_result(parsed_json)
+    if block_spans:
+        parsed_json["block_spans"] = block_spans
+    # Streamed output cannot be taken back, so streaming always uses the large model
+    _record_model_tier(TIER_LARGE)
+    yield "result", parsed_json
+
+
+def get_llm_block_prompt(code_excerpt: str, block_keys: List[str]) -> str:
+    """
+    Generates a reduced prompt that re-derives only some blocks from the changed part of a script.
+    """
+    keys = ", ".join(f'"{key}"' for key in block_keys)
+    return f"""
+You are a helpful assistant that parses machine learning code into logical blocks.
+
+The following excerpt is the changed part of a machine learning script that was parsed before.
+Return a single JSON object with only the keys {keys}, each containing the exact code of that block found in the excerpt:
+- "model_block": code defining the model architecture.
+- "parameter": the command-line argument definitions (`add_argument` calls) holding hyperparameters.
+- "data_block": code loading data, preprocessing, training and evaluating, including the line running main.
+Use an empty string for a block that is not in the excerpt. Do not add explanations or markdown formatting.
+
+**Python Code Excerpt:**
+```python
+{code_excerpt}
+```
+
+**JSON Output:**
+```json
+"""
+
+
+async def parse_blocks_with_llm(code_excerpt: str, block_keys: List[str]) -> dict:
+    """
+    Re-derives the given blocks from a code excerpt with a small LLM prompt.
+
+    Returns:
+        A dictionary with one string per requested block key.
+    """
+    parsed_json = await _request_json_completion(get_llm_block_prompt(code_excerpt, block_keys))
+    return {key: parsed_json.get(key, "") for key in block_keys}
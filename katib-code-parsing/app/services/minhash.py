@@ -0,0 +1,82 @@
+import hashlib
+import keyword
+import random
+import re
+from typing import List, Set
+
+# Changing any of these invalidates the stored signatures; re-run the signature backfill migration
+SHINGLE_SIZE = 5
+LSH_BANDS = 16
+LSH_ROWS = 4
+NUM_PERMUTATIONS = LSH_BANDS * LSH_ROWS
+
+# Comments are matched (and dropped) as a whole, so a "#" inside a string literal is not taken for one
+CODE_TOKEN_PATTERN = re.compile(
+    r"#[^\n]*"
+    r"|[rbfuRBFU]{0,2}(?:'''.*?'''|\"\"\".*?\"\"\"|'(?:\\.|[^'\\\n])*'|\"(?:\\.|[^\"\\\n])*\")"
+    r"|[A-Za-z_]\w*"
+    r"|\d[\w.]*"
+    r"|[^\w\s]",
+    re.DOTALL,
+)
+
+MERSENNE_PRIME = (1 << 61) - 1
+# Universal hash functions (a * x + b) mod p standing in for random permutations; seeded, so signatures are stable
+_random = random.Random(20261018)
+PERMUTATIONS = [(_random.randrange(1, MERSENNE_PRIME), _random.randrange(MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+
+def code_tokens(code_content: str) -> List[str]:
+    """
+    Tokenizes code for shingling, abstracting what differs between forks of a
+    template: local names become "_", numbers "0" and string literals '"'.
+    Keywords and attribute names (the APIs called) are kept.
+    """
+    tokens: List[str] = []
+    for token in CODE_TOKEN_PATTERN.findall(code_content):
+        if token.startswith("#"):
+            continue
+        if token[0].isdigit():
+            tokens.append("0")
+        elif token[-1] in "'\"":
+            tokens.append('"')
+        elif token[0].isalpha() or token[0] == "_":
+            tokens.append(token if keyword.iskeyword(token) or (tokens and tokens[-1] == ".") else "_")
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def shingle_hashes(code_content: str) -> Set[int]:
+    tokens = code_tokens(code_content)
+    size = min(SHINGLE_SIZE, len(tokens))
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(tokens[index : index + size]).encode(), digest_size=8).digest(), "big")
+        for index in range(len(tokens) - size + 1)
+    }
+
+
+def compute_signature(code_content: str) -> List[int]:
+    """
+    MinHash signature of the token shingles of the code: the fraction of equal
+    positions in two signatures estimates the Jaccard similarity of the shingle sets.
+    """
+    hashes = shingle_hashes(code_content) or {0}
+    return [min((a * value + b) % MERSENNE_PRIME for value in hashes) for a, b in PERMUTATIONS]
+
+
+def estimate_similarity(signature: List[int], other: List[int]) -> float:
+    return sum(1 for left, right in zip(signature, other, strict=True) if left == right) / NUM_PERMUTATIONS
+
+
+def lsh_buckets(signature: List[int]) -> List[str]:
+    """
+    The LSH bucket of each band of the signature. Versions sharing a bucket are
+    candidates; with LSH_BANDS bands of LSH_ROWS rows, pairs above a similarity
+    of about (1 / LSH_BANDS) ** (1 / LSH_ROWS) are likely to share one.
+    """
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = ",".join(str(value) for value in signature[band * LSH_ROWS : (band + 1) * LSH_ROWS])
+        buckets.append(f"{band}:{hashlib.blake2b(rows.encode(), digest_size=8).hexdigest()}")
+    return buckets
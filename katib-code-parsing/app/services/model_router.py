@@ -0,0 +1,109 @@
+import ast
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from app.common.constants import (
+    LLM_MODEL,
+    LLM_SMALL_MODEL,
+    LLM_SMALL_MODEL_FRAMEWORKS,
+    LLM_SMALL_MODEL_MAX_TOKENS,
+    LLM_SMALL_MODEL_MIN_SUCCESS_RATE,
+    LLM_TIER_MIN_SAMPLES,
+)
+from app.services.static_parser import detect_framework
+
+TIER_SMALL = "small"
+TIER_LARGE = "large"
+
+# Outcomes per tier the success rate is computed over, so it follows recent model behaviour
+OUTCOME_WINDOW = 200
+# While the small tier is below its success rate, every PROBE_INTERVAL-th eligible parse still
+# tries it, so that the rate can recover
+PROBE_INTERVAL = 10
+
+
+class ModelRouter:
+    """
+    Picks the model tier of an LLM parse from the script size, its detected
+    framework and how often each tier's output has passed validation.
+    """
+
+    def __init__(
+        self,
+        small_model: Optional[str] = LLM_SMALL_MODEL,
+        large_model: str = LLM_MODEL,
+        small_max_tokens: int = LLM_SMALL_MODEL_MAX_TOKENS,
+        small_frameworks: List[str] = LLM_SMALL_MODEL_FRAMEWORKS,
+        min_success_rate: float = LLM_SMALL_MODEL_MIN_SUCCESS_RATE,
+        min_samples: int = LLM_TIER_MIN_SAMPLES,
+    ) -> None:
+        self.models = {TIER_LARGE: large_model}
+        if small_model:
+            self.models[TIER_SMALL] = small_model
+        self.small_max_tokens = small_max_tokens
+        self.small_frameworks = set(small_frameworks)
+        self.min_success_rate = min_success_rate
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._outcomes: Dict[str, Deque[bool]] = {tier: deque(maxlen=OUTCOME_WINDOW) for tier in self.models}
+        self._skipped = 0
+        self.escalations = 0
+
+    def success_rate(self, tier: str) -> Optional[float]:
+        """
+        Share of the tier's recent outputs that passed validation, or None before min_samples.
+        """
+        with self._lock:
+            outcomes = self._outcomes[tier]
+            if len(outcomes) < self.min_samples:
+                return None
+            return sum(outcomes) / len(outcomes)
+
+    def choose(self, code_content: str, prompt_tokens: int) -> str:
+        if TIER_SMALL not in self.models or prompt_tokens > self.small_max_tokens:
+            return TIER_LARGE
+        try:
+            framework = detect_framework(ast.parse(code_content))
+        except (SyntaxError, ValueError):
+            return TIER_LARGE
+        if framework not in self.small_frameworks:
+            return TIER_LARGE
+        success_rate = self.success_rate(TIER_SMALL)
+        if success_rate is not None and success_rate < self.min_success_rate:
+            with self._lock:
+                self._skipped += 1
+                if self._skipped % PROBE_INTERVAL:
+                    return TIER_LARGE
+        return TIER_SMALL
+
+    def record(self, tier: str, valid: bool) -> None:
+        with self._lock:
+            self._outcomes[tier].append(valid)
+
+    def record_escalation(self) -> None:
+        with self._lock:
+            self.escalations += 1
+
+    def stats(self) -> dict:
+        tiers: Dict[str, dict] = {}
+        for tier, model in self.models.items():
+            with self._lock:
+                outcomes = list(self._outcomes[tier])
+            tiers[tier] = {
+                "model": model,
+                "attempts": len(outcomes),
+                "successes": sum(outcomes),
+                "success_rate": sum(outcomes) / len(outcomes) if outcomes else None,
+            }
+        return {"tiers": tiers, "escalations": self.escalations}
+
+
+_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        _router = ModelRouter()
+    return _router
@@ -0,0 +1,139 @@
+import re
+from typing import Any, List, Optional, Tuple
+
+import orjson
+
+from app.common.exceptions import LLMResponseError
+from app.services.prompt_slicer import BLOCK_KEYS
+
+CODE_FENCE_PATTERN = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)```", re.DOTALL)
+TRAILING_COMMA_PATTERN = re.compile(r",(\s*[}\]])")
+CAMEL_CASE_PATTERN = re.compile(r"(?<=[a-z0-9])([A-Z])")
+
+# Key names models use instead of the ones the prompt asks for (after snake-casing)
+KEY_ALIASES = {
+    "metrics": "metric",
+    "metric_names": "metric",
+    "evaluation_metrics": "metric",
+    "params": "parameter",
+    "parameters": "parameter",
+    "hyperparameters": "parameter",
+    "hyper_parameters": "parameter",
+    "arguments": "parameter",
+    "parameter_block": "parameter",
+    "model": "model_block",
+    "model_code": "model_block",
+    "model_definition": "model_block",
+    "data": "data_block",
+    "data_code": "data_block",
+    "training_block": "data_block",
+    "train_block": "data_block",
+    "script_name": "name",
+    "code_name": "name",
+    "frameworks": "framework",
+    "library": "framework",
+}
+STRING_FIELDS = ("name", "framework") + BLOCK_KEYS
+
+
+def loads(text: str) -> Any:
+    # orjson is several times faster on the large, string-heavy outputs of a parse
+    return orjson.loads(text)
+
+
+def decode_output(content: Optional[str]) -> Tuple[Any, List[str]]:
+    """
+    Decodes the JSON output of the LLM, repairing near misses locally: code
+    fences, prose around the object and trailing commas.
+
+    Returns:
+        The decoded value and the repairs that were needed.
+
+    Raises:
+        LLMResponseError: The output is empty or not JSON even after repair.
+    """
+    if not content or not content.strip():
+        raise LLMResponseError("LLM response content is empty")
+    text = content.strip()
+    repairs: List[str] = []
+    try:
+        return loads(text), repairs
+    except ValueError as e:
+        error = e
+
+    fenced = CODE_FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+        repairs.append("code_fence")
+    start, end = text.find("{"), text.rfind("}")
+    if start >= 0 and end > start and (start > 0 or end < len(text) - 1):
+        text = text[start : end + 1]
+        repairs.append("surrounding_text")
+    for attempt in ("as_is", "trailing_comma"):
+        if attempt == "trailing_comma":
+            text, count = TRAILING_COMMA_PATTERN.subn(r"\1", text)
+            if not count:
+                break
+            repairs.append(attempt)
+        try:
+            return loads(text), repairs
+        except ValueError as e:
+            error = e
+    raise LLMResponseError(f"LLM returned invalid JSON: {error}") from error
+
+
+def canonical_key(key: str) -> str:
+    normalized = CAMEL_CASE_PATTERN.sub(r"_\1", key.strip()).lower().replace(" ", "_").replace("-", "_")
+    return KEY_ALIASES.get(normalized, normalized)
+
+
+def coerce_field(key: str, value: Any) -> Tuple[Any, Optional[str]]:
+    """
+    Coerces a result field to the type the output schema expects, if it is a
+    near miss (a list of lines where a string belongs, a comma separated string
+    where a list belongs, null).
+
+    Returns:
+        The value and the kind of repair made, or None if it was left as is.
+    """
+    if key in STRING_FIELDS:
+        if isinstance(value, list) and all(isinstance(item, str) for item in value):
+            return "\n".join(value), "list_to_string"
+        if value is None:
+            return ("unknown" if key == "framework" else ""), "null_field"
+    elif key == "metric":
+        if isinstance(value, str):
+            return [name.strip() for name in value.split(",") if name.strip()], "string_to_list"
+        if value is None:
+            return [], "null_field"
+    return value, None
+
+
+def repair_fields(parsed: Any) -> Tuple[dict, List[str]]:
+    """
+    Maps a decoded result onto the output schema: aliased key names are
+    renamed and near-miss field types coerced. The name defaults to
+    'unnamed_code'. Fields it cannot fix are left for validation to reject.
+    """
+    repairs: List[str] = []
+    if isinstance(parsed, list) and len(parsed) == 1 and isinstance(parsed[0], dict):
+        parsed = parsed[0]
+        repairs.append("wrapped_in_list")
+    if not isinstance(parsed, dict):
+        raise LLMResponseError(f"LLM returned a {type(parsed).__name__} instead of an object")
+
+    result: dict = {}
+    for key, value in parsed.items():
+        canonical = canonical_key(key)
+        if canonical != key:
+            if canonical in parsed:
+                # The expected key is present as well; keep it and the alias as it is
+                result[key] = value
+                continue
+            repairs.append("key_alias")
+        value, repair = coerce_field(canonical, value)
+        if repair:
+            repairs.append(repair)
+        result[canonical] = value
+    result.setdefault("name", "unnamed_code")
+    return result, repairs
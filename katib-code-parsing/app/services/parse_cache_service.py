@@ -0,0 +1,122 @@
+import datetime
+import hashlib
+from typing import Optional, Sequence
+
+from sqlalchemy import delete, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core import metrics
+from app.core.executor import run_analysis
+from app.models.parse_cache import ParseCacheEntry
+from app.services.llm_service import PROMPT_TEMPLATE_VERSION
+from app.services.prompt_slicer import identity_slice, restore_blocks
+
+CACHE_HITS = "parse_cache.hits"
+CACHE_MISSES = "parse_cache.misses"
+
+
+def normalize_code(code_content: str) -> str:
+    """
+    Normalizes code so that whitespace-only differences map to the same hash.
+
+    Line endings are unified, trailing whitespace and blank lines are dropped.
+    Indentation is kept because it is significant in Python.
+    """
+    lines = code_content.lstrip("\ufeff").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines if line.strip())
+
+
+def compute_code_hash(code_content: str) -> str:
+    return hashlib.sha256(normalize_code(code_content).encode("utf-8")).hexdigest()
+
+
+def relocate_blocks(parsed_content: dict, code_content: str) -> dict:
+    """
+    Locates the blocks of a cached parse in the given code. Whitespace-only
+    variants share a cache entry, so the block text and `block_spans` are taken
+    from this code's lines rather than from the code the entry was parsed from.
+    """
+    return restore_blocks(parsed_content, identity_slice(code_content.splitlines()))
+
+
+def build_cache_key(code_hash: str, model_name: str, prompt_version: str = PROMPT_TEMPLATE_VERSION) -> str:
+    return hashlib.sha256(f"{code_hash}:{model_name}:{prompt_version}".encode("utf-8")).hexdigest()
+
+
+async def get_cached_parse(db: AsyncSession, code_content: str, model_names: Sequence[str]) -> Optional[dict]:
+    """
+    Returns the cached parse result for the given code, or None on a miss.
+
+    Args:
+        model_names: Models whose results are accepted, in order of preference.
+    """
+    code_hash = await run_analysis(compute_code_hash, code_content, size=len(code_content))
+    cache_keys = [build_cache_key(code_hash, model_name) for model_name in model_names]
+    result = await db.execute(select(ParseCacheEntry).filter(ParseCacheEntry.cache_key.in_(cache_keys)))
+    entries = {str(entry.cache_key): entry for entry in result.scalars()}
+    entry = next((entries[cache_key] for cache_key in cache_keys if cache_key in entries), None)
+    if entry is None:
+        metrics.increment(CACHE_MISSES)
+        return None
+
+    metrics.increment(CACHE_HITS)
+    entry.hit_count = entry.hit_count + 1  # type: ignore
+    entry.last_hit_at = datetime.datetime.utcnow()  # type: ignore
+    content = dict(entry.content)
+    await db.commit()
+    return await run_analysis(relocate_blocks, content, code_content, size=len(code_content))
+
+
+async def store_cached_parse(db: AsyncSession, code_content: str, parsed_content: dict, model_name: str) -> None:
+    """
+    Caches the parse result the given model (the one the parse was routed to) produced for the code.
+    """
+    code_hash = await run_analysis(compute_code_hash, code_content, size=len(code_content))
+    db_entry = ParseCacheEntry(
+        cache_key=build_cache_key(code_hash, model_name),
+        code_hash=code_hash,
+        model_name=model_name,
+        prompt_version=PROMPT_TEMPLATE_VERSION,
+        # Line numbers of the stored code; they are recomputed for the code of each hit
+        content={key: value for key, value in parsed_content.items() if key != "block_spans"},
+    )
+    db.add(db_entry)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent parse of the same content already filled the entry.
+        await db.rollback()
+
+
+async def invalidate_cache(db: AsyncSession, stale_only: bool = False) -> int:
+    """
+    Deletes cache entries.
+
+    Args:
+        stale_only: Only delete entries produced by a prompt template version
+            other than the current one.
+
+    Returns:
+        The number of deleted entries.
+    """
+    statement = delete(ParseCacheEntry)
+    if stale_only:
+        statement = statement.where(ParseCacheEntry.prompt_version != PROMPT_TEMPLATE_VERSION)
+    result = await db.execute(statement)
+    await db.commit()
+    return result.rowcount or 0
+
+
+async def get_cache_stats(db: AsyncSession) -> dict:
+    result = await db.execute(select(func.count(ParseCacheEntry.id)))
+    hits = metrics.get_counter(CACHE_HITS)
+    misses = metrics.get_counter(CACHE_MISSES)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / lookups if lookups else 0.0,
+        "entries": result.scalar_one(),
+    }
@@ -0,0 +1,255 @@
+import asyncio
+import datetime
+import logging
+import uuid
+from typing import Callable, List, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.common.constants import (
+    PARSE_JOB_MAX_ATTEMPTS,
+    PARSE_JOB_POLL_INTERVAL,
+    PARSE_JOB_VISIBILITY_TIMEOUT,
+    PARSE_JOB_WORKERS,
+)
+from app.core.parse_context import PRIORITY_BATCH, parse_context
+from app.models.code import CodeVersion
+from app.models.parse_job import ParseJob
+from app.schemas.parsing_result import ParsingResultCreate
+from app.services import parsing_service
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+async def enqueue_parse_job(
+    db: AsyncSession, code_version_id: int, result_create: ParsingResultCreate
+) -> Optional[ParseJob]:
+    """
+    Queues a parse of the given code version.
+
+    A queued or running job for the same code version and request (name and
+    options) is returned instead of creating a duplicate, so client retries do
+    not cost another LLM call.
+    """
+    code_version = await db.get(CodeVersion, code_version_id)
+    if not code_version:
+        return None
+
+    result = await db.execute(
+        select(ParseJob)
+        .filter(ParseJob.code_version_id == code_version_id)
+        .filter(ParseJob.name == result_create.name)
+        .filter(ParseJob.status.in_([JOB_QUEUED, JOB_RUNNING]))
+        .order_by(ParseJob.id)
+    )
+    for db_job in result.scalars():
+        if ParsingResultCreate.model_validate(db_job.request) == result_create:
+            return db_job
+
+    db_job = ParseJob(
+        code_version_id=code_version_id,
+        name=result_create.name,
+        request=result_create.model_dump(),
+        status=JOB_QUEUED,
+        attempts=0,
+    )
+    db.add(db_job)
+    await db.commit()
+    await db.refresh(db_job)
+    return db_job
+
+
+async def get_parse_job(db: AsyncSession, job_id: int) -> Optional[ParseJob]:
+    result = await db.execute(select(ParseJob).filter(ParseJob.id == job_id))
+    return result.scalars().first()
+
+
+def _leasable(now: datetime.datetime) -> ColumnElement[bool]:
+    # Queued jobs, and running jobs whose worker stopped renewing the lease
+    return or_(
+        ParseJob.status == JOB_QUEUED,
+        (ParseJob.status == JOB_RUNNING) & (ParseJob.lease_expires_at < now),
+    )
+
+
+async def lease_next_job(
+    db: AsyncSession, worker_id: str, visibility_timeout: float = PARSE_JOB_VISIBILITY_TIMEOUT
+) -> Optional[ParseJob]:
+    """
+    Atomically leases the oldest available job for the given worker.
+
+    The lease is a conditional UPDATE, so two workers (or processes) racing for
+    the same job cannot both win it.
+    """
+    while True:
+        now = datetime.datetime.utcnow()
+        result = await db.execute(select(ParseJob.id).filter(_leasable(now)).order_by(ParseJob.id).limit(1))
+        job_id = result.scalars().first()
+        if job_id is None:
+            return None
+
+        result = await db.execute(
+            update(ParseJob)
+            .where(ParseJob.id == job_id)
+            .where(_leasable(now))
+            .values(
+                status=JOB_RUNNING,
+                lease_owner=worker_id,
+                lease_expires_at=now + datetime.timedelta(seconds=visibility_timeout),
+                attempts=ParseJob.attempts + 1,
+                updated_at=now,
+            )
+        )
+        await db.commit()
+        if result.rowcount == 1:
+            return await db.get(ParseJob, job_id, populate_existing=True)
+
+
+async def renew_lease(
+    db: AsyncSession, job_id: int, worker_id: str, visibility_timeout: float = PARSE_JOB_VISIBILITY_TIMEOUT
+) -> bool:
+    result = await db.execute(
+        update(ParseJob)
+        .where(ParseJob.id == job_id)
+        .where(ParseJob.status == JOB_RUNNING)
+        .where(ParseJob.lease_owner == worker_id)
+        .values(lease_expires_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=visibility_timeout))
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def finish_job(
+    db: AsyncSession,
+    job_id: int,
+    worker_id: str,
+    parsing_result_id: Optional[int] = None,
+    error: Optional[str] = None,
+    retry: bool = False,
+) -> bool:
+    """
+    Records the outcome of a leased job. Ignored if the lease was lost to another worker.
+    """
+    if error is None:
+        values = {"status": JOB_SUCCEEDED, "parsing_result_id": parsing_result_id, "error": None}
+    elif retry:
+        values = {"status": JOB_QUEUED, "error": error}
+    else:
+        values = {"status": JOB_FAILED, "error": error}
+
+    result = await db.execute(
+        update(ParseJob)
+        .where(ParseJob.id == job_id)
+        .where(ParseJob.status == JOB_RUNNING)
+        .where(ParseJob.lease_owner == worker_id)
+        .values(lease_owner=None, lease_expires_at=None, updated_at=datetime.datetime.utcnow(), **values)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+class ParseJobWorkerPool:
+    """
+    In-process workers that drain the parse job queue.
+
+    Each worker leases one job at a time and renews its lease while the parse
+    runs. If a worker (or the whole process) dies, the lease expires after the
+    visibility timeout and the job is picked up again.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        concurrency: int = PARSE_JOB_WORKERS,
+        poll_interval: float = PARSE_JOB_POLL_INTERVAL,
+        visibility_timeout: float = PARSE_JOB_VISIBILITY_TIMEOUT,
+        max_attempts: int = PARSE_JOB_MAX_ATTEMPTS,
+    ) -> None:
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        for index in range(self.concurrency):
+            worker_id = f"{uuid.uuid4().hex[:8]}-{index}"
+            self._tasks.append(asyncio.create_task(self._run(worker_id)))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, worker_id: str) -> None:
+        while True:
+            try:
+                processed = await self.run_once(worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Parse job worker %s failed to process a job", worker_id)
+                processed = False
+            if not processed:
+                await asyncio.sleep(self.poll_interval)
+
+    async def run_once(self, worker_id: str) -> bool:
+        """
+        Leases and processes a single job.
+
+        Returns:
+            True if a job was processed, False if the queue was empty.
+        """
+        async with self.session_factory() as db:
+            db_job = await lease_next_job(db, worker_id, self.visibility_timeout)
+            if db_job is None:
+                return False
+            # Plain values, usable after the session is closed
+            job_id, code_version_id = int(db_job.id), int(db_job.code_version_id)
+            result_create, attempts = ParsingResultCreate.model_validate(db_job.request), int(db_job.attempts)
+            if attempts > self.max_attempts:
+                # The job kept crashing its workers; stop re-leasing it
+                await finish_job(db, job_id, worker_id, error="Exceeded maximum attempts")
+                return True
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, worker_id))
+        try:
+            async with self.session_factory() as db:
+                with parse_context(PRIORITY_BATCH):
+                    db_result = await parsing_service.create_parsing_result(
+                        db=db,
+                        code_version_id=code_version_id,
+                        result_create=result_create,
+                        session_factory=self.session_factory,
+                    )
+        except Exception as e:
+            logger.warning("Parse job %s failed on attempt %s: %s", job_id, attempts, e)
+            async with self.session_factory() as db:
+                await finish_job(db, job_id, worker_id, error=str(e), retry=attempts < self.max_attempts)
+            return True
+        finally:
+            heartbeat.cancel()
+
+        async with self.session_factory() as db:
+            if db_result is None:
+                await finish_job(db, job_id, worker_id, error="Code version not found")
+            else:
+                await finish_job(db, job_id, worker_id, parsing_result_id=int(db_result.id))
+        return True
+
+    async def _heartbeat(self, job_id: int, worker_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            async with self.session_factory() as db:
+                if not await renew_lease(db, job_id, worker_id, self.visibility_timeout):
+                    return
@@ -0,0 +1,68 @@
+import datetime
+import math
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.parse_metric import ParseMetric
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values: Sequence[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of already sorted values (0.0 for no values).
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return float(sorted_values[rank - 1])
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    return {f"p{percent}": percentile(values, percent) for percent in PERCENTILES}
+
+
+async def summarize_parse_metrics(
+    db: AsyncSession, since: datetime.datetime, until: Optional[datetime.datetime] = None
+) -> dict:
+    """
+    Aggregates the metrics of the parses recorded in [since, until).
+
+    Percentiles are computed over the parses of the window, so the window
+    should be small enough for its rows to be loaded at once.
+    """
+    until = until or datetime.datetime.utcnow()
+    result = await db.execute(
+        select(ParseMetric).filter(ParseMetric.created_at >= since).filter(ParseMetric.created_at < until)
+    )
+    rows = result.scalars().all()
+
+    by_source: Dict[str, int] = {}
+    by_model_tier: Dict[str, int] = {}
+    for row in rows:
+        by_source[str(row.source)] = by_source.get(str(row.source), 0) + 1
+        if row.model_tier is not None:
+            by_model_tier[str(row.model_tier)] = by_model_tier.get(str(row.model_tier), 0) + 1
+    llm_rows = [row for row in rows if row.llm_requests]
+    prompt_tokens = sum(int(row.prompt_tokens) for row in rows)
+    completion_tokens = sum(int(row.completion_tokens) for row in rows)
+
+    return {
+        "since": since,
+        "until": until,
+        "count": len(rows),
+        "by_source": by_source,
+        "by_model_tier": by_model_tier,
+        "coalesced": sum(1 for row in rows if row.coalesced),
+        "latency_ms": _distribution([float(row.latency_ms) for row in rows]),
+        "llm_latency_ms": _distribution([float(row.llm_latency_ms) for row in llm_rows]),
+        "queue_wait_ms": _distribution([float(row.queue_wait_ms) for row in llm_rows]),
+        "total_tokens": _distribution([float(row.prompt_tokens + row.completion_tokens) for row in llm_rows]),
+        "llm_requests": sum(int(row.llm_requests) for row in rows),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "retries": sum(int(row.retries) for row in rows),
+    }
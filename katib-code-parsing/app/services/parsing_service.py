@@ -1,46 +1,605 @@
-from typing import Optional
+import asyncio
+import copy
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+from app.common.constants import (
+    NEAR_DUPLICATE_REUSE,
+    PARSE_BATCH_CONCURRENCY,
+    SPECULATIVE_PARSE,
+    SPECULATIVE_PARSE_MAX_IN_FLIGHT,
+)
+from app.common.exceptions import LLMResponseError
+from app.core import metrics
+from app.core.executor import run_analysis
+from app.core.parse_context import (
+    PRIORITY_BATCH,
+    PRIORITY_SPECULATIVE,
+    ParseContext,
+    ensure_parse_context,
+    parse_context,
+)
+from app.core.query_stats import track_queries
 from app.models.code import CodeVersion
+from app.models.parse_metric import ParseMetric
 from app.models.parsing_result import ParsingResult, ParsingResultVersion
 from app.schemas.parsing_result import (
     ParsingResultBase,
     ParsingResultCreate,
     ParsingResultVersionCreate,
 )
-from app.services.llm_service import parse_code_with_llm
+from app.services import llm_service, parse_cache_service
+from app.services.block_refs import compact_blocks, inline_versions
+from app.services.incremental_parser import parse_incrementally
+from app.services.llm_scheduler import get_llm_scheduler
+from app.services.llm_service import (
+    INVALID_OUTPUTS,
+    LLM_OUTPUTS,
+    REPAIRED_OUTPUTS,
+    parse_code_with_fast_path,
+    parse_code_with_llm,
+    route_parse,
+    stream_parse_code_with_llm,
+)
+from app.services.model_router import get_model_router
+from app.services.similarity_service import find_similar_versions
+from app.services.single_flight import SingleFlight
+from app.services.version_numbering import allocate_version
+
+logger = logging.getLogger(__name__)
+
+# "similar": re-parsed incrementally against the parse of a near-duplicate version (of any code)
+# "degraded": the LLM parse missed its deadline and the static analysis was returned instead
+PARSE_SOURCES = ("cache", "incremental", "fast_path", "similar", "llm", "degraded")
+
+COALESCED_PARSES = "parse.coalesced"
+
+# In-flight LLM parses, keyed on the parse cache key of the content and routed model
+# (and the request's hedge/deadline overrides)
+_llm_parses: SingleFlight[dict] = SingleFlight()
+
+SPECULATIVE_STARTED = "parse.speculative.started"
+# Explicit parses that waited for an in-flight pre-parse, and that were served from a finished one
+SPECULATIVE_ATTACHED = "parse.speculative.attached"
+SPECULATIVE_REUSED = "parse.speculative.reused"
+
+# Speculative pre-parses: the running tasks, the code hashes being pre-parsed, the finished ones
+# not yet used by code hash, and by parse key the contexts of those that reached the LLM (so an
+# explicit parse can promote them)
+_speculative_tasks: Set["asyncio.Task[None]"] = set()
+_speculative_hashes: Set[str] = set()
+_speculative_contexts: Dict[str, ParseContext] = {}
+_speculative_results: "OrderedDict[str, None]" = OrderedDict()
+SPECULATIVE_RESULTS_KEPT = 1000
+
+# Result fields pushed by stream_parsing_result, in the order the LLM is asked to produce them
+STREAMED_FIELDS = ("name", "framework", "metric", "model_block", "parameter", "data_block")
 
 
 async def create_parsing_result(
-    db: AsyncSession, code_version_id: int, result_create: ParsingResultCreate
-) -> ParsingResult:
+    db: AsyncSession,
+    code_version_id: int,
+    result_create: ParsingResultCreate,
+    session_factory: Callable[[], AsyncSession],
+) -> Optional[ParsingResult]:
     """
     Creates a new parsing result for a given code version.
     This involves fetching the code content, parsing it with the LLM,
     and storing the result.
+    A previous parse of the same (normalized) code is reused from the parse cache,
+    and scripts the static fast path recognizes confidently skip the LLM.
+    In incremental mode, only the blocks that changed since the previous
+    version's parse are re-derived.
+
+    Args:
+        session_factory: Creates the session an LLM parse caches its result with, since
+            the call may be shared with (and outlive) other requests.
     """
     # Get the code content from the code version
     code_version = await db.get(CodeVersion, code_version_id)
     if not code_version:
         return None
 
-    # Parse the code using the LLM service
-    parsed_content = await parse_code_with_llm(str(code_version.content))
+    with ensure_parse_context() as context:
+        started = time.perf_counter()
+        code_content = str(code_version.content)
+        parsed_content, source = await _parse_without_llm(db, code_version, result_create)
+        shared = False
+        if parsed_content is None:
+            # Parse the code using the LLM service, sharing the call with concurrent parses of the same content
+            source = "llm"
+            # End the read transaction so the connection goes back to the pool while the LLM is awaited:
+            # the shared call caches its result through a session (and connection) of its own
+            await db.commit()
+            model_tier = await route_parse(code_content)
+            parse_key = _llm_flight_key(
+                await run_analysis(
+                    _llm_parse_key, code_content, get_model_router().models[model_tier], size=len(code_content)
+                ),
+                result_create,
+            )
+            await _promote_speculative_parse(parse_key, context)
+            parsed_content, shared = await _llm_parses.do(
+                parse_key, lambda: _parse_and_cache_with_llm(session_factory, code_content, result_create, model_tier)
+            )
+            if shared:
+                metrics.increment(COALESCED_PARSES)
+                parsed_content = copy.deepcopy(parsed_content)
+            if parsed_content.get("degraded"):
+                source = "degraded"
+        metrics.increment(f"parse.source.{source}")
+        parse_metric = _build_parse_metric(context, source, time.perf_counter() - started, coalesced=shared)
 
-    # Create the ParsingResult and its first version
-    db_result = ParsingResult(code_version_id=code_version_id, name=result_create.name)
-    db.add(db_result)
-    await db.commit()
-    await db.refresh(db_result)
+    return await _store_parsing_result(db, code_version_id, result_create.name, parsed_content, parse_metric)
+
+
+def _parse_with_llm(
+    code_content: str, result_create: ParsingResultCreate, model_tier: Optional[str] = None
+) -> Awaitable[dict]:
+    # Only the options set on the request override the LLM service defaults; requests use ms, the service seconds
+    options: Dict[str, Any] = {}
+    if model_tier is not None:
+        options["model_tier"] = model_tier
+    if result_create.hedge_after_ms is not None:
+        options["hedge_after"] = result_create.hedge_after_ms / 1000
+    if result_create.deadline_ms is not None:
+        options["deadline"] = result_create.deadline_ms / 1000
+    return parse_code_with_llm(code_content, **options)
+
+
+async def _parse_and_cache_with_llm(
+    session_factory: Callable[[], AsyncSession], code_content: str, result_create: ParsingResultCreate, model_tier: str
+) -> dict:
+    # Caching inside the shared call keeps it in flight until the cache entry exists,
+    # so a request arriving in between neither misses both nor makes a second LLM call.
+    # It uses a session of its own: the request that started the call may be gone by then.
+    parsed_content = await _parse_with_llm(code_content, result_create, model_tier)
+    if not parsed_content.get("degraded"):
+        try:
+            async with session_factory() as db:
+                await parse_cache_service.store_cached_parse(
+                    db, code_content, parsed_content, get_model_router().models[model_tier]
+                )
+        except Exception as e:
+            logger.warning("Could not cache the parse result: %s", e)
+    return parsed_content
+
+
+def _llm_parse_key(code_content: str, model_name: str) -> str:
+    return parse_cache_service.build_cache_key(parse_cache_service.compute_code_hash(code_content), model_name)
+
+
+def _cached_models() -> List[str]:
+    # Cached results of every configured model tier are served, the large model's first
+    return list(get_model_router().models.values())
+
+
+def _llm_flight_key(parse_key: str, result_create: ParsingResultCreate) -> str:
+    # A request overriding the hedge or deadline only shares LLM calls made with the same overrides
+    if result_create.hedge_after_ms is None and result_create.deadline_ms is None:
+        return parse_key
+    return f"{parse_key}:hedge={result_create.hedge_after_ms}:deadline={result_create.deadline_ms}"
+
+
+async def _parse_without_llm(
+    db: AsyncSession, code_version: CodeVersion, result_create: ParsingResultCreate
+) -> Tuple[Optional[dict], str]:
+    # Cache, incremental and static fast path stages; (None, "llm") if the LLM is needed
+    code_content = str(code_version.content)
+    parsed_content = await parse_cache_service.get_cached_parse(db, code_content, _cached_models())
+    if parsed_content is not None:
+        if _speculative_results:
+            code_hash = parse_cache_service.compute_code_hash(code_content)
+            if code_hash in _speculative_results:
+                del _speculative_results[code_hash]
+                metrics.increment(SPECULATIVE_REUSED)
+        return parsed_content, "cache"
+
+    if result_create.incremental:
+        previous = await get_previous_parse(db, code_version)
+        if previous is not None:
+            previous_code, previous_version = previous
+            parsed_content = await parse_incrementally(previous_code, dict(previous_version.content), code_content)
+            if parsed_content is not None:
+                # Not cached: the parse cache only holds full parses of exactly this content
+                parsed_content["incremental"]["base_parsing_result_version_id"] = previous_version.id
+                return parsed_content, "incremental"
+
+    # The threshold is passed along because the analysis may run in another process
+    parsed_content = await run_analysis(
+        parse_code_with_fast_path, code_content, llm_service.FAST_PATH_MIN_CONFIDENCE, size=len(code_content)
+    )
+    if parsed_content is not None:
+        return parsed_content, "fast_path"
+
+    if NEAR_DUPLICATE_REUSE:
+        similar = await get_similar_parse(db, code_version)
+        if similar is not None:
+            similar_code, similar_version, similarity = similar
+            parsed_content = await parse_incrementally(similar_code, dict(similar_version.content), code_content)
+            if parsed_content is not None:
+                parsed_content["incremental"]["base_parsing_result_version_id"] = similar_version.id
+                parsed_content["incremental"]["similarity"] = round(similarity, 3)
+                # Not cached: it is derived from another code's parse, not a parse of this content
+                return parsed_content, "similar"
+    return None, "llm"
+
+
+async def _stream_and_cache_with_llm(
+    session_factory: Callable[[], AsyncSession],
+    code_content: str,
+    model_tier: str,
+    fields: "asyncio.Queue[Optional[Tuple[str, Any]]]",
+) -> dict:
+    # `_parse_and_cache_with_llm` for streams: each field also goes to the stream that started
+    # the call as it arrives, followed by None once the LLM is done
+    parsed_content: Optional[dict] = None
+    try:
+        async for key, value in stream_parse_code_with_llm(code_content, model_tier):
+            if key == "result":
+                parsed_content = value
+            else:
+                fields.put_nowait((key, value))
+    finally:
+        fields.put_nowait(None)
+    if parsed_content is None:
+        raise LLMResponseError("LLM stream ended without a result")
+    if not parsed_content.get("degraded"):
+        try:
+            async with session_factory() as db:
+                await parse_cache_service.store_cached_parse(
+                    db, code_content, parsed_content, get_model_router().models[model_tier]
+                )
+        except Exception as e:
+            logger.warning("Could not cache the parse result: %s", e)
+    return parsed_content
+
+
+async def _stream_fields(
+    fields: "asyncio.Queue[Optional[Tuple[str, Any]]]", flight: "asyncio.Future[Tuple[dict, bool]]"
+) -> AsyncIterator[Tuple[str, Any]]:
+    # The fields of the shared call, if this stream started it; ends early when the
+    # call was another request's (nothing is ever put) or failed before streaming
+    next_field: "asyncio.Future[Any]" = asyncio.ensure_future(fields.get())
+    try:
+        while True:
+            await asyncio.wait({next_field, flight}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_field.done():
+                break
+            field = next_field.result()
+            if field is None:
+                return
+            yield field
+            next_field = asyncio.ensure_future(fields.get())
+    finally:
+        next_field.cancel()
+    # Every field is queued before the call completes
+    while not fields.empty():
+        field = fields.get_nowait()
+        if field is None:
+            return
+        yield field
+
+
+async def stream_parsing_result(
+    session_factory: Callable[[], AsyncSession], code_version_id: int, result_create: ParsingResultCreate
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Creates a parsing result like `create_parsing_result`, reporting progress as it goes.
+    The LLM call is routed and shared with concurrent parses of the same content
+    the same way; `hedge_after_ms` and `deadline_ms` are rejected by the router.
+
+    Yields:
+        ("started", ...) right away, then one (key, {"value": ...}) event per
+        result field as soon as it is known (as the LLM streams its output, or
+        all at once for cache, incremental, fast path, small model and shared
+        results), and finally ("result", ParsingResult) once the result is
+        stored, or ("error", ...).
+    """
+    yield "started", {"code_version_id": code_version_id}
+    try:
+        async with session_factory() as db:
+            code_version = await db.get(CodeVersion, code_version_id)
+            if not code_version:
+                yield "error", {"detail": "Code version not found"}
+                return
+
+            with ensure_parse_context() as context:
+                started = time.perf_counter()
+                code_content = str(code_version.content)
+                parsed_content, source = await _parse_without_llm(db, code_version, result_create)
+                shared = False
+                if parsed_content is not None:
+                    for key in STREAMED_FIELDS:
+                        if key in parsed_content:
+                            yield key, {"value": parsed_content[key]}
+                else:
+                    # Streamed through the same shared call as `create_parsing_result`: a stream and a
+                    # normal parse of the same content make one LLM call, and the cache is filled once
+                    source = "llm"
+                    await db.commit()
+                    model_tier = await route_parse(code_content)
+                    parse_key = _llm_flight_key(
+                        await run_analysis(
+                            _llm_parse_key, code_content, get_model_router().models[model_tier], size=len(code_content)
+                        ),
+                        result_create,
+                    )
+                    await _promote_speculative_parse(parse_key, context)
+                    fields: "asyncio.Queue[Optional[Tuple[str, Any]]]" = asyncio.Queue()
+                    flight = asyncio.ensure_future(
+                        _llm_parses.do(
+                            parse_key,
+                            lambda: _stream_and_cache_with_llm(session_factory, code_content, model_tier, fields),
+                        )
+                    )
+                    try:
+                        async for key, value in _stream_fields(fields, flight):
+                            yield key, {"value": value}
+                        llm_content, shared = await flight
+                    finally:
+                        # A client that goes away only stops waiting; the shared call goes on
+                        flight.cancel()
+                    if shared:
+                        # Joined a call started by another request: its fields only arrive with its result
+                        metrics.increment(COALESCED_PARSES)
+                        llm_content = copy.deepcopy(llm_content)
+                        for key in STREAMED_FIELDS:
+                            if key in llm_content:
+                                yield key, {"value": llm_content[key]}
+                    if llm_content.get("degraded"):
+                        source = "degraded"
+                    parsed_content = llm_content
+                metrics.increment(f"parse.source.{source}")
+                parse_metric = _build_parse_metric(context, source, time.perf_counter() - started, coalesced=shared)
+
+            db_result = await _store_parsing_result(
+                db, code_version_id, result_create.name, parsed_content, parse_metric
+            )
+        if db_result is None:
+            yield "error", {"detail": "Code version not found"}
+            return
+        yield "result", db_result
+    except Exception as e:
+        logger.warning("Streaming parse of code version %s failed: %s", code_version_id, e)
+        yield "error", {"detail": str(e)}
+
+
+def schedule_speculative_parse(
+    session_factory: Callable[[], AsyncSession], code_content: str, enabled: Optional[bool] = None
+) -> bool:
+    """
+    Starts a low-priority background LLM parse of a just-uploaded code version,
+    so that the explicit parse request that usually follows finds it in flight
+    (and waits for it instead of starting over) or in the parse cache.
+
+    Args:
+        session_factory: Creates the session of the background parse, which outlives the upload request.
+        enabled: Overrides SPECULATIVE_PARSE.
+
+    Returns:
+        Whether a pre-parse was scheduled. It is not when disabled or when
+        SPECULATIVE_PARSE_MAX_IN_FLIGHT pre-parses are running. The upload
+        request does no other work: the pre-parse stops on its own when the
+        content is already being pre-parsed, the static fast path answers it,
+        it is cached or the LLM is already parsing it.
+    """
+    if not (SPECULATIVE_PARSE if enabled is None else enabled):
+        return False
+    if len(_speculative_tasks) >= SPECULATIVE_PARSE_MAX_IN_FLIGHT:
+        return False
+
+    task = asyncio.create_task(_speculative_parse(session_factory, code_content))
+    _speculative_tasks.add(task)
+    task.add_done_callback(_speculative_tasks.discard)
+    return True
+
+
+async def _speculative_parse(session_factory: Callable[[], AsyncSession], code_content: str) -> None:
+    code_hash: Optional[str] = None
+    key: Optional[str] = None
+    try:
+        # Its statements are not counted against the upload request that started it
+        with parse_context(PRIORITY_SPECULATIVE) as context, track_queries():
+            content_hash = await run_analysis(
+                parse_cache_service.compute_code_hash, code_content, size=len(code_content)
+            )
+            if content_hash in _speculative_hashes:
+                return
+            code_hash = content_hash
+            _speculative_hashes.add(code_hash)
+            fast_path_result = await run_analysis(
+                parse_code_with_fast_path, code_content, llm_service.FAST_PATH_MIN_CONFIDENCE, size=len(code_content)
+            )
+            if fast_path_result is not None:
+                return
+            async with session_factory() as db:
+                if await parse_cache_service.get_cached_parse(db, code_content, _cached_models()) is not None:
+                    return
+            model_tier = await route_parse(code_content)
+            parse_key = parse_cache_service.build_cache_key(code_hash, get_model_router().models[model_tier])
+            if _llm_parses.in_flight(parse_key):
+                return
+            metrics.increment(SPECULATIVE_STARTED)
+            key = parse_key
+            _speculative_contexts[key] = context
+            parsed_content, shared = await _llm_parses.do(
+                key,
+                lambda: _parse_and_cache_with_llm(
+                    session_factory, code_content, ParsingResultCreate(name="speculative"), model_tier
+                ),
+            )
+        if not shared and not parsed_content.get("degraded"):
+            _speculative_results[code_hash] = None
+            while len(_speculative_results) > SPECULATIVE_RESULTS_KEPT:
+                _speculative_results.popitem(last=False)
+    except Exception as e:
+        # Nobody is waiting for a pre-parse; the explicit parse will run (and report) it again
+        logger.info("Speculative parse failed: %s", e)
+    finally:
+        if code_hash is not None:
+            _speculative_hashes.discard(code_hash)
+        if key is not None:
+            _speculative_contexts.pop(key, None)
+
+
+async def _promote_speculative_parse(key: str, context: ParseContext) -> None:
+    # An explicit parse about to wait for a speculative pre-parse lends it its priority
+    speculative = _speculative_contexts.get(key)
+    if speculative is not None and _llm_parses.in_flight(key):
+        metrics.increment(SPECULATIVE_ATTACHED)
+        await get_llm_scheduler().promote(speculative, context.priority)
 
-    db_result_version = ParsingResultVersion(
-        parsing_result_id=db_result.id, version=1, content=parsed_content
+
+async def cancel_speculative_parses() -> None:
+    tasks = list(_speculative_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _build_parse_metric(context: ParseContext, source: str, elapsed: float, coalesced: bool) -> ParseMetric:
+    # Usage of a parse that shared another request's LLM call stays with that request
+    return ParseMetric(
+        source=source,
+        model=context.model,
+        model_tier=context.model_tier,
+        llm_requests=context.llm_requests,
+        prompt_tokens=context.prompt_tokens,
+        completion_tokens=context.completion_tokens,
+        latency_ms=round(elapsed * 1000, 1),
+        llm_latency_ms=round(context.llm_latency * 1000, 1),
+        queue_wait_ms=round(context.queue_wait * 1000, 1),
+        retries=context.retries,
+        coalesced=coalesced,
     )
+
+
+async def get_previous_parse(
+    db: AsyncSession, code_version: CodeVersion
+) -> Optional[Tuple[str, ParsingResultVersion]]:
+    """
+    Returns the content of the closest earlier version of the same code that was
+    parsed, together with the latest version of its latest parsing result.
+    Degraded results are not reused, as in get_similar_parse.
+    """
+    result = await db.execute(
+        select(CodeVersion, ParsingResultVersion)
+        .join(ParsingResult, ParsingResult.code_version_id == CodeVersion.id)
+        .join(ParsingResultVersion, ParsingResultVersion.parsing_result_id == ParsingResult.id)
+        .filter(CodeVersion.code_id == code_version.code_id)
+        .filter(CodeVersion.version < code_version.version)
+        .order_by(CodeVersion.version.desc(), ParsingResult.id.desc(), ParsingResultVersion.version.desc())
+        .limit(3)
+    )
+    for row in result.all():
+        if row[1].content.get("degraded"):
+            continue
+        inline_versions([row[1]], str(row[0].content))
+        return str(row[0].content), row[1]
+    return None
+
+
+async def get_similar_parse(
+    db: AsyncSession, code_version: CodeVersion
+) -> Optional[Tuple[str, ParsingResultVersion, float]]:
+    """
+    Returns the content of the most similar parsed near-duplicate of a code
+    version, the latest version of its latest parsing result and the similarity.
+    Degraded results are not reused.
+    """
+    for code_version_id, similarity in await find_similar_versions(db, code_version, limit=3, parsed_only=True):
+        result = await db.execute(
+            select(CodeVersion, ParsingResultVersion)
+            .join(ParsingResult, ParsingResult.code_version_id == CodeVersion.id)
+            .join(ParsingResultVersion, ParsingResultVersion.parsing_result_id == ParsingResult.id)
+            .filter(CodeVersion.id == code_version_id)
+            .order_by(ParsingResult.id.desc(), ParsingResultVersion.version.desc())
+            .limit(1)
+        )
+        row = result.first()
+        if row is None or row[1].content.get("degraded"):
+            continue
+        inline_versions([row[1]], str(row[0].content))
+        return str(row[0].content), row[1], similarity
+    return None
+
+
+async def stream_parsing_results(
+    session_factory: Callable[[], AsyncSession],
+    code_version_ids: List[int],
+    result_create: ParsingResultCreate,
+    concurrency: int = PARSE_BATCH_CONCURRENCY,
+) -> AsyncIterator[dict]:
+    """
+    Parses many code versions concurrently and yields one summary per item
+    as soon as it finishes. A failing item is reported and does not abort the batch.
+
+    Args:
+        session_factory: Creates a session per item, since sessions cannot be shared across tasks.
+        code_version_ids: The code versions to parse.
+        result_create: Name of every created parsing result.
+        concurrency: Maximum number of items parsed at the same time.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def parse_one(code_version_id: int) -> dict:
+        async with semaphore:
+            started = time.perf_counter()
+            item: Dict[str, Any] = {"code_version_id": code_version_id}
+            try:
+                async with session_factory() as db:
+                    with parse_context(PRIORITY_BATCH):
+                        db_result = await create_parsing_result(db, code_version_id, result_create, session_factory)
+                if db_result is None:
+                    item.update(status="error", error="Code version not found")
+                else:
+                    item.update(status="ok", parsing_result_id=int(db_result.id))
+            except Exception as e:
+                item.update(status="error", error=str(e))
+            item["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return item
+
+    tasks = [asyncio.create_task(parse_one(code_version_id)) for code_version_id in code_version_ids]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Stop outstanding work if the client goes away mid-stream
+        for task in tasks:
+            task.cancel()
+
+
+async def _store_parsing_result(
+    db: AsyncSession,
+    code_version_id: int,
+    name: str,
+    parsed_content: dict,
+    parse_metric: Optional[ParseMetric] = None,
+) -> Optional[ParsingResult]:
+    # Create the ParsingResult and its first version, with the blocks stored as references into the code
+    code_version = await db.get(CodeVersion, code_version_id)
+    if code_version is None:
+        # Deleted while it was being parsed
+        return None
+    code_content = str(code_version.content)
+    content = await run_analysis(compact_blocks, parsed_content, code_content, size=len(code_content))
+    db_result = ParsingResult(code_version_id=code_version_id, name=name, latest_version=1)
+    db.add(db_result)
+    await db.flush()
+
+    db_result_version = ParsingResultVersion(parsing_result_id=db_result.id, version=1, content=content)
     db.add(db_result_version)
+    if parse_metric is not None:
+        await db.flush()
+        parse_metric.parsing_result_version_id = db_result_version.id
+        db.add(parse_metric)
     await db.commit()
-    await db.refresh(db_result)
 
     from sqlalchemy.orm import selectinload
 
@@ -49,20 +608,53 @@ async def create_parsing_result(
         .options(selectinload(ParsingResult.versions))
         .filter(ParsingResult.id == db_result.id)
     )
-    db_result = result.scalars().first()
+    db_result = result.scalars().one()
+    inline_versions(db_result.versions, str(code_version.content))
 
     return db_result
 
 
-async def get_parsing_result(db: AsyncSession, result_id: int) -> Optional[ParsingResult]:
+def get_parse_source_stats() -> dict:
+    counts = {source: metrics.get_counter(f"parse.source.{source}") for source in PARSE_SOURCES}
+    total = sum(counts.values())
+    llm_outputs = metrics.get_counter(LLM_OUTPUTS)
+    repaired_outputs = metrics.get_counter(REPAIRED_OUTPUTS)
+    return {
+        "total": total,
+        **counts,
+        "fast_path_share": counts["fast_path"] / total if total else 0.0,
+        "llm_outputs": llm_outputs,
+        "repaired_outputs": repaired_outputs,
+        "invalid_outputs": metrics.get_counter(INVALID_OUTPUTS),
+        "repair_rate": repaired_outputs / llm_outputs if llm_outputs else 0.0,
+        "speculative_started": metrics.get_counter(SPECULATIVE_STARTED),
+        "speculative_attached": metrics.get_counter(SPECULATIVE_ATTACHED),
+        "speculative_reused": metrics.get_counter(SPECULATIVE_REUSED),
+    }
+
+
+async def get_parsing_result(db: AsyncSession, result_id: int, inline: bool = True) -> Optional[ParsingResult]:
+    """
+    Args:
+        inline: Rehydrate the code blocks stored as references into the code
+            version. Otherwise the versions are returned as stored.
+    """
     from sqlalchemy.orm import selectinload
 
     result = await db.execute(
         select(ParsingResult)
         .options(selectinload(ParsingResult.versions))
         .filter(ParsingResult.id == result_id)
+        # Versions inlined earlier in the session are reloaded as stored
+        .execution_options(populate_existing=not inline)
     )
-    return result.scalars().first()
+    db_result = result.scalars().first()
+    if db_result is not None and inline:
+        code_version = await db.get(CodeVersion, db_result.code_version_id)
+        if code_version is None:
+            return None
+        inline_versions(db_result.versions, str(code_version.content))
+    return db_result
 
 
 async def update_parsing_result(
@@ -71,8 +663,8 @@ async def update_parsing_result(
     db_result = await get_parsing_result(db, result_id)
     if db_result:
         db_result.name = result.name  # type: ignore
+        # A refresh would reload the (inlined) versions as stored
         await db.commit()
-        await db.refresh(db_result)
     return db_result
 
 
@@ -85,29 +677,29 @@ async def delete_parsing_result(db: AsyncSession, result_id: int) -> Optional[Pa
 
 
 async def create_parsing_result_version(
-    db: AsyncSession, result_id: int, version: ParsingResultVersionCreate
+    db: AsyncSession, result_id: int, version: ParsingResultVersionCreate, inline: bool = True
 ) -> Optional[ParsingResultVersion]:
     # Check if the parent parsing result exists
-    parent_result = await get_parsing_result(db, result_id)
+    parent_result = await db.get(ParsingResult, result_id)
     if not parent_result:
         return None
 
-    result = await db.execute(
-        select(ParsingResultVersion.version)
-        .filter(ParsingResultVersion.parsing_result_id == result_id)
-        .order_by(ParsingResultVersion.version.desc())
-        .limit(1)
-    )
-    latest_version = result.scalars().first() or 0
-
-    db_result_version = ParsingResultVersion(
-        parsing_result_id=result_id,
-        version=latest_version + 1,
-        content=version.content,
+    code_version = await db.get(CodeVersion, parent_result.code_version_id)
+    if code_version is None:
+        return None
+    # Compacted before the version number is allocated, which takes the write lock until the commit
+    code_content = str(code_version.content)
+    content = await run_analysis(compact_blocks, version.content, code_content, size=len(code_content))
+    next_version = await allocate_version(
+        db, ParsingResult, result_id, ParsingResultVersion, ParsingResultVersion.parsing_result_id
     )
+    if next_version is None:
+        return None
+    db_result_version = ParsingResultVersion(parsing_result_id=result_id, version=next_version, content=content)
     db.add(db_result_version)
     await db.commit()
-    await db.refresh(db_result_version)
+    if inline:
+        inline_versions([db_result_version], code_content)
     return db_result_version
 
 
@@ -0,0 +1,211 @@
+import ast
+import io
+import tokenize
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.services.static_parser import is_model_definition, is_training_function, node_lines
+
+BLOCK_KEYS = ("parameter", "model_block", "data_block")
+MAX_SPAN_GAP = 3
+
+# Functions that only call into these are plotting / logging helpers and are not sent to the LLM
+AUXILIARY_CALL_ROOTS = {"plt", "sns", "matplotlib", "seaborn", "logging", "logger", "log", "wandb", "writer", "mlflow"}
+
+
+@dataclass
+class SlicedCode:
+    """
+    Code reduced for the LLM prompt, with a map back to the original source.
+    """
+
+    text: str
+    # line_map[i] is the original (1-based) line number of sliced line i
+    line_map: List[int]
+    original_lines: List[str]
+    # Original lines belonging to dropped top-level definitions
+    dropped_lines: Set[int] = field(default_factory=set)
+
+
+def _call_roots(node: ast.AST) -> Set[str]:
+    roots = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call):
+            func = child.func
+            while isinstance(func, ast.Attribute):
+                func = func.value
+            if isinstance(func, ast.Name):
+                roots.add(func.id)
+    return roots
+
+
+def _is_auxiliary(node: ast.stmt) -> bool:
+    if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return False
+    roots = _call_roots(node) - {"print", "len", "range", "str", "format"}
+    return bool(roots) and roots <= AUXILIARY_CALL_ROOTS
+
+
+def _referenced_names(node: ast.AST) -> Set[str]:
+    return {child.id for child in ast.walk(node) if isinstance(child, ast.Name)}
+
+
+def _select_nodes(tree: ast.Module) -> List[ast.stmt]:
+    """
+    Keeps imports, top-level statements, the model definitions, the training
+    entry points and every definition reachable from them.
+    """
+    definitions: Dict[str, ast.stmt] = {}
+    kept: List[ast.stmt] = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            definitions[node.name] = node
+            if is_model_definition(node) or (is_training_function(node) and not _is_auxiliary(node)):
+                kept.append(node)
+        elif not (isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant)):
+            kept.append(node)
+
+    pending = list(kept)
+    while pending:
+        for name in _referenced_names(pending.pop()):
+            definition = definitions.get(name)
+            if definition is not None and definition not in kept and not _is_auxiliary(definition):
+                kept.append(definition)
+                pending.append(definition)
+    return sorted(kept, key=lambda node: node.lineno)
+
+
+def _docstring_lines(tree: ast.Module) -> Set[int]:
+    lines: Set[int] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)) and node.body:
+            first = node.body[0]
+            if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str):
+                lines.update(range(first.lineno, (first.end_lineno or first.lineno) + 1))
+    return lines
+
+
+def _comment_columns(code_content: str) -> Dict[int, int]:
+    columns: Dict[int, int] = {}
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code_content).readline):
+            if token.type == tokenize.COMMENT:
+                columns[token.start[0]] = token.start[1]
+    except (tokenize.TokenError, IndentationError):
+        pass
+    return columns
+
+
+def slice_code(code_content: str) -> SlicedCode:
+    """
+    Shrinks a script before it is embedded in the LLM prompt.
+
+    Drops top-level definitions that are not reachable from the model, the
+    argument parsing or the training code, strips docstrings and comments and
+    removes blank lines. Code that does not parse is only stripped of blank lines.
+    """
+    original_lines = code_content.splitlines()
+    try:
+        tree = ast.parse(code_content)
+    except (SyntaxError, ValueError):
+        line_map: List[int] = [number for number, line in enumerate(original_lines, start=1) if line.strip()]
+        return SlicedCode(
+            text="\n".join(original_lines[number - 1].rstrip() for number in line_map),
+            line_map=line_map,
+            original_lines=original_lines,
+        )
+
+    kept_lines: Set[int] = set()
+    for node in _select_nodes(tree):
+        start, end = node_lines(node)
+        kept_lines.update(range(start, end + 1))
+    dropped_lines: Set[int] = set()
+    for node in tree.body:
+        start, end = node_lines(node)
+        dropped_lines.update(number for number in range(start, end + 1) if number not in kept_lines)
+
+    docstrings = _docstring_lines(tree)
+    comments = _comment_columns(code_content)
+    sliced_lines: List[str] = []
+    line_map = []
+    for number in sorted(kept_lines - docstrings):
+        line = original_lines[number - 1]
+        if number in comments:
+            line = line[: comments[number]]
+        line = line.rstrip()
+        if line.strip():
+            sliced_lines.append(line)
+            line_map.append(number)
+
+    return SlicedCode(
+        text="\n".join(sliced_lines),
+        line_map=line_map,
+        original_lines=original_lines,
+        dropped_lines=dropped_lines,
+    )
+
+
+def identity_slice(lines: List[str]) -> SlicedCode:
+    # The code as is, for locating blocks that quote it
+    return SlicedCode(text="\n".join(lines), line_map=list(range(1, len(lines) + 1)), original_lines=lines)
+
+
+def map_block_to_original(block_text: str, sliced: SlicedCode) -> Optional[Tuple[str, List[List[int]]]]:
+    """
+    Maps a block the LLM returned (quoting the sliced code) back to the original source.
+
+    Returns:
+        The original text of the block and its [start, end] line spans, or None
+        if the block cannot be located reliably.
+    """
+    sliced_lines = [line.strip() for line in sliced.text.split("\n")]
+    block_lines = [line.strip() for line in block_text.splitlines() if line.strip()]
+    if not block_lines:
+        return None
+
+    matched: List[int] = []
+    position = 0
+    for line in block_lines:
+        try:
+            index = sliced_lines.index(line, position)
+        except ValueError:
+            continue
+        matched.append(index)
+        position = index + 1
+    if len(matched) < len(block_lines) / 2:
+        return None
+
+    # Consecutive matches (tolerating a few lines the LLM reworded) form one span,
+    # unless a dropped definition lies between them in the original source.
+    spans: List[List[int]] = []
+    previous = -1
+    for index in matched:
+        number = sliced.line_map[index]
+        if spans and index - previous <= MAX_SPAN_GAP and not any(
+            line in sliced.dropped_lines for line in range(spans[-1][1] + 1, number)
+        ):
+            spans[-1][1] = number
+        else:
+            spans.append([number, number])
+        previous = index
+
+    text = "\n\n".join("\n".join(sliced.original_lines[start - 1 : end]) for start, end in spans)
+    return text, spans
+
+
+def restore_blocks(parsed_json: dict, sliced: SlicedCode) -> dict:
+    """
+    Replaces the code blocks of an LLM result with the original source they came
+    from and records their line spans under `block_spans`.
+    """
+    block_spans: Dict[str, List[List[int]]] = {}
+    for key in BLOCK_KEYS:
+        block = parsed_json.get(key)
+        if not isinstance(block, str):
+            continue
+        mapped = map_block_to_original(block, sliced)
+        if mapped is not None:
+            parsed_json[key], block_spans[key] = mapped
+    if block_spans:
+        parsed_json["block_spans"] = block_spans
+    return parsed_json
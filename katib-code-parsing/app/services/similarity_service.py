@@ -0,0 +1,84 @@
+from typing import List, Optional, Tuple
+
+from sqlalchemy import exists, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.common.constants import NEAR_DUPLICATE_MIN_SIMILARITY
+from app.core.executor import run_analysis
+from app.models.code import CodeVersion
+from app.models.code_signature import CodeLSHBucket, CodeSignature
+from app.models.parsing_result import ParsingResult
+from app.services.minhash import compute_signature, estimate_similarity, lsh_buckets
+
+
+async def index_code_version(db: AsyncSession, code_version: CodeVersion) -> List[int]:
+    """
+    Adds a code version to the near-duplicate index.
+
+    Returns:
+        Its MinHash signature.
+    """
+    code_content = str(code_version.content)
+    signature = await run_analysis(compute_signature, code_content, size=len(code_content))
+    db.add(CodeSignature(code_version_id=code_version.id, signature=signature))
+    # One executemany; adding the rows to the session would insert them one by one to fetch their ids
+    await db.execute(
+        insert(CodeLSHBucket),
+        [{"code_version_id": code_version.id, "bucket": bucket} for bucket in lsh_buckets(signature)],
+    )
+    await db.commit()
+    return signature
+
+
+async def _get_signature(db: AsyncSession, code_version: CodeVersion) -> List[int]:
+    result = await db.execute(
+        select(CodeSignature.signature).filter(CodeSignature.code_version_id == code_version.id)
+    )
+    signature = result.scalars().first()
+    if signature is None:
+        return await index_code_version(db, code_version)
+    return list(signature)
+
+
+async def find_similar_versions(
+    db: AsyncSession,
+    code_version: CodeVersion,
+    min_similarity: Optional[float] = None,
+    limit: int = 10,
+    parsed_only: bool = False,
+) -> List[Tuple[int, float]]:
+    """
+    Finds near-duplicates of a code version (in any code) through the LSH index.
+
+    Args:
+        min_similarity: Estimated Jaccard similarity of the token shingles a
+            version needs. Defaults to NEAR_DUPLICATE_MIN_SIMILARITY.
+        parsed_only: Only return versions with a parsing result.
+
+    Returns:
+        (code version id, similarity) pairs, most similar first.
+    """
+    min_similarity = NEAR_DUPLICATE_MIN_SIMILARITY if min_similarity is None else min_similarity
+    signature = await _get_signature(db, code_version)
+    candidates = (
+        select(CodeLSHBucket.code_version_id)
+        .filter(CodeLSHBucket.bucket.in_(lsh_buckets(signature)))
+        .filter(CodeLSHBucket.code_version_id != code_version.id)
+        .distinct()
+    )
+    query = select(CodeSignature.code_version_id, CodeSignature.signature).filter(
+        CodeSignature.code_version_id.in_(candidates)
+    )
+    if parsed_only:
+        query = query.filter(exists().where(ParsingResult.code_version_id == CodeSignature.code_version_id))
+    result = await db.execute(query)
+
+    similar = []
+    for code_version_id, other in result.all():
+        similarity = estimate_similarity(signature, other)
+        if similarity >= min_similarity:
+            similar.append((code_version_id, similarity))
+    # Ties go to the most recent version
+    similar.sort(key=lambda pair: (-pair[1], -pair[0]))
+    return similar[:limit]
@@ -0,0 +1,39 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent calls with the same key into one in-flight call.
+
+    The first caller starts the call; callers arriving while it runs await the
+    same result (or exception). A caller being cancelled does not cancel the
+    call for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, "asyncio.Future[T]"] = {}
+
+    def in_flight(self, key: str) -> bool:
+        call = self._calls.get(key)
+        return call is not None and call.get_loop() is asyncio.get_running_loop()
+
+    async def do(self, key: str, function: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Returns:
+            The result, and whether it was shared from another caller's call.
+        """
+        if self.in_flight(key):
+            return await asyncio.shield(self._calls[key]), True
+
+        call = asyncio.ensure_future(function())
+        self._calls[key] = call
+
+        def forget(_: "asyncio.Future[T]") -> None:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+        call.add_done_callback(forget)
+        return await asyncio.shield(call), False
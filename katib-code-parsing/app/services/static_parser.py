@@ -0,0 +1,214 @@
+import ast
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+# Top-level import -> framework name, in order of preference when several are imported
+# (e.g. a Keras model trained on a scikit-learn dataset is a tensorflow script).
+FRAMEWORK_IMPORTS: List[Tuple[str, str]] = [
+    ("torch", "pytorch"),
+    ("pytorch_lightning", "pytorch"),
+    ("lightning", "pytorch"),
+    ("tensorflow", "tensorflow"),
+    ("keras", "tensorflow"),
+    ("jax", "jax"),
+    ("flax", "jax"),
+    ("xgboost", "xgboost"),
+    ("lightgbm", "lightgbm"),
+    ("sklearn", "scikit-learn"),
+]
+
+MODEL_BASE_SUFFIXES = ("Module", "Model", "LightningModule")
+MODEL_FACTORY_CALLS = {"Sequential", "Model", "Functional"}
+MODEL_ESTIMATOR_SUFFIXES = ("Classifier", "Regressor", "SVC", "SVR", "Pipeline")
+TRAINING_CALLS = {"backward", "step", "fit", "train_on_batch", "zero_grad", "evaluate"}
+TRAINING_FUNCTION_NAMES = {"main", "train", "test", "evaluate", "run", "fit"}
+LOSS_METRICS = {"loss", "val_loss"}
+
+METRIC_PATTERN = re.compile(r"^\s*(\w+)\s*=\s*\{")
+
+# Weight of each recognized part of the script in the confidence score
+CONFIDENCE_WEIGHTS = {
+    "framework": 0.25,
+    "model": 0.25,
+    "parameter": 0.2,
+    "entrypoint": 0.2,
+    "metric": 0.1,
+}
+
+
+def _call_name(node: ast.Call) -> str:
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    return ""
+
+
+def _base_name(node: ast.expr) -> str:
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return ""
+
+
+def call_names(node: ast.AST) -> Set[str]:
+    return {_call_name(child) for child in ast.walk(node) if isinstance(child, ast.Call)}
+
+
+def is_main_guard(node: ast.stmt) -> bool:
+    if not isinstance(node, ast.If) or not isinstance(node.test, ast.Compare):
+        return False
+    names = [node.test.left, *node.test.comparators]
+    return any(isinstance(name, ast.Name) and name.id == "__name__" for name in names)
+
+
+def is_model_definition(node: ast.stmt) -> bool:
+    if isinstance(node, ast.ClassDef):
+        return any(_base_name(base).endswith(MODEL_BASE_SUFFIXES) for base in node.bases)
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        calls = call_names(node)
+        return bool(calls & MODEL_FACTORY_CALLS) or any(call.endswith(MODEL_ESTIMATOR_SUFFIXES) for call in calls)
+    return False
+
+
+def is_training_function(node: ast.stmt) -> bool:
+    if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return False
+    return node.name in TRAINING_FUNCTION_NAMES or bool(call_names(node) & TRAINING_CALLS)
+
+
+def node_lines(node: ast.stmt) -> Tuple[int, int]:
+    decorators = getattr(node, "decorator_list", [])
+    start = min([node.lineno] + [decorator.lineno for decorator in decorators])
+    return start, node.end_lineno or node.lineno
+
+
+def _join_nodes(lines: List[str], nodes: List[ast.stmt]) -> str:
+    parts: List[str] = []
+    previous: Optional[ast.stmt] = None
+    for node in nodes:
+        start, end = node_lines(node)
+        text = "\n".join(lines[start - 1 : end])
+        both_imports = isinstance(node, (ast.Import, ast.ImportFrom)) and isinstance(
+            previous, (ast.Import, ast.ImportFrom)
+        )
+        if parts:
+            parts.append("\n" if both_imports else "\n\n")
+        parts.append(text)
+        previous = node
+    return "".join(parts)
+
+
+def _statement_source(lines: List[str], node: ast.stmt) -> str:
+    # Source of a (possibly multi-line) statement with its own indentation removed
+    segment = lines[node.lineno - 1 : (node.end_lineno or node.lineno)]
+    indent = node.col_offset
+    return "\n".join(line[indent:] if line[:indent].strip() == "" else line for line in segment)
+
+
+def detect_framework(tree: ast.Module) -> Optional[str]:
+    imported: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imported.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            imported.add(node.module.split(".")[0])
+    for module, framework in FRAMEWORK_IMPORTS:
+        if module in imported:
+            return framework
+    return None
+
+
+def extract_metrics(tree: ast.Module) -> List[str]:
+    """
+    Collects metric names from `metrics=[...]` arguments and Katib-style
+    `print('name={}'.format(...))` / f-string outputs. Losses are only kept
+    when nothing else is reported.
+    """
+    found: List[str] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.keyword) and node.arg == "metrics" and isinstance(node.value, (ast.List, ast.Tuple)):
+            for element in node.value.elts:
+                if isinstance(element, ast.Constant) and isinstance(element.value, str):
+                    found.append(element.value)
+        elif isinstance(node, ast.Call) and _call_name(node) == "print" and node.args:
+            argument = node.args[0]
+            if isinstance(argument, ast.Call) and isinstance(argument.func, ast.Attribute):
+                argument = argument.func.value
+            if isinstance(argument, ast.JoinedStr) and argument.values:
+                argument = argument.values[0]
+            if isinstance(argument, ast.Constant) and isinstance(argument.value, str):
+                match = METRIC_PATTERN.match(argument.value)
+                if match:
+                    found.append(match.group(1))
+
+    metrics = list(dict.fromkeys(found))
+    objectives = [metric for metric in metrics if metric not in LOSS_METRICS]
+    return objectives or metrics
+
+
+def extract_parameters(tree: ast.Module, lines: List[str]) -> str:
+    statements = [
+        node
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call) and _call_name(node.value) == "add_argument"
+    ]
+    statements.sort(key=lambda node: node.lineno)
+    return "\n".join(_statement_source(lines, node) for node in statements)
+
+
+def split_blocks(tree: ast.Module, lines: List[str]) -> Tuple[str, str]:
+    """
+    Splits top-level statements into the model block (imports, model and helper
+    definitions) and the data block (training functions, main and the entry point).
+    """
+    body = [node for node in tree.body if not (isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant))]
+    first_training = next(
+        (index for index, node in enumerate(body) if is_training_function(node) or is_main_guard(node)),
+        len(body),
+    )
+    return _join_nodes(lines, body[:first_training]), _join_nodes(lines, body[first_training:])
+
+
+def analyze_code(code_content: str) -> Tuple[Optional[Dict], float]:
+    """
+    Statically extracts the parse result of a training script, without an LLM.
+
+    Args:
+        code_content: The string content of the python code.
+
+    Returns:
+        The result in the same shape as the LLM output and a confidence score
+        between 0 and 1. The result is None if the code cannot be parsed.
+    """
+    try:
+        tree = ast.parse(code_content)
+    except (SyntaxError, ValueError):
+        return None, 0.0
+
+    lines = code_content.splitlines()
+    framework = detect_framework(tree)
+    metrics = extract_metrics(tree)
+    parameter = extract_parameters(tree, lines)
+    model_block, data_block = split_blocks(tree, lines)
+
+    found = {
+        "framework": framework is not None,
+        "model": any(is_model_definition(node) for node in tree.body),
+        "parameter": bool(parameter),
+        "entrypoint": any(is_main_guard(node) for node in tree.body)
+        and any(is_training_function(node) for node in tree.body),
+        "metric": bool(metrics),
+    }
+    confidence = round(sum(CONFIDENCE_WEIGHTS[part] for part, ok in found.items() if ok), 2)
+
+    result = {
+        "name": "unnamed_code",
+        "framework": framework or "unknown",
+        "metric": metrics,
+        "parameter": parameter,
+        "model_block": model_block,
+        "data_block": data_block,
+    }
+    return result, confidence
@@ -0,0 +1,33 @@
+from typing import Any, Optional
+
+from sqlalchemy import case, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+
+async def allocate_version(db: AsyncSession, parent: Any, parent_id: int, child: Any, child_parent_id: Any) -> Optional[int]:
+    """
+    Reserves the next version number of a code or parsing result, or returns None
+    if it does not exist.
+
+    The parent's `latest_version` counter is incremented by a single UPDATE, which
+    locks the parent row (the database, on SQLite) until the transaction ends, so
+    concurrent uploads always get distinct numbers; the unique (parent, version)
+    constraints reject anything that bypasses it. The counter never goes below the
+    highest stored version, for versions inserted without it, and numbers of
+    deleted versions are not handed out again.
+
+    Args:
+        parent: The parent model (Code or ParsingResult).
+        child: The version model (CodeVersion or ParsingResultVersion).
+        child_parent_id: The version column referencing the parent.
+    """
+    stored = select(func.coalesce(func.max(child.version), 0)).where(child_parent_id == parent.id).scalar_subquery()
+    result = await db.execute(
+        update(parent)
+        .where(parent.id == parent_id)
+        .values(latest_version=case((parent.latest_version > stored, parent.latest_version), else_=stored) + 1)
+        .returning(parent.latest_version)
+        .execution_options(synchronize_session="fetch")
+    )
+    return result.scalar_one_or_none()
@@ -0,0 +1,460 @@
+"""
+How version contents are written and read back.
+
+Code version contents are stored once per distinct text (CodeBlob). With delta
+storage enabled, a new code version's blob and a new parsing result version's
+JSON are stored as a line delta against the version before it, with a full copy
+(keyframe) every VERSION_KEYFRAME_INTERVAL versions. Deltas are applied as rows
+are loaded, with one query per statement for the chains not in the LRU cache,
+so `CodeVersion.content` and `ParsingResultVersion.content` always hold the
+full content. This applies to the sessions of the session factories passed to
+`install_version_storage`.
+"""
+
+import difflib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import ORMExecuteState, Session, make_transient_to_detached, sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.common.constants import (
+    VERSION_DELTA_CACHE_SIZE,
+    VERSION_DELTA_MAX_LINES,
+    VERSION_DELTA_STORAGE,
+    VERSION_KEYFRAME_INTERVAL,
+)
+from app.core import metrics
+from app.core.query_stats import allow_extra_statement
+from app.models.code import CodeVersion
+from app.models.code_blob import CodeBlob, compress_content, decompress_content
+from app.models.parsing_result import ParsingResultVersion
+
+DELTA_CACHE_HITS = "version_storage.cache_hits"
+DELTA_CACHE_MISSES = "version_storage.cache_misses"
+
+# Execution option of the queries reading chain rows, which need no chain resolution themselves. They are not
+# counted against query budgets: how many run depends on the cache and the chain layout
+_CHAIN_QUERY = "version_chain_query"
+# Session.info keys
+_UNRESOLVED = "version_chain_unresolved"
+_RESTORE = "version_chain_restore"
+_CHAIN_QUERY_OPTIONS: Dict[str, Any] = {_CHAIN_QUERY: True}
+
+_delta_storage = VERSION_DELTA_STORAGE
+_keyframe_interval = VERSION_KEYFRAME_INTERVAL
+
+
+class VersionedSession(Session):
+    """
+    The (sync) session class of the session factories passed to
+    `install_version_storage`, which the hooks below are attached to.
+    """
+
+
+def install_version_storage(session_factory: sessionmaker) -> None:
+    """
+    Makes the async sessions of `session_factory` store and read back version
+    contents. Idempotent.
+    """
+    if session_factory.kw.get("sync_session_class") is not VersionedSession:
+        session_factory.configure(sync_session_class=VersionedSession)
+
+
+def make_delta(base: str, target: str, max_lines: Optional[int] = None) -> Optional[List[Any]]:
+    """
+    Line delta turning `base` into `target`: `[start, end]` copies lines of
+    the base, a string is inserted as is. Only the lines between the common
+    leading and trailing ones are diffed; None when they span more than
+    `max_lines` (default VERSION_DELTA_MAX_LINES) lines of either text.
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    common = min(len(base_lines), len(target_lines))
+    head = 0
+    while head < common and base_lines[head] == target_lines[head]:
+        head += 1
+    tail = 0
+    while tail < common - head and base_lines[-1 - tail] == target_lines[-1 - tail]:
+        tail += 1
+    base_end, target_end = len(base_lines) - tail, len(target_lines) - tail
+    if max(base_end, target_end) - head > (VERSION_DELTA_MAX_LINES if max_lines is None else max_lines):
+        return None
+
+    delta: List[Any] = [[0, head]] if head else []
+    matcher = difflib.SequenceMatcher(None, base_lines[head:base_end], target_lines[head:target_end], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([head + i1, head + i2])
+        elif j2 > j1:
+            delta.append("".join(target_lines[head + j1 : head + j2]))
+    if tail:
+        delta.append([base_end, len(base_lines)])
+    return delta
+
+
+def apply_delta(base: str, delta: List[Any]) -> str:
+    base_lines = base.splitlines(keepends=True)
+    return "".join(op if isinstance(op, str) else "".join(base_lines[op[0] : op[1]]) for op in delta)
+
+
+def dump_json(content: Any) -> str:
+    # One line per key and item, so that deltas between JSON versions stay small
+    return json.dumps(content, sort_keys=True, indent=0, ensure_ascii=False)
+
+
+class LRUCache:
+    """
+    Reconstructed contents by key, least recently used first out.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._entries: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        metrics.increment(DELTA_CACHE_HITS if value is not None else DELTA_CACHE_MISSES)
+        return value
+
+    def put(self, key: Hashable, value: str) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache = LRUCache(VERSION_DELTA_CACHE_SIZE)
+
+
+def configure_version_storage(
+    delta_storage: Optional[bool] = None, keyframe_interval: Optional[int] = None, cache_size: Optional[int] = None
+) -> None:
+    """
+    Switches delta storage of new versions on or off and sizes the chains and
+    the cache (emptying it). Unset values go back to their configured default.
+    Stored deltas are read back whatever the setting.
+    """
+    global _delta_storage, _keyframe_interval, _cache
+    _delta_storage = VERSION_DELTA_STORAGE if delta_storage is None else delta_storage
+    _keyframe_interval = VERSION_KEYFRAME_INTERVAL if keyframe_interval is None else keyframe_interval
+    _cache = LRUCache(VERSION_DELTA_CACHE_SIZE if cache_size is None else cache_size)
+
+
+def get_delta_cache() -> LRUCache:
+    return _cache
+
+
+ChainRows = Dict[Hashable, Tuple[Optional[Hashable], Any]]
+
+
+def _cached(kind: str, keys: Iterable[Hashable]) -> Tuple[Dict[Hashable, str], Set[Hashable]]:
+    texts: Dict[Hashable, str] = {}
+    missing: Set[Hashable] = set()
+    for key in keys:
+        text = _cache.get((kind, key))
+        if text is None:
+            missing.add(key)
+        else:
+            texts[key] = text
+    return texts, missing
+
+
+def _chain_query(session: Session, statement: Any) -> Any:
+    allow_extra_statement()
+    return session.execute(statement, execution_options=_CHAIN_QUERY_OPTIONS)
+
+
+def _rebuild(kind: str, keys: Iterable[Hashable], rows: ChainRows) -> Dict[Hashable, str]:
+    # rows: key -> (base key, full text of a keyframe or delta); applies each chain forward from its keyframe or
+    # from the latest cached version
+    texts: Dict[Hashable, str] = {}
+    for key in keys:
+        chain: List[Hashable] = []
+        current = key
+        text = None
+        while True:
+            text = texts.get(current)
+            if text is None:
+                text = _cache.get((kind, current))
+            if text is not None:
+                break
+            chain.append(current)
+            base = rows[current][0]
+            if base is None:
+                break
+            current = base
+        for member in reversed(chain):
+            base, stored = rows[member]
+            text = stored if base is None else apply_delta(str(text), stored)
+            texts[member] = text
+            _cache.put((kind, member), text)
+        texts[key] = str(text)
+    return texts
+
+
+def _blob_texts(session: Session, hashes: Set[str]) -> Dict[Hashable, str]:
+    # Texts of code blobs, reading the chains not in the cache with one recursive query
+    texts, missing = _cached("blob", hashes)
+    if not missing:
+        return texts
+    table = CodeBlob.__table__
+    columns = (table.c.sha256, table.c.base_sha256, table.c.data, table.c.compression)
+    chain = select(*columns).where(table.c.sha256.in_(missing)).cte("blob_chain", recursive=True)
+    chain = chain.union(select(*columns).join(chain, table.c.sha256 == chain.c.base_sha256))
+    rows: ChainRows = {}
+    for sha256, base_sha256, data, compression in _chain_query(session, select(chain)):
+        text = decompress_content(data, compression)
+        rows[sha256] = (base_sha256, text if base_sha256 is None else json.loads(text))
+    texts.update(_rebuild("blob", missing, rows))
+    return texts
+
+
+def _result_texts(session: Session, version_ids: Set[int]) -> Dict[Hashable, str]:
+    # Canonical JSON of parsing result versions, reading the chains not in the cache with one recursive query
+    texts, missing = _cached("result", version_ids)
+    if not missing:
+        return texts
+    table = ParsingResultVersion.__table__
+    columns = (table.c.id, table.c.base_version_id, table.c.content)
+    chain = select(*columns).where(table.c.id.in_(missing)).cte("result_chain", recursive=True)
+    chain = chain.union(select(*columns).join(chain, table.c.id == chain.c.base_version_id))
+    rows: ChainRows = {}
+    for version_id, base_version_id, content in _chain_query(session, select(chain)):
+        rows[version_id] = (base_version_id, dump_json(content) if base_version_id is None else content)
+    texts.update(_rebuild("result", missing, rows))
+    return texts
+
+
+def _defer_resolution(target: Any, session: Session) -> None:
+    # Loaded deltas are resolved from the cache, or once the statement loading them has returned all its rows
+    if not isinstance(session, VersionedSession):
+        return
+    if isinstance(target, CodeBlob):
+        if target.base_sha256 is None or "_text" in target.__dict__:
+            return
+        text = _cache.get(("blob", target.sha256))
+        if text is not None:
+            target._text = text
+            return
+    else:
+        if target.base_version_id is None:
+            return
+        text = _cache.get(("result", target.id))
+        if text is not None:
+            set_committed_value(target, "content", json.loads(text))
+            return
+    session.info.setdefault(_UNRESOLVED, []).append(target)
+
+
+@event.listens_for(CodeBlob, "load")
+@event.listens_for(ParsingResultVersion, "load")
+def _on_load(target: Any, context: Any) -> None:
+    _defer_resolution(target, context.session)
+
+
+@event.listens_for(CodeBlob, "refresh")
+@event.listens_for(ParsingResultVersion, "refresh")
+def _on_refresh(target: Any, context: Any, attrs: Optional[Iterable[str]]) -> None:
+    if attrs is None or "content" in attrs or "data" in attrs:
+        target.__dict__.pop("_text", None)
+        _defer_resolution(target, context.session)
+
+
+def _resolve_loaded(session: Session) -> None:
+    unresolved = session.info.pop(_UNRESOLVED, None)
+    if not unresolved:
+        return
+    blobs = [target for target in unresolved if isinstance(target, CodeBlob)]
+    if blobs:
+        texts = _blob_texts(session, {str(blob.sha256) for blob in blobs})
+        for blob in blobs:
+            blob._text = texts[blob.sha256]
+    versions = [target for target in unresolved if isinstance(target, ParsingResultVersion)]
+    if versions:
+        texts = _result_texts(session, {int(version.id) for version in versions})
+        for version in versions:
+            set_committed_value(version, "content", json.loads(texts[version.id]))
+
+
+@event.listens_for(VersionedSession, "do_orm_execute")
+def _resolve_chains(state: ORMExecuteState) -> Any:
+    if not state.is_select or state.execution_options.get(_CHAIN_QUERY):
+        return None
+    if not any(mapper.class_ in (CodeVersion, CodeBlob, ParsingResultVersion) for mapper in state.all_mappers):
+        return None
+    # Load all rows first, so that their chains are read with one query
+    frozen = state.invoke_statement().freeze()
+    _resolve_loaded(state.session)
+    return frozen()
+
+
+def _deduplicate_blobs(session: Session) -> Dict[str, CodeBlob]:
+    """
+    New versions get a new blob; the ones whose text is already stored (or
+    pending twice) are swapped for the existing blob, so that storing existing
+    content only inserts the version row.
+
+    Returns:
+        The new blobs to insert, by hash.
+    """
+    pending: Dict[str, CodeBlob] = {}
+    replacements: Dict[CodeBlob, CodeBlob] = {}
+    for obj in list(session.new):
+        if not isinstance(obj, CodeBlob):
+            continue
+        sha256 = str(obj.sha256)
+        loaded = session.identity_map.get(session.identity_key(CodeBlob, sha256))
+        if loaded is not None:
+            replacements[obj] = loaded
+        elif sha256 in pending:
+            replacements[obj] = pending[sha256]
+        else:
+            pending[sha256] = obj
+
+    if replacements:
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, CodeVersion) and obj.blob in replacements:
+                obj.blob = replacements[obj.blob]
+        for blob in replacements:
+            session.expunge(blob)
+    if not pending:
+        return pending
+
+    stored = session.execute(
+        select(CodeBlob.sha256).where(CodeBlob.sha256.in_(list(pending))), execution_options=_CHAIN_QUERY_OPTIONS
+    ).scalars().all()
+    for sha256 in stored:
+        # Attach the new instance as the stored row instead of inserting it (it holds the same text)
+        blob = pending.pop(sha256)
+        session.expunge(blob)
+        make_transient_to_detached(blob)
+        session.add(blob)
+    return pending
+
+
+def _encode_blobs(session: Session, new_blobs: Dict[str, CodeBlob]) -> None:
+    # Stores each new blob as a delta against the content of the previous version of its code
+    for obj in list(session.new):
+        if not isinstance(obj, CodeVersion) or obj.code_id is None:
+            continue
+        blob = obj.blob
+        if blob is None or new_blobs.get(blob.sha256) is not blob or blob.base_sha256 is not None:
+            continue
+        # Kept for the delta of the next version
+        _cache.put(("blob", blob.sha256), blob.text)
+        if obj.version == 1:
+            continue
+        previous = _chain_query(
+            session,
+            select(CodeVersion.content_hash, CodeBlob.chain_depth)
+            .join(CodeBlob, CodeBlob.sha256 == CodeVersion.content_hash)
+            .where(CodeVersion.code_id == obj.code_id, CodeVersion.version < obj.version)
+            .order_by(CodeVersion.version.desc())
+            .limit(1),
+        ).first()
+        if previous is None or previous.chain_depth + 1 >= _keyframe_interval:
+            continue
+        base_text = _blob_texts(session, {previous.content_hash})[previous.content_hash]
+        delta = make_delta(base_text, blob.text)
+        if delta is None:
+            continue
+        data, compression = compress_content(json.dumps(delta))
+        if len(data) < blob.stored_size:
+            blob.data, blob.compression, blob.stored_size = data, compression, len(data)
+            blob.base_sha256, blob.chain_depth = previous.content_hash, previous.chain_depth + 1
+
+
+def _encode_result_versions(session: Session) -> None:
+    # Stores each new parsing result version as a delta against the previous version of its result
+    for obj in list(session.new):
+        if not isinstance(obj, ParsingResultVersion) or obj.parsing_result_id is None or obj.base_version_id is not None:
+            continue
+        content = obj.content
+        text = dump_json(content)
+        # The session keeps the full content once the version is written, and the cache has it for the next delta
+        session.info.setdefault(_RESTORE, []).append((obj, content, text))
+        if obj.version == 1:
+            continue
+        previous = _chain_query(
+            session,
+            select(ParsingResultVersion.id, ParsingResultVersion.chain_depth)
+            .where(
+                ParsingResultVersion.parsing_result_id == obj.parsing_result_id,
+                ParsingResultVersion.version < obj.version,
+            )
+            .order_by(ParsingResultVersion.version.desc())
+            .limit(1),
+        ).first()
+        if previous is None or previous.chain_depth + 1 >= _keyframe_interval:
+            continue
+        base_text = _result_texts(session, {previous.id})[previous.id]
+        delta = make_delta(base_text, text)
+        if delta is not None and len(json.dumps(delta)) < len(text):
+            obj.content = delta
+            obj.base_version_id, obj.chain_depth = previous.id, previous.chain_depth + 1
+
+
+def _rebase_dependents(session: Session) -> None:
+    # Versions stored as deltas against a deleted parsing result version are rewritten in full
+    deleted = {obj.id for obj in session.deleted if isinstance(obj, ParsingResultVersion)}
+    if not deleted:
+        return
+    dependents = _chain_query(
+        session,
+        select(ParsingResultVersion.id).where(
+            ParsingResultVersion.base_version_id.in_(deleted), ParsingResultVersion.id.notin_(deleted)
+        ),
+    ).scalars().all()
+    if dependents:
+        texts = _result_texts(session, set(dependents))
+        table = ParsingResultVersion.__table__
+        for version_id in dependents:
+            session.execute(
+                update(table)
+                .where(table.c.id == version_id)
+                .values(content=json.loads(texts[version_id]), base_version_id=None, chain_depth=0)
+            )
+            loaded = session.identity_map.get(session.identity_key(ParsingResultVersion, version_id))
+            if loaded is not None:
+                set_committed_value(loaded, "base_version_id", None)
+                set_committed_value(loaded, "chain_depth", 0)
+    # Ids can be reused by later versions
+    for version_id in deleted:
+        _cache.discard(("result", version_id))
+
+
+@event.listens_for(VersionedSession, "before_flush")
+def _store_versions(session: Session, flush_context: Any, instances: Any) -> None:
+    new_blobs = _deduplicate_blobs(session)
+    if _delta_storage:
+        _encode_blobs(session, new_blobs)
+        _encode_result_versions(session)
+    _rebase_dependents(session)
+
+
+@event.listens_for(VersionedSession, "after_flush_postexec")
+def _restore_contents(session: Session, flush_context: Any) -> None:
+    for obj, content, text in session.info.pop(_RESTORE, []):
+        if obj.base_version_id is not None:
+            set_committed_value(obj, "content", content)
+        _cache.put(("result", obj.id), text)
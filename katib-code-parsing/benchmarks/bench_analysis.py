@@ -0,0 +1,113 @@
+"""
+Measures how the CPU-bound analysis stage of the parsing pipeline (normalize and
+hash, static analysis, slicing, MinHash signature, incremental diff against a
+previous version) scales with the analysis process pool, on a batch of large
+(about 5k-line) scripts analyzed concurrently.
+
+Each worker count is compared with the single-loop baseline (0 workers: every
+stage runs inline on the event loop). The longest event loop stall shows how
+long other requests would have been blocked.
+
+Usage:
+    python -m benchmarks.bench_analysis                      # 0, 1, 2, 4, ... up to the CPU count
+    python -m benchmarks.bench_analysis --workers 0 2 8 --batch 64
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Awaitable, List, Optional, Tuple
+
+from app.core.executor import configure_analysis_executor, get_analysis_executor, run_analysis
+from app.services.incremental_parser import rederive_blocks
+from app.services.minhash import compute_signature
+from app.services.parse_cache_service import compute_code_hash
+from app.services.prompt_slicer import slice_code
+from app.services.static_parser import analyze_code
+from benchmarks.corpus import example_scripts, synthetic_script
+
+# Helper groups of about 40 lines each
+UTILITIES_PER_SCRIPT = 120
+
+Script = Tuple[str, str, Optional[dict]]
+
+
+def build_batch(size: int) -> List[Script]:
+    """
+    `size` large scripts, each with the previous version it is re-parsed against.
+    """
+    batch: List[Script] = []
+    bases = example_scripts()
+    for index in range(size):
+        _, base = bases[index % len(bases)]
+        previous = synthetic_script(base, UTILITIES_PER_SCRIPT + index)
+        # The new version changes one helper, like a small edit between two uploads
+        code = previous.replace('level="INFO"', 'level="DEBUG"', 1)
+        batch.append((previous, code, analyze_code(previous)[0]))
+    return batch
+
+
+async def analyze(previous: str, code: str, previous_result: Optional[dict]) -> None:
+    size = len(code)
+    stages: List[Awaitable] = [
+        run_analysis(compute_code_hash, code, size=size),
+        run_analysis(analyze_code, code, size=size),
+        run_analysis(slice_code, code, size=size),
+        run_analysis(compute_signature, code, size=size),
+    ]
+    if previous_result is not None:
+        stages.append(run_analysis(rederive_blocks, previous, previous_result, code, size=size))
+    # One request runs its stages in sequence; concurrency comes from the batch
+    for stage in stages:
+        await stage
+
+
+async def watch_loop(stalls: List[float], stop: asyncio.Event) -> None:
+    # Wakes up every millisecond and records how late it was
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        stalls.append(time.perf_counter() - started - 0.001)
+
+
+async def run_batch(batch: List[Script]) -> Tuple[float, float]:
+    stalls: List[float] = []
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stalls, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(analyze(previous, code, result) for previous, code, result in batch))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await watcher
+    return elapsed, max(stalls, default=0.0)
+
+
+async def main(worker_counts: List[int], batch_size: int, repeat: int) -> None:
+    batch = build_batch(batch_size)
+    lines = sum(len(code.splitlines()) for _, code, _ in batch) // len(batch)
+    print(f"batch: {len(batch)} scripts of about {lines} lines, {os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'seconds':>8} {'scripts/s':>10} {'speedup':>8} {'max stall ms':>13}")
+    baseline: Optional[float] = None
+    for workers in worker_counts:
+        configure_analysis_executor(workers=workers, min_chars=0)
+        if get_analysis_executor() is not None:
+            # Start the workers (and their imports) before timing
+            await run_batch(batch[: workers or 1])
+        elapsed, stall = min([await run_batch(batch) for _ in range(repeat)])
+        if workers == 0:
+            baseline = elapsed
+        speedup = f"{baseline / elapsed:.2f}x" if baseline else "-"
+        print(f"{workers:>7} {elapsed:>8.2f} {len(batch) / elapsed:>10.2f} {speedup:>8} {stall * 1000:>13.1f}")
+    configure_analysis_executor(workers=0)
+
+
+if __name__ == "__main__":
+    cpus = os.cpu_count() or 1
+    default_workers = [0] + [count for count in (1, 2, 4, 8, 16, 32) if count < cpus] + [cpus]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers, help="pool sizes to measure")
+    parser.add_argument("--batch", type=int, default=32, help="scripts analyzed concurrently")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per pool size (the fastest is reported)")
+    args = parser.parse_args()
+    asyncio.run(main(args.workers, args.batch, args.repeat))
@@ -0,0 +1,131 @@
+"""
+Runs mixed read/write API traffic (code uploads, new versions, listings and
+lookups) from concurrent clients against a file SQLite database, once with the
+previous engine setup (SQLite defaults with a rollback journal, every statement
+echoed) and once with the configured engine profile
+(`create_database_engine`: WAL, busy timeout, pragmas, pool sizing).
+
+Reports throughput, latency percentiles and "database is locked" errors per profile.
+
+Usage:
+    python -m benchmarks.bench_database
+    python -m benchmarks.bench_database --clients 32 --requests 50 --profiles tuned
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, List, cast
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import create_database_engine, get_db, get_session_factory
+from app.main import app
+from app.models import Base
+from app.services.parse_metrics_service import percentile
+from app.services.version_storage import install_version_storage
+from benchmarks.corpus import example_scripts
+
+PROFILES = ("legacy", "tuned")
+
+
+def create_engine_for(profile: str, url: str) -> AsyncEngine:
+    if profile == "legacy":
+        # What app/core/database.py used to do
+        return create_async_engine(url, echo=True)
+    return create_database_engine(url, echo=False)
+
+
+async def client_session(client: AsyncClient, requests: int, scripts: List[str], seed: int, outcomes: Dict) -> None:
+    rng = random.Random(seed)
+    code_ids: List[int] = []
+    for index in range(requests):
+        # About a third of the requests write
+        roll = rng.random()
+        script = rng.choice(scripts) + f"\n# client {seed} request {index}\n"
+        started = time.perf_counter()
+        try:
+            if roll < 0.2 or not code_ids:
+                response = await client.post("/codes/", json={"name": f"bench-{seed}-{index}", "content": script})
+                if response.status_code == 201:
+                    code_ids.append(response.json()["id"])
+            elif roll < 0.35:
+                response = await client.post(f"/codes/{rng.choice(code_ids)}/versions/", json={"content": script})
+            elif roll < 0.7:
+                response = await client.get(f"/codes/{rng.choice(code_ids)}")
+            else:
+                response = await client.get("/codes/", params={"limit": 20})
+            key = "ok" if response.status_code < 400 else f"http {response.status_code}"
+        except Exception as e:
+            key = "database is locked" if "database is locked" in str(e) else type(e).__name__
+        outcomes.setdefault(key, 0)
+        outcomes[key] += 1
+        outcomes.setdefault("latencies", []).append(time.perf_counter() - started)
+
+
+async def run_profile(profile: str, clients: int, requests: int) -> str:
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite+aiosqlite:///{Path(directory) / 'bench.db'}"
+        engine = create_engine_for(profile, url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+        install_version_storage(session_factory)
+
+        async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
+            async with session_factory() as session:
+                yield session
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_session_factory] = lambda: session_factory
+        scripts = [content for _, content in example_scripts()]
+        outcomes: Dict = {}
+        # FastAPI's ASGI signature is looser than the one httpx declares
+        transport = ASGITransport(app=cast(Any, app), raise_app_exceptions=True)
+        async with AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            await asyncio.gather(
+                *(client_session(client, requests, scripts, seed, outcomes) for seed in range(clients))
+            )
+            elapsed = time.perf_counter() - started
+        app.dependency_overrides = {}
+        await engine.dispose()
+
+    latencies = sorted(outcomes.pop("latencies"))
+    total = len(latencies)
+    locked = outcomes.get("database is locked", 0)
+    report = (
+        f"{profile:>7} {total / elapsed:>9.1f} {percentile(latencies, 50) * 1000:>8.1f}"
+        f" {percentile(latencies, 95) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f}"
+        f" {total - outcomes.get('ok', 0):>7} {locked:>7}\n"
+    )
+    other = {key: count for key, count in outcomes.items() if key not in ("ok", "database is locked")}
+    if other:
+        report += f"        other errors: {other}\n"
+    return report
+
+
+async def main(profiles: List[str], clients: int, requests: int) -> None:
+    print(f"{clients} clients x {requests} requests")
+    print(f"{'profile':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'locked':>7}")
+    for profile in profiles:
+        # The legacy profile echoes every statement to stdout; keep it (but not its cost) out of the report
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            report = await run_profile(profile, clients, requests)
+        print(report, end="")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES), help="engine setups to run")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent API clients")
+    parser.add_argument("--requests", type=int, default=40, help="requests per client")
+    args = parser.parse_args()
+    asyncio.run(main(args.profiles, args.clients, args.requests))
@@ -0,0 +1,189 @@
+"""
+Runs the benchmark corpus through the full parsing service (cache, static fast
+path, slicing, LLM, repair, storage) and reports throughput, per-stage latency
+and block-extraction accuracy against the golden outputs under `examples/`.
+
+LLM answers come from a cassette (see `app/services/llm_backend.py`), so runs
+are offline and repeatable:
+
+Usage:
+    python -m benchmarks.bench_pipeline --mode record   # call the LLM once, saving its answers (needs an API key)
+    python -m benchmarks.bench_pipeline                 # replay the saved answers
+    python -m benchmarks.bench_pipeline --seed-golden   # replay the golden outputs as if the LLM had answered them
+
+Add --no-fast-path to send every script to the LLM, even those the static parser recognizes.
+
+--seed-golden measures the pipeline around the LLM, not the model: its accuracy
+only reflects what slicing, repair and block mapping do to a perfect answer.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import metrics
+from app.core.parse_context import parse_context
+from app.models import Base, Code, CodeVersion
+from app.schemas.parsing_result import ParsingResultCreate
+from app.services import llm_service, parsing_service
+from app.services.llm_backend import BACKEND_MODES, BACKEND_REPLAY, COMPLETION, Cassette, prompt_hash
+from app.services.model_router import get_model_router
+from app.services.parsing_service import PARSE_SOURCES
+from app.services.prompt_slicer import BLOCK_KEYS, slice_code
+from app.services.version_storage import install_version_storage
+from benchmarks.corpus import corpus, golden_results
+
+DEFAULT_CASSETTE = Path(__file__).resolve().parent / "cassettes" / "corpus.json"
+
+
+def golden_for(name: str, golden: Dict[str, str]) -> Optional[dict]:
+    # Synthetic variants only add unused code, so they share the golden output of their base script
+    base = name.split("_padded_")[0]
+    return json.loads(golden[base]) if base in golden else None
+
+
+def block_f1(expected: str, actual: str) -> float:
+    """
+    F1 score of the non-blank lines (whitespace-stripped) of an extracted block.
+    """
+    expected_lines = Counter(line.strip() for line in expected.splitlines() if line.strip())
+    actual_lines = Counter(line.strip() for line in actual.splitlines() if line.strip())
+    if not expected_lines and not actual_lines:
+        return 1.0
+    overlap = sum((expected_lines & actual_lines).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(actual_lines.values())
+    recall = overlap / sum(expected_lines.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def seed_golden_cassette(path: Path) -> None:
+    """
+    Writes a cassette answering each corpus prompt, for every model tier, with its golden output.
+    """
+    cassette = Cassette(str(path))
+    golden = golden_results()
+    for name, code in corpus():
+        expected = golden_for(name, golden)
+        if expected is None:
+            continue
+        sliced = slice_code(code) if llm_service.LLM_PROMPT_SLICING else None
+        prompt = llm_service.get_llm_prompt(sliced.text if sliced else code)
+        content = json.dumps(expected)
+        for model in get_model_router().models.values():
+            completion = {
+                "id": f"golden-{name}",
+                "object": "chat.completion",
+                "created": 0,
+                "model": model,
+                "choices": [
+                    {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}
+                ],
+                "usage": {
+                    "prompt_tokens": llm_service.estimate_tokens(prompt),
+                    "completion_tokens": llm_service.estimate_tokens(content),
+                    "total_tokens": llm_service.estimate_tokens(prompt) + llm_service.estimate_tokens(content),
+                },
+            }
+            cassette.put(prompt_hash(model, llm_service._get_llm_messages(prompt)), COMPLETION, completion)
+    cassette.flush()
+
+
+def skip_fast_path(code_content: str, min_confidence: float = 0.0) -> Optional[dict]:
+    # Stands in for the static fast path with --no-fast-path; module-level so the analysis pool can run it
+    return None
+
+
+async def run(mode: str, cassette: Path, fast_path: bool) -> None:
+    llm_service.configure_llm_backend(mode, str(cassette))
+    if not fast_path:
+        parsing_service.parse_code_with_fast_path = skip_fast_path
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    install_version_storage(session_factory)
+    golden = golden_results()
+
+    print(
+        f"{'script':32} {'source':>10} {'total ms':>9} {'slice ms':>9} {'llm ms':>8} {'queue ms':>9}"
+        f" {'other ms':>9} {'blocks':>7} {'fw':>3} {'metric':>6}"
+    )
+    scores: List[float] = []
+    failures = 0
+    started = time.perf_counter()
+    scripts = corpus()
+    async with session_factory() as db:
+        for name, code in scripts:
+            code_row = Code(name=name)
+            db.add(code_row)
+            await db.commit()
+            code_version = CodeVersion(code_id=code_row.id, version=1, content=code)
+            db.add(code_version)
+            await db.commit()
+
+            slice_started = time.perf_counter()
+            slice_code(code)
+            slice_ms = (time.perf_counter() - slice_started) * 1000
+            counts = {source: metrics.get_counter(f"parse.source.{source}") for source in PARSE_SOURCES}
+            parse_started = time.perf_counter()
+            try:
+                with parse_context() as context:
+                    result = await parsing_service.create_parsing_result(
+                        db, int(code_version.id), ParsingResultCreate(name=name), session_factory
+                    )
+            except Exception as e:
+                failures += 1
+                print(f"{name:32} failed: {e}")
+                continue
+            if result is None:
+                failures += 1
+                print(f"{name:32} failed: code version not found")
+                continue
+            total_ms = (time.perf_counter() - parse_started) * 1000
+            llm_ms, queue_ms = context.llm_latency * 1000, context.queue_wait * 1000
+            content = result.versions[-1].content
+            source = next(key for key, count in counts.items() if metrics.get_counter(f"parse.source.{key}") > count)
+
+            expected = golden_for(name, golden)
+            accuracy = framework_ok = metric_ok = "-"
+            if expected is not None:
+                score = sum(block_f1(expected[key], content.get(key) or "") for key in BLOCK_KEYS) / len(BLOCK_KEYS)
+                scores.append(score)
+                accuracy = f"{score:.2f}"
+                framework_ok = "ok" if content.get("framework") == expected["framework"] else "x"
+                metric_ok = "ok" if sorted(content.get("metric") or []) == sorted(expected["metric"]) else "x"
+            print(
+                f"{name:32} {source:>10} {total_ms:>9.1f} {slice_ms:>9.2f} {llm_ms:>8.1f} {queue_ms:>9.1f}"
+                f" {total_ms - llm_ms - queue_ms:>9.1f} {accuracy:>7} {framework_ok:>3} {metric_ok:>6}"
+            )
+    elapsed = time.perf_counter() - started
+
+    parsed = len(scripts) - failures
+    print(f"throughput: {parsed / elapsed:.2f} scripts/s ({parsed} parsed, {failures} failed in {elapsed:.2f}s)")
+    if scores:
+        print(f"mean block accuracy (line F1) against golden outputs: {sum(scores) / len(scores):.3f}")
+    await llm_service.close_llm_client()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=BACKEND_MODES, default=BACKEND_REPLAY, help="where LLM answers come from")
+    parser.add_argument("--cassette", type=Path, default=DEFAULT_CASSETTE, help="cassette file to record to or replay")
+    parser.add_argument(
+        "--seed-golden", action="store_true", help="first write the golden outputs to the cassette as LLM answers"
+    )
+    parser.add_argument("--no-fast-path", action="store_true", help="send every script to the LLM")
+    args = parser.parse_args()
+    if args.seed_golden:
+        seed_golden_cassette(args.cassette)
+    asyncio.run(run(args.mode, args.cassette, not args.no_fast_path))
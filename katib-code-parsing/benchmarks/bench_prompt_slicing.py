@@ -0,0 +1,55 @@
+"""
+Measures how much AST prompt slicing shrinks the LLM input on the benchmark corpus.
+
+Usage:
+    python -m benchmarks.bench_prompt_slicing          # token reduction only
+    python -m benchmarks.bench_prompt_slicing --live   # also time real LLM calls
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.services import llm_service
+from app.services.llm_service import estimate_tokens, get_llm_prompt
+from app.services.prompt_slicer import slice_code
+from benchmarks.corpus import corpus
+
+
+async def time_llm_call(code: str, slicing: bool) -> float:
+    llm_service.LLM_PROMPT_SLICING = slicing
+    started = time.perf_counter()
+    await llm_service.parse_code_with_llm(code)
+    return time.perf_counter() - started
+
+
+async def main(live: bool) -> None:
+    print(f"{'script':32} {'lines':>6} {'tokens':>8} {'sliced':>8} {'saved':>7} {'slice ms':>9}", end="")
+    print(f" {'full s':>7} {'sliced s':>9}" if live else "")
+    total_full = total_sliced = 0
+    for name, code in corpus():
+        started = time.perf_counter()
+        sliced = slice_code(code)
+        slice_ms = (time.perf_counter() - started) * 1000
+        full_tokens = estimate_tokens(get_llm_prompt(code))
+        sliced_tokens = estimate_tokens(get_llm_prompt(sliced.text))
+        total_full += full_tokens
+        total_sliced += sliced_tokens
+        print(
+            f"{name:32} {len(code.splitlines()):>6} {full_tokens:>8} {sliced_tokens:>8}"
+            f" {1 - sliced_tokens / full_tokens:>7.1%} {slice_ms:>9.2f}",
+            end="",
+        )
+        if live:
+            full_s = await time_llm_call(code, slicing=False)
+            sliced_s = await time_llm_call(code, slicing=True)
+            print(f" {full_s:>7.2f} {sliced_s:>9.2f}", end="")
+        print()
+    print(f"total prompt tokens: {total_full} -> {total_sliced} ({1 - total_sliced / total_full:.1%} saved)")
+    await llm_service.close_llm_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--live", action="store_true", help="also time real LLM calls (needs an API key)")
+    asyncio.run(main(parser.parse_args().live))
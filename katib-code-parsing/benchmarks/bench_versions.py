@@ -0,0 +1,164 @@
+"""
+Measures storage size and read latency of long version chains: one script
+uploaded as many versions that each change a handful of lines, and one parsing
+result edited as many versions, stored in full or as delta chains with a
+keyframe every N versions (`VERSION_KEYFRAME_INTERVAL`).
+
+Reads fetch random single code versions and the whole parsing result, cold
+(delta cache emptied before every read) and warm (delta cache kept).
+
+Usage:
+    python -m benchmarks.bench_versions
+    python -m benchmarks.bench_versions --versions 500 --keyframes 0 10 50 --cache-size 64
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from app.core.database import create_database_engine
+from app.models import Base, Code, CodeBlob, CodeVersion, ParsingResult, ParsingResultVersion
+from app.services.block_refs import compact_blocks
+from app.services.parse_metrics_service import percentile
+from app.services.static_parser import analyze_code
+from app.services.version_storage import configure_version_storage, get_delta_cache, install_version_storage
+from benchmarks.corpus import example_scripts, synthetic_script
+
+# Helper groups of about 40 lines each
+UTILITIES = 20
+
+
+def edit_script(lines: List[str], rng: random.Random, version: int) -> List[str]:
+    # A few changed lines and one added, like tuning a run between two uploads
+    lines = list(lines)
+    for _ in range(3):
+        index = rng.randrange(len(lines))
+        lines[index] = lines[index].rstrip("\n") + f"  # v{version}\n"
+    lines.insert(rng.randrange(len(lines)), f"# note for version {version}\n")
+    return lines
+
+
+def edit_result(content: dict, version: int) -> dict:
+    # A user correction: the experiment name and one tracked metric
+    metrics = list(content.get("metric") or [])
+    metrics[version % max(len(metrics), 1) :] = [f"val_metric_{version}"]
+    return {**content, "name": f"bench-v{version}", "metric": metrics}
+
+
+async def timed_reads(read: Callable, count: int, cold: bool) -> List[float]:
+    latencies = []
+    for _ in range(count):
+        if cold:
+            get_delta_cache().clear()
+        started = time.perf_counter()
+        await read()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def run_profile(keyframe_interval: int, versions: int, reads: int, cache_size: int, script: str) -> str:
+    configure_version_storage(delta_storage=keyframe_interval > 0, keyframe_interval=keyframe_interval, cache_size=cache_size)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database_engine(f"sqlite+aiosqlite:///{Path(directory) / 'bench.db'}", echo=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+        install_version_storage(session_factory)
+
+        # Every version is written in its own transaction, like an upload
+        lines = script.splitlines(keepends=True)
+        # Stored the way parsing results are, with blocks as references into the code
+        analysis = analyze_code(script)[0]
+        if analysis is None:
+            raise ValueError("The benchmark script does not parse")
+        content = compact_blocks(analysis, script)
+        version_ids: List[int] = []
+        started = time.perf_counter()
+        async with session_factory() as session:
+            code = Code(name="bench")
+            session.add(code)
+            await session.flush()
+            db_result = None
+            for version in range(1, versions + 1):
+                code_version = CodeVersion(code_id=code.id, version=version, content="".join(lines))
+                session.add(code_version)
+                await session.flush()
+                if db_result is None:
+                    db_result = ParsingResult(code_version_id=code_version.id, name="bench")
+                    session.add(db_result)
+                    await session.flush()
+                session.add(ParsingResultVersion(parsing_result_id=db_result.id, version=version, content=content))
+                await session.commit()
+                version_ids.append(int(code_version.id))
+                lines = edit_script(lines, rng, version)
+                content = edit_result(content, version)
+            if db_result is None:
+                raise ValueError("At least one version is written")
+            result_id = int(db_result.id)
+        write_ms = (time.perf_counter() - started) * 1000 / versions
+
+        async with session_factory() as session:
+            code_bytes = (await session.execute(select(func.sum(CodeBlob.stored_size)))).scalar_one()
+            result_bytes = (
+                await session.execute(select(func.sum(func.length(func.json(ParsingResultVersion.content)))))
+            ).scalar_one()
+
+        async def read_version() -> None:
+            async with session_factory() as session:
+                code_version = await session.get(CodeVersion, rng.choice(version_ids))
+                assert code_version is not None and code_version.content
+
+        async def read_result() -> None:
+            async with session_factory() as session:
+                result = await session.execute(
+                    select(ParsingResult).options(selectinload(ParsingResult.versions)).filter(ParsingResult.id == result_id)
+                )
+                assert len(result.scalars().one().versions) == versions
+
+        cold = sorted(await timed_reads(read_version, reads, cold=True))
+        warm = sorted(await timed_reads(read_version, reads, cold=False))
+        result_cold = sorted(await timed_reads(read_result, max(reads // 20, 3), cold=True))
+        await engine.dispose()
+
+    name = "full" if keyframe_interval == 0 else f"delta/{keyframe_interval}"
+    return (
+        f"{name:>9} {code_bytes / 1024:>10.1f} {result_bytes / 1024:>10.1f} {write_ms:>9.2f}"
+        f" {percentile(cold, 50) * 1000:>8.2f} {percentile(cold, 95) * 1000:>8.2f}"
+        f" {percentile(warm, 50) * 1000:>8.2f} {percentile(warm, 95) * 1000:>8.2f}"
+        f" {percentile(result_cold, 50) * 1000:>10.2f}\n"
+    )
+
+
+async def main(keyframes: List[int], versions: int, reads: int, cache_size: int) -> None:
+    _, base = example_scripts()[0]
+    script = synthetic_script(base, UTILITIES)
+    print(f"{versions} versions of a {len(script.splitlines())}-line script; cache of {cache_size} contents")
+    print(
+        f"{'storage':>9} {'code KiB':>10} {'result KiB':>10} {'write ms':>9} {'cold p50':>8} {'cold p95':>8}"
+        f" {'warm p50':>8} {'warm p95':>8} {'result p50':>10}"
+    )
+    for keyframe_interval in keyframes:
+        print(await run_profile(keyframe_interval, versions, reads, cache_size, script), end="")
+    configure_version_storage()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--keyframes", type=int, nargs="+", default=[0, 5, 10, 20], help="keyframe intervals (0 stores versions in full)"
+    )
+    parser.add_argument("--versions", type=int, default=200, help="versions in the chain")
+    parser.add_argument("--reads", type=int, default=200, help="random version reads per measurement")
+    parser.add_argument("--cache-size", type=int, default=256, help="delta cache entries")
+    args = parser.parse_args()
+    asyncio.run(main(args.keyframes, args.versions, args.reads, args.cache_size))
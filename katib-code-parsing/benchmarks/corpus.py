@@ -0,0 +1,79 @@
+"""
+Benchmark corpus: the example scripts under `examples/` plus synthetic variants
+padded with the utilities, logging and plotting code real training scripts carry.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+EXAMPLES_DIR = Path(__file__).resolve().parent.parent / "examples"
+
+UTILITY_TEMPLATE = '''
+
+def plot_history_{index}(history, path="history_{index}.png"):
+    """
+    Plots the training curves of run {index} and saves them to disk.
+
+    The figure contains one subplot per tracked metric.
+    """
+    import matplotlib.pyplot as plt
+
+    # One subplot per metric
+    figure, axes = plt.subplots(len(history), 1, figsize=(8, 4 * len(history)))
+    for axis, (name, values) in zip(axes, history.items()):
+        axis.plot(values, label=name)  # raw values
+        axis.set_title(name)
+        axis.legend()
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def setup_logging_{index}(level="INFO"):
+    """Configures the root logger for run {index}."""
+    import logging
+
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    logging.getLogger("matplotlib").setLevel("WARNING")
+
+
+def save_checkpoint_{index}(state, directory="checkpoints"):
+    """Writes a checkpoint of run {index}; kept for manual experiments."""
+    import os
+    import pickle
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "state_{index}.pkl"), "wb") as handle:
+        pickle.dump(state, handle)
+'''
+
+
+def example_scripts() -> List[Tuple[str, str]]:
+    return [(path.stem, path.read_text()) for path in sorted(EXAMPLES_DIR.glob("org_code_*.py"))]
+
+
+def golden_results() -> Dict[str, str]:
+    return {
+        path.stem.replace("parsing_result_", "org_code_"): path.read_text()
+        for path in sorted(EXAMPLES_DIR.glob("parsing_result_*.json"))
+    }
+
+
+def synthetic_script(base: str, utilities: int) -> str:
+    """
+    Inserts `utilities` unused helper groups between the imports and the model code of `base`.
+    """
+    lines = base.splitlines()
+    first_definition = next(index for index, line in enumerate(lines) if line.startswith(("def ", "class ")))
+    padding = "".join(UTILITY_TEMPLATE.format(index=index) for index in range(utilities))
+    return "\n".join(lines[:first_definition]) + padding + "\n\n" + "\n".join(lines[first_definition:]) + "\n"
+
+
+def corpus(sizes: Tuple[int, ...] = (10, 50)) -> List[Tuple[str, str]]:
+    scripts = example_scripts()
+    synthetic = [
+        (f"{name}_padded_{size}", synthetic_script(content, size)) for name, content in scripts for size in sizes
+    ]
+    return scripts + synthetic
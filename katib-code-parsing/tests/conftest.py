@@ -0,0 +1,76 @@
+from typing import AsyncGenerator
+
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import metrics
+from app.core.database import create_database_engine, get_db, get_session_factory
+from app.main import app
+from app.models import Base
+from app.services.version_storage import install_version_storage
+
+# In-memory SQLite database for testing (one connection shared by all sessions)
+DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
+engine = create_async_engine(DATABASE_URL)
+TestingSessionLocal = sessionmaker(
+    engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
+)
+install_version_storage(TestingSessionLocal)
+
+
+@pytest_asyncio.fixture(scope="function")
+async def testing_session_local() -> AsyncGenerator[sessionmaker, None]:
+    metrics.reset()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    yield TestingSessionLocal
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+
+
+@pytest_asyncio.fixture(scope="function")
+async def db_session(testing_session_local: sessionmaker) -> AsyncGenerator[AsyncSession, None]:
+    async with testing_session_local() as session:
+        yield session
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(testing_session_local: sessionmaker, db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
+    # Every request uses the test's session; sessions opened besides it use the test database too
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_session_factory] = lambda: testing_session_local
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        yield ac
+    app.dependency_overrides = {}
+
+
+@pytest_asyncio.fixture(scope="function")
+async def session_factory(tmp_path) -> AsyncGenerator[sessionmaker, None]:
+    # A file database, so that every session gets its own connection and transaction
+    metrics.reset()
+    file_engine = create_database_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", echo=False)
+    async with file_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    file_session_local = sessionmaker(file_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+    install_version_storage(file_session_local)
+    yield file_session_local
+    await file_engine.dispose()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def session_client(session_factory: sessionmaker) -> AsyncGenerator[AsyncClient, None]:
+    # A session per request, like the application, so that concurrent requests do not share one
+    async def override_get_db() -> AsyncGenerator[AsyncSession, None]:
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        yield ac
+    app.dependency_overrides = {}
@@ -0,0 +1,165 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Union
+
+DEFAULT_CONTENT = {
+    "name": "fake_code",
+    "framework": "pytorch",
+    "metric": ["accuracy"],
+    "parameter": "parser.add_argument('--lr', type=float, default=0.01)",
+    "model_block": "class Net(nn.Module): pass",
+    "data_block": "main()",
+}
+
+
+class FakeLLMServer:
+    """
+    A slow, local OpenAI-compatible chat completions server for tests.
+    """
+
+    def __init__(
+        self,
+        delay: float = 1.0,
+        content: Optional[Union[Dict[str, Any], str]] = None,
+        chunk_size: int = 16,
+        chunk_delay: float = 0.0,
+        rate_limited: int = 0,
+        retry_after_ms: Optional[int] = None,
+        delays: Optional[List[float]] = None,
+        content_by_model: Optional[Dict[str, Union[Dict[str, Any], str]]] = None,
+    ) -> None:
+        self.delay = delay
+        # Per-request delays overriding `delay` for the first len(delays) requests
+        self.delays = delays or []
+        # Content answered to requests for the given models instead of `content`
+        self.content_by_model = content_by_model or {}
+        # A string is answered verbatim, so tests can send malformed output
+        self.content = content or DEFAULT_CONTENT
+        # Streaming requests (stream=True) get the content in chunks of this many characters
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        # The first `rate_limited` requests are answered with 429 (and Retry-After, if given)
+        self.rate_limited = rate_limited
+        self.retry_after_ms = retry_after_ms
+        self.requests: List[Dict[str, Any]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    @property
+    def request_count(self) -> int:
+        with self._lock:
+            return len(self.requests)
+
+    def start(self) -> "FakeLLMServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _content(self, body: Dict[str, Any]) -> str:
+        content = self.content_by_model.get(body.get("model", ""), self.content)
+        return content if isinstance(content, str) else json.dumps(content)
+
+    def _handler_class(self) -> type:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests.append(body)
+                    limited = len(fake.requests) <= fake.rate_limited
+                    index = len(fake.requests) - 1
+                    delay = fake.delays[index] if index < len(fake.delays) else fake.delay
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    if limited:
+                        self._rate_limit()
+                        return
+                    time.sleep(delay)
+                    if body.get("stream"):
+                        self._stream(body)
+                        return
+                    payload = json.dumps(
+                        {
+                            "id": "chatcmpl-fake",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": body.get("model", "fake"),
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "message": {"role": "assistant", "content": fake._content(body)},
+                                    "finish_reason": "stop",
+                                }
+                            ],
+                            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+                        }
+                    ).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+            def _rate_limit(self) -> None:
+                payload = json.dumps({"error": {"message": "Rate limit reached", "type": "requests"}}).encode("utf-8")
+                self.send_response(429)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if fake.retry_after_ms is not None:
+                    self.send_header("retry-after-ms", str(fake.retry_after_ms))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body: Dict[str, Any]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                text = fake._content(body)
+                for start in range(0, len(text), fake.chunk_size):
+                    chunk = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [
+                            {"index": 0, "delta": {"content": text[start : start + fake.chunk_size]}, "finish_reason": None}
+                        ],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(fake.chunk_delay)
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    usage = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [],
+                        "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+                    }
+                    self.wfile.write(f"data: {json.dumps(usage)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
@@ -0,0 +1,70 @@
+import os
+from pathlib import Path
+from typing import Generator
+
+import pytest
+
+from app.core import executor, metrics
+from app.core.executor import ANALYSIS_INLINE, ANALYSIS_OFFLOADED, configure_analysis_executor, run_analysis
+from app.services.block_refs import compact_blocks
+from app.services.incremental_parser import parse_incrementally
+from app.services.parse_cache_service import compute_code_hash
+from app.services.static_parser import analyze_code
+
+EXAMPLES_DIR = Path(__file__).resolve().parent.parent / "examples"
+IRIS_CODE = (EXAMPLES_DIR / "org_code_iris.py").read_text()
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+@pytest.fixture(scope="function")
+def analysis_pool() -> Generator[None, None, None]:
+    metrics.reset()
+    # Offload everything, whatever its size
+    configure_analysis_executor(workers=1, min_chars=0)
+    yield
+    configure_analysis_executor()
+
+
+@pytest.mark.asyncio
+async def test_analysis_runs_in_a_worker_process(analysis_pool: None) -> None:
+    assert await run_analysis(_worker_pid, size=0) != os.getpid()
+    assert await run_analysis(compute_code_hash, IRIS_CODE, size=len(IRIS_CODE)) == compute_code_hash(IRIS_CODE)
+    assert await run_analysis(analyze_code, IRIS_CODE, size=len(IRIS_CODE)) == analyze_code(IRIS_CODE)
+    assert metrics.get_counter(ANALYSIS_OFFLOADED) == 3
+
+
+@pytest.mark.asyncio
+async def test_incremental_parse_gives_the_same_result_offloaded(analysis_pool: None) -> None:
+    previous, _ = analyze_code(IRIS_CODE)
+    changed = IRIS_CODE.replace("        default=5,", "        default=10,", 1)
+
+    offloaded = await parse_incrementally(IRIS_CODE, previous, changed)
+    configure_analysis_executor(workers=0)
+    inline = await parse_incrementally(IRIS_CODE, previous, changed)
+
+    assert offloaded is not None and offloaded == inline
+    assert "default=10," in offloaded["parameter"]
+    assert metrics.get_counter(ANALYSIS_OFFLOADED) == 1
+    assert metrics.get_counter(ANALYSIS_INLINE) == 1
+
+
+@pytest.mark.asyncio
+async def test_blocks_are_compacted_in_a_worker_process(analysis_pool: None) -> None:
+    parsed, _ = analyze_code(IRIS_CODE)
+
+    compacted = await run_analysis(compact_blocks, parsed, IRIS_CODE, size=len(IRIS_CODE))
+
+    assert compacted == compact_blocks(parsed, IRIS_CODE)
+    assert metrics.get_counter(ANALYSIS_OFFLOADED) == 1
+
+
+@pytest.mark.asyncio
+async def test_small_inputs_are_analyzed_inline(analysis_pool: None) -> None:
+    configure_analysis_executor(workers=1, min_chars=len(IRIS_CODE) + 1)
+
+    assert await run_analysis(_worker_pid, size=len(IRIS_CODE)) == os.getpid()
+    assert executor._executor is None
+    assert metrics.get_counter(ANALYSIS_INLINE) == 1
@@ -1,42 +1,9 @@
 import pytest
-import pytest_asyncio
 from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
 from unittest.mock import AsyncMock
 from pytest import MonkeyPatch
 
-from app.main import app
-from app.models import Base, CodeVersion
-
-# In-memory SQLite database for testing
-DATABASE_URL = "sqlite+aiosqlite:///:memory:"
-
-engine = create_async_engine(DATABASE_URL, echo=True)
-TestingSessionLocal = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
-)
-
-
-@pytest_asyncio.fixture(scope="function")
-async def db_session() -> AsyncSession:
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-    async with TestingSessionLocal() as session:
-        yield session
-
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-
-
-@pytest_asyncio.fixture(scope="function")
-async def client(db_session: AsyncSession) -> AsyncClient:
-    from app.core.database import get_db
-    app.dependency_overrides[get_db] = lambda: db_session
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        yield ac
-    app.dependency_overrides = {}
+from app.services.model_router import TIER_LARGE
 
 
 @pytest.mark.asyncio
@@ -164,7 +131,7 @@ async def test_parse_code_version(client: AsyncClient, monkeypatch: MonkeyPatch)
     assert response.json()["versions"][0]["content"] == MOCK_LLM_RESPONSE
 
     # Verify LLM mock was called
-    mock_parse.assert_called_once_with("print('code content for parsing')")
+    mock_parse.assert_called_once_with("print('code content for parsing')", model_tier=TIER_LARGE)
 
     # Test for non-existent code version
     response = await client.post("/parsing/code-versions/999", json=parsing_data)
@@ -0,0 +1,82 @@
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+from httpx import AsyncClient
+from pytest import MonkeyPatch
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import ParsingResultVersion
+from app.services.block_refs import compact_blocks, decode_block, encode_block, inline_blocks
+from app.services.static_parser import analyze_code
+
+with open("examples/org_code_iris.py") as f:
+    IRIS_CODE = f.read()
+
+
+def test_blocks_round_trip_through_references() -> None:
+    code = "import torch\n\n\nclass Net:\n    pass\n\n\ndef main():\n    train()\n    train()\n"
+    # Non-adjacent parts joined by a single blank line, plus a line that is not in the code
+    text = "class Net:\n    pass\n\ndef main():\n    train()\n# reworded by the LLM"
+    segments = encode_block(text, code)
+    assert segments is not None
+    assert segments[0] == [4, 0, 6, 0]
+    assert segments[-1] == "\n# reworded by the LLM"
+    assert decode_block(segments, code) == text
+    # Text that cannot be found is not worth a reference
+    assert encode_block("completely different", code) is None
+
+
+def test_block_may_start_dedented_and_end_mid_line() -> None:
+    code = "def main():\n    model = build(\n        layers=3,\n    )  # the model\n    train(model)\n"
+    # As ast.get_source_segment returns a nested statement
+    text = "model = build(\n        layers=3,\n    )"
+    segments = encode_block(text, code)
+    assert segments == [[2, 4, 4, 5]]
+    assert decode_block(segments, code) == text
+
+
+def test_compacted_result_is_smaller_and_inlines_back() -> None:
+    result, _ = analyze_code(IRIS_CODE)
+    compacted = compact_blocks(result, IRIS_CODE)
+    assert "segments" in compacted["model_block"]
+    assert "segments" in compacted["data_block"]
+    assert len(json.dumps(compacted)) < len(json.dumps(result)) / 3
+    assert inline_blocks(compacted, IRIS_CODE) == result
+
+
+@pytest.mark.asyncio
+async def test_parse_stores_references_and_inlines_on_request(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch: MonkeyPatch
+) -> None:
+    expected, _ = analyze_code(IRIS_CODE)
+    monkeypatch.setattr("app.services.parsing_service.parse_code_with_fast_path", lambda code, min_confidence=None: None)
+    monkeypatch.setattr("app.services.parsing_service.parse_code_with_llm", AsyncMock(return_value=dict(expected)))
+    response = await client.post("/codes/", json={"name": "iris", "content": IRIS_CODE})
+    code_id = response.json()["id"]
+    code_version_id = response.json()["versions"][0]["id"]
+
+    response = await client.post(f"/parsing/code-versions/{code_version_id}", json={"name": "iris"})
+    assert response.status_code == 201
+    assert response.json()["versions"][0]["content"] == expected
+    result_id = response.json()["id"]
+
+    stored = (await db_session.execute(select(ParsingResultVersion))).scalars().one()
+    await db_session.refresh(stored)
+    assert "segments" in stored.content["model_block"]
+
+    compact = (await client.get(f"/parsing/results/{result_id}", params={"inline": "false"})).json()
+    assert compact["versions"][0]["content"]["model_block"] == stored.content["model_block"]
+    inlined = (await client.get(f"/parsing/results/{result_id}")).json()
+    assert inlined["versions"][0]["content"] == expected
+    code = (await client.get(f"/codes/{code_id}")).json()
+    assert code["versions"][0]["parsing_results"][0]["versions"][0]["content"] == expected
+
+    # Manual edits are stored the same way
+    edited = dict(expected, framework="scikit-learn")
+    response = await client.post(f"/parsing/results/{result_id}/versions", json={"content": edited})
+    assert response.status_code == 201
+    assert response.json()["content"] == edited
+    response = await client.get(f"/parsing/results/{result_id}", params={"inline": "false"})
+    assert "segments" in response.json()["versions"][1]["content"]["data_block"]
@@ -0,0 +1,98 @@
+from pathlib import Path
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Code, CodeBlob, CodeVersion
+from app.models.code_blob import compress_content, decompress_content, hash_content
+
+EXAMPLES_DIR = Path(__file__).resolve().parent.parent / "examples"
+IRIS_CODE = (EXAMPLES_DIR / "org_code_iris.py").read_text()
+
+
+async def _count_blobs(session_factory: sessionmaker) -> int:
+    async with session_factory() as session:
+        return (await session.execute(select(func.count(CodeBlob.sha256)))).scalar_one()
+
+
+def test_contents_are_compressed_when_smaller() -> None:
+    data, compression = compress_content(IRIS_CODE)
+    assert compression == "zlib" and len(data) < len(IRIS_CODE.encode("utf-8"))
+    assert decompress_content(data, compression) == IRIS_CODE
+
+    data, compression = compress_content("x = 1")
+    assert (data, compression) == (b"x = 1", "none")
+    assert decompress_content(data, compression) == "x = 1"
+    assert hash_content("x = 1") == hash_content("x = 1") != hash_content("x = 2")
+
+
+@pytest.mark.asyncio
+async def test_identical_uploads_share_one_blob(session_client: AsyncClient, session_factory: sessionmaker) -> None:
+    # The same template under several names, and a re-upload of an unchanged file
+    code_ids = []
+    for index in range(3):
+        response = await session_client.post("/codes/", json={"name": f"template-{index}", "content": IRIS_CODE})
+        assert response.status_code == 201
+        code_ids.append(response.json()["id"])
+    response = await session_client.post(f"/codes/{code_ids[0]}/versions/", json={"content": IRIS_CODE})
+    assert response.status_code == 201
+    assert response.json()["content"] == IRIS_CODE
+    await session_client.post(f"/codes/{code_ids[0]}/versions/", json={"content": "print('other')"})
+
+    assert await _count_blobs(session_factory) == 2
+    for code_id in code_ids:
+        response = await session_client.get(f"/codes/{code_id}")
+        assert response.json()["versions"][0]["content"] == IRIS_CODE
+
+    stats = (await session_client.get("/codes/storage/stats")).json()
+    assert (stats["versions"], stats["blobs"]) == (5, 2)
+    iris_size = len(IRIS_CODE.encode("utf-8"))
+    assert stats["logical_bytes"] == 4 * iris_size + len("print('other')")
+    assert stats["unique_bytes"] == iris_size + len("print('other')")
+    assert stats["dedup_ratio"] > 3.5
+    assert stats["compression_ratio"] > 1
+    assert stats["saved_bytes"] == stats["logical_bytes"] - stats["stored_bytes"]
+
+
+@pytest.mark.asyncio
+async def test_blobs_are_deleted_with_their_last_version(
+    session_client: AsyncClient, session_factory: sessionmaker
+) -> None:
+    first = (await session_client.post("/codes/", json={"name": "first", "content": IRIS_CODE})).json()
+    second = (await session_client.post("/codes/", json={"name": "second", "content": IRIS_CODE})).json()
+    version = (await session_client.post(f"/codes/{second['id']}/versions/", json={"content": "print('other')"})).json()
+    assert await _count_blobs(session_factory) == 2
+
+    # Still used by the second code
+    assert (await session_client.delete(f"/codes/{first['id']}")).status_code == 204
+    assert await _count_blobs(session_factory) == 2
+    assert (await session_client.delete(f"/codes/{second['id']}/versions/{version['id']}")).status_code == 204
+    assert await _count_blobs(session_factory) == 1
+    assert (await session_client.delete(f"/codes/{second['id']}")).status_code == 204
+    assert await _count_blobs(session_factory) == 0
+
+
+@pytest.mark.asyncio
+async def test_duplicate_contents_in_one_flush(session_factory: sessionmaker) -> None:
+    async with session_factory() as session:
+        code = Code(name="code")
+        session.add(code)
+        await session.flush()
+        session.add_all([CodeVersion(code_id=code.id, version=version, content=IRIS_CODE) for version in (1, 2)])
+        await session.commit()
+        # Loaded in this session and stored
+        session.add(CodeVersion(code_id=code.id, version=3, content=IRIS_CODE))
+        await session.commit()
+
+    async with session_factory() as session:
+        session.add(CodeVersion(code_id=code.id, version=4, content=IRIS_CODE))
+        await session.commit()
+
+    assert await _count_blobs(session_factory) == 1
+    async with session_factory() as session:
+        versions = (await session.execute(select(CodeVersion).order_by(CodeVersion.version))).scalars().all()
+        assert [version.content for version in versions] == [IRIS_CODE] * 4
+        assert len({version.content_hash for version in versions}) == 1
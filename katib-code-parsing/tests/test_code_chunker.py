@@ -0,0 +1,116 @@
+import ast
+from typing import Optional
+from unittest.mock import AsyncMock
+
+import pytest
+from pytest import MonkeyPatch
+
+from app.core import metrics
+from app.services import llm_service
+from app.services.code_chunker import pack_chunks, reduce_chunk_results, top_level_units
+from app.services.llm_service import estimate_tokens
+
+HEADER = "import torch\nimport torch.nn as nn\n\n\n"
+MODEL = "class Net(nn.Module):\n    def forward(self, x):\n        return x\n\n\n"
+MAIN = (
+    "def main():\n"
+    "    parser.add_argument('--lr', type=float, default=0.01)\n"
+    "    model = Net()\n"
+    "    print('accuracy={}'.format(1.0))\n\n\n"
+    "if __name__ == '__main__':\n"
+    "    main()\n"
+)
+
+
+def _large_script(steps: int) -> str:
+    # A notebook-like export: many top-level preprocessing cells between the model and main
+    cells = "".join(
+        f"# Cell {index}\nframe = frame.dropna()\nframe = frame.assign(step_{index}=frame['value'] * {index})\n\n\n"
+        for index in range(steps)
+    )
+    return HEADER + MODEL + cells + MAIN
+
+
+def test_chunks_split_on_top_level_boundaries() -> None:
+    code = _large_script(40)
+    units = top_level_units(code)
+    chunks = pack_chunks(units, 150, estimate_tokens)
+
+    assert len(chunks) > 1
+    assert "\n".join(chunks).split("\n") == code.rstrip("\n").split("\n")
+    for chunk in chunks:
+        # Every chunk is made of whole statements, so it parses on its own
+        ast.parse(chunk)
+        assert estimate_tokens(chunk) <= 150
+
+
+def test_reduce_chunk_results_is_deterministic() -> None:
+    results = [
+        {"name": "unnamed_code", "framework": "unknown", "metric": [], "model_block": "class Net: pass", "parameter": "", "data_block": ""},
+        {"name": "train", "framework": "pytorch", "metric": ["accuracy"], "model_block": "", "parameter": "--lr", "data_block": "x = 1"},
+        {"name": "other", "framework": "tensorflow", "metrics": ["loss", "accuracy"], "model_block": "", "parameter": "", "data_block": "main()"},
+        {"name": "last", "framework": "pytorch", "metric": "f1", "model_block": "", "parameter": "", "data_block": ""},
+    ]
+
+    merged = reduce_chunk_results(results)
+
+    assert merged == {
+        "name": "train",
+        "framework": "pytorch",
+        "metric": ["accuracy", "loss", "f1"],
+        "parameter": "--lr",
+        "model_block": "class Net: pass",
+        "data_block": "x = 1\n\nmain()",
+    }
+    assert reduce_chunk_results(results) == merged
+
+
+@pytest.mark.asyncio
+async def test_large_script_is_parsed_in_chunks(monkeypatch: MonkeyPatch) -> None:
+    metrics.reset()
+    code = _large_script(40)
+
+    async def parse_chunk(prompt: str, hedge_after: Optional[float] = None) -> dict:
+        chunk = prompt.split("```python\n", 1)[1].split("\n```", 1)[0]
+        return {
+            "framework": "pytorch" if "torch" in chunk else "unknown",
+            "metric": ["accuracy"] if "accuracy" in chunk else [],
+            "model_block": chunk.split("\n\n")[0] if "class Net" in chunk else "",
+            "parameter": "parser.add_argument('--lr', type=float, default=0.01)" if "--lr" in chunk else "",
+            "data_block": chunk[chunk.index("def main") :] if "def main" in chunk else "",
+        }
+
+    mock_request = AsyncMock(side_effect=parse_chunk)
+    monkeypatch.setattr("app.services.llm_service._request_json_completion", mock_request)
+    monkeypatch.setattr("app.services.llm_service.LLM_MAX_PROMPT_TOKENS", 600)
+    monkeypatch.setattr("app.services.llm_service.LLM_CHUNK_TOKENS", 300)
+
+    result = await llm_service.parse_code_with_llm(code)
+
+    assert mock_request.call_count > 1
+    assert all("part" in call.args[0] for call in mock_request.call_args_list)
+    assert metrics.get_counter("llm.chunked_parses") == 1
+    assert result["framework"] == "pytorch"
+    assert result["metric"] == ["accuracy"]
+    assert "class Net(nn.Module)" in result["model_block"]
+    assert result["data_block"].rstrip().endswith("main()")
+    assert result["block_spans"]["data_block"][-1][1] == len(code.rstrip("\n").split("\n"))
+
+
+@pytest.mark.asyncio
+async def test_small_script_is_parsed_in_one_prompt(monkeypatch: MonkeyPatch) -> None:
+    mock_request = AsyncMock(
+        return_value={
+            "name": "small",
+            "framework": "pytorch",
+            "metric": [],
+            "parameter": "",
+            "model_block": MODEL,
+            "data_block": MAIN,
+        }
+    )
+    monkeypatch.setattr("app.services.llm_service._request_json_completion", mock_request)
+
+    await llm_service.parse_code_with_llm(HEADER + MODEL + MAIN)
+
+    mock_request.assert_called_once()
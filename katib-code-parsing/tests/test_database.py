@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import create_database_engine
+from app.models import Base, Code, CodeVersion
+from app.services.version_storage import install_version_storage
+
+
+@pytest.mark.asyncio
+async def test_sqlite_connections_get_the_configured_pragmas(tmp_path) -> None:
+    engine = create_database_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", echo=False)
+    async with engine.connect() as conn:
+        pragmas = {
+            name: (await conn.execute(text(f"PRAGMA {name}"))).scalar()
+            for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size")
+        }
+    await engine.dispose()
+
+    # synchronous=NORMAL is 1
+    assert pragmas == {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000, "cache_size": -65536}
+    assert engine.pool.size() == 5  # type: ignore[attr-defined]
+
+
+@pytest.mark.asyncio
+async def test_in_memory_database_keeps_a_single_connection() -> None:
+    engine = create_database_engine("sqlite+aiosqlite:///:memory:", echo=False)
+    assert isinstance(engine.pool, StaticPool)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writers_do_not_hit_locked_errors(tmp_path) -> None:
+    engine = create_database_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", echo=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+    install_version_storage(session_factory)
+
+    async def upload(index: int) -> None:
+        async with session_factory() as session:
+            code = Code(name=f"code-{index}")
+            session.add(code)
+            await session.flush()
+            session.add(CodeVersion(code_id=code.id, version=1, content=f"print({index})"))
+            await session.commit()
+
+    await asyncio.gather(*(upload(index) for index in range(30)))
+
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("SELECT COUNT(*) FROM code_versions"))).scalar() == 30
+    await engine.dispose()
@@ -0,0 +1,120 @@
+import pytest
+from pathlib import Path
+from unittest.mock import AsyncMock
+from typing import List
+from pytest import MonkeyPatch
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Code, CodeVersion, ParsingResult, ParsingResultVersion
+from app.schemas.parsing_result import ParsingResultCreate
+from app.services import parsing_service
+from app.services.incremental_parser import parse_incrementally
+from app.services.static_parser import analyze_code
+
+EXAMPLES_DIR = Path(__file__).resolve().parent.parent / "examples"
+IRIS_CODE = (EXAMPLES_DIR / "org_code_iris.py").read_text()
+
+
+async def _create_code_versions(db_session: AsyncSession, contents: List[str]) -> List[int]:
+    code = Code(name="incremental_code")
+    db_session.add(code)
+    await db_session.commit()
+    ids = []
+    for version, content in enumerate(contents, start=1):
+        code_version = CodeVersion(code_id=code.id, version=version, content=content)
+        db_session.add(code_version)
+        await db_session.commit()
+        ids.append(code_version.id)
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_hyperparameter_change_reuses_unchanged_blocks(
+    db_session: AsyncSession, testing_session_local: sessionmaker, monkeypatch: MonkeyPatch
+) -> None:
+    mock_parse = AsyncMock()
+    mock_blocks = AsyncMock()
+    monkeypatch.setattr("app.services.parsing_service.parse_code_with_llm", mock_parse)
+    monkeypatch.setattr("app.services.incremental_parser.parse_blocks_with_llm", mock_blocks)
+
+    new_code = IRIS_CODE.replace("        default=5,", "        default=10,", 1)
+    first_id, second_id = await _create_code_versions(db_session, [IRIS_CODE, new_code])
+
+    first = await parsing_service.create_parsing_result(
+        db=db_session, code_version_id=first_id, result_create=ParsingResultCreate(name="v1"),
+        session_factory=testing_session_local,
+    )
+    second = await parsing_service.create_parsing_result(
+        db=db_session, code_version_id=second_id, result_create=ParsingResultCreate(name="v2", incremental=True),
+        session_factory=testing_session_local,
+    )
+
+    mock_parse.assert_not_called()
+    mock_blocks.assert_not_called()
+    previous = first.versions[0].content
+    content = second.versions[0].content
+    assert content["incremental"] == {
+        "base_parsing_result_version_id": first.versions[0].id,
+        "reused_blocks": ["model_block"],
+        "rederived_blocks": ["parameter", "data_block"],
+    }
+    assert content["model_block"] == previous["model_block"]
+    assert "default=10," in content["parameter"]
+    assert "default=10," in content["data_block"]
+    assert content["framework"] == previous["framework"]
+    assert content["metric"] == previous["metric"]
+    assert parsing_service.get_parse_source_stats()["incremental"] == 1
+
+
+@pytest.mark.asyncio
+async def test_incremental_without_previous_parse_falls_back(
+    db_session: AsyncSession, testing_session_local: sessionmaker, monkeypatch: MonkeyPatch
+) -> None:
+    _, second_id = await _create_code_versions(db_session, [IRIS_CODE, IRIS_CODE + "\nprint('done')\n"])
+
+    second = await parsing_service.create_parsing_result(
+        db=db_session, code_version_id=second_id, result_create=ParsingResultCreate(name="v2", incremental=True),
+        session_factory=testing_session_local,
+    )
+
+    assert "incremental" not in second.versions[0].content
+    assert parsing_service.get_parse_source_stats()["fast_path"] == 1
+
+
+@pytest.mark.asyncio
+async def test_degraded_previous_parse_is_not_reused(db_session: AsyncSession) -> None:
+    first_id, second_id = await _create_code_versions(db_session, [IRIS_CODE, IRIS_CODE + "\nprint('done')\n"])
+    degraded, _ = analyze_code(IRIS_CODE)
+    db_result = ParsingResult(code_version_id=first_id, name="v1", latest_version=1)
+    db_session.add(db_result)
+    await db_session.flush()
+    db_session.add(ParsingResultVersion(parsing_result_id=db_result.id, version=1, content={**degraded, "degraded": True}))
+    await db_session.commit()
+
+    assert await parsing_service.get_previous_parse(db_session, await db_session.get(CodeVersion, second_id)) is None
+
+
+@pytest.mark.asyncio
+async def test_unparsable_change_uses_reduced_llm_prompt(monkeypatch: MonkeyPatch) -> None:
+    previous, _ = analyze_code(IRIS_CODE)
+    broken = IRIS_CODE.replace("        default=5,", "        default=10,,", 1)
+    mock_blocks = AsyncMock(return_value={"parameter": "parser.add_argument(\n'--batch-size',\ntype=int,\ndefault=10,,"})
+    monkeypatch.setattr("app.services.incremental_parser.parse_blocks_with_llm", mock_blocks)
+
+    result = await parse_incrementally(IRIS_CODE, previous, broken)
+
+    excerpt, keys = mock_blocks.call_args.args
+    assert keys == ["parameter"]
+    assert "default=10,," in excerpt
+    assert "class MetricsPrint" not in excerpt and "def main" not in excerpt
+    assert result["incremental"]["reused_blocks"] == ["model_block"]
+    assert result["model_block"] == previous["model_block"]
+    assert "default=10,," in result["parameter"]
+
+
+@pytest.mark.asyncio
+async def test_large_rewrite_needs_full_parse() -> None:
+    previous, _ = analyze_code(IRIS_CODE)
+    assert await parse_incrementally(IRIS_CODE, previous, "import torch\nprint('rewritten')\n") is None
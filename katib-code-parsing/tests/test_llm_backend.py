@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+from typing import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+
+from app.common.constants import LLM_MODEL
+from app.common.exceptions import LLMUnavailableError
+from app.services import llm_service
+from app.services.llm_backend import BACKEND_LIVE, BACKEND_RECORD, BACKEND_REPLAY, prompt_hash
+from tests.fake_llm import DEFAULT_CONTENT, FakeLLMServer
+
+CODE = "print('recorded')"
+
+
+@pytest_asyncio.fixture(scope="function")
+async def cassette(tmp_path: Path) -> AsyncGenerator[Path, None]:
+    yield tmp_path / "cassette.json"
+    llm_service.configure_llm_backend(BACKEND_LIVE)
+    await llm_service.configure_llm_client(base_url=None)
+
+
+async def _stream_result(code: str) -> dict:
+    async for key, value in llm_service.stream_parse_code_with_llm(code):
+        if key == "result":
+            return value
+    raise AssertionError("the stream ended without a result")
+
+
+@pytest.mark.asyncio
+async def test_recorded_answers_replay_without_network(cassette: Path) -> None:
+    server = FakeLLMServer(delay=0).start()
+    try:
+        await llm_service.configure_llm_client(base_url=server.base_url)
+        llm_service.configure_llm_backend(BACKEND_RECORD, str(cassette))
+        recorded = await llm_service.parse_code_with_llm(CODE, hedge_after=0)
+        recorded_stream = await _stream_result(CODE)
+    finally:
+        server.stop()
+
+    assert server.request_count == 2
+    # Answers are buffered and written when the backend is closed
+    assert not cassette.exists()
+    llm_service.get_llm_backend().close()
+    entries = json.loads(cassette.read_text())
+    prompt = server.requests[0]["messages"][1]["content"]
+    key = prompt_hash(LLM_MODEL, llm_service._get_llm_messages(prompt))
+    assert sorted(entries[key]) == ["chunks", "completion"]
+
+    # The server is gone; replay answers from the cassette alone
+    llm_service.configure_llm_backend(BACKEND_REPLAY, str(cassette))
+    assert await llm_service.parse_code_with_llm(CODE, hedge_after=0) == recorded == DEFAULT_CONTENT
+    assert await _stream_result(CODE) == recorded_stream == DEFAULT_CONTENT
+
+
+@pytest.mark.asyncio
+async def test_replay_of_an_unrecorded_prompt_fails(cassette: Path) -> None:
+    cassette.write_text("{}")
+    llm_service.configure_llm_backend(BACKEND_REPLAY, str(cassette))
+    with pytest.raises(LLMUnavailableError, match="No recorded LLM completion"):
+        await llm_service.parse_code_with_llm(CODE, hedge_after=0)
+
+
+def test_configure_llm_backend_rejects_bad_settings() -> None:
+    with pytest.raises(ValueError, match="Unknown LLM backend"):
+        llm_service.configure_llm_backend("mock")
+    with pytest.raises(ValueError, match="needs a cassette"):
+        llm_service.configure_llm_backend(BACKEND_REPLAY)
+    llm_service.configure_llm_backend(BACKEND_LIVE)
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+from pytest import MonkeyPatch
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core import metrics
+from app.models import Code, CodeVersion, ParseCacheEntry
+from app.services import llm_service
+from tests.fake_llm import DEFAULT_CONTENT, FakeLLMServer
+
+SCRIPT = "import torch\n\n\ndef main():\n    print('train')\n\n\nif __name__ == '__main__':\n    main()\n"
+
+
+def test_hedge_delay_follows_recent_latencies(monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(llm_service, "_latencies", [])
+    assert llm_service.get_hedge_delay() == llm_service.LLM_HEDGE_AFTER
+
+    monkeypatch.setattr(llm_service, "_latencies", [float(value) for value in range(1, 101)])
+    monkeypatch.setattr(llm_service, "LLM_HEDGE_PERCENTILE", 90)
+    assert llm_service.get_hedge_delay() == 90.0
+
+    monkeypatch.setattr(llm_service, "LLM_HEDGE_PERCENTILE", 0)
+    assert llm_service.get_hedge_delay() == 0.0
+
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged_and_the_fast_answer_wins() -> None:
+    metrics.reset()
+    server = FakeLLMServer(delay=0.0, delays=[3.0]).start()
+    try:
+        await llm_service.configure_llm_client(base_url=server.base_url)
+        started = time.perf_counter()
+        result = await llm_service.parse_code_with_llm("print('hedge me')", hedge_after=0.2)
+        elapsed = time.perf_counter() - started
+    finally:
+        await llm_service.configure_llm_client(base_url=None)
+        server.stop()
+
+    assert result == DEFAULT_CONTENT
+    assert elapsed < 2.0
+    assert server.request_count == 2
+    assert metrics.get_counter(llm_service.HEDGED_REQUESTS) == 1
+    assert metrics.get_counter(llm_service.HEDGE_WINS) == 1
+
+
+@pytest.mark.asyncio
+async def test_fast_request_is_not_hedged() -> None:
+    metrics.reset()
+    server = FakeLLMServer(delay=0.0).start()
+    try:
+        await llm_service.configure_llm_client(base_url=server.base_url)
+        result = await llm_service.parse_code_with_llm("print('fast')", hedge_after=1.0)
+    finally:
+        await llm_service.configure_llm_client(base_url=None)
+        server.stop()
+
+    assert result == DEFAULT_CONTENT
+    assert server.request_count == 1
+    assert metrics.get_counter(llm_service.HEDGED_REQUESTS) == 0
+
+
+@pytest.mark.asyncio
+async def test_missed_deadline_returns_degraded_static_result(client: AsyncClient, db_session: AsyncSession) -> None:
+    code = Code(name="slow_code")
+    db_session.add(code)
+    await db_session.commit()
+    code_version = CodeVersion(code_id=code.id, version=1, content=SCRIPT)
+    db_session.add(code_version)
+    await db_session.commit()
+
+    server = FakeLLMServer(delay=3.0).start()
+    try:
+        await llm_service.configure_llm_client(base_url=server.base_url)
+        started = time.perf_counter()
+        response = await client.post(
+            f"/parsing/code-versions/{code_version.id}",
+            json={"name": "deadline", "hedge_after_ms": 0, "deadline_ms": 300},
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        await llm_service.configure_llm_client(base_url=None)
+        server.stop()
+
+    assert response.status_code == 201
+    assert elapsed < 2.0
+    content = response.json()["versions"][0]["content"]
+    assert content["degraded"] is True
+    assert content["framework"] == "pytorch"
+    assert "def main" in content["data_block"]
+    # Degraded results are not cached, so the next parse asks the LLM again
+    entries = await db_session.execute(select(ParseCacheEntry))
+    assert entries.scalars().all() == []
+    stats = (await client.get("/parsing/stats")).json()
+    assert (stats["degraded"], stats["llm"]) == (1, 0)
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from typing import List
+
+import pytest
+from httpx import AsyncClient
+from pytest import MonkeyPatch
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.parse_context import PRIORITY_BATCH, PRIORITY_INTERACTIVE, parse_context
+from app.models import Code, CodeVersion
+from app.services import llm_scheduler, llm_service
+from app.services.llm_scheduler import LLMScheduler, TokenBucket
+from tests.fake_llm import DEFAULT_CONTENT, FakeLLMServer
+
+
+async def _use_fake_llm(monkeypatch: MonkeyPatch, server: FakeLLMServer, max_retries: int) -> None:
+    await llm_service.configure_llm_client(base_url=server.base_url)
+    monkeypatch.setattr(llm_scheduler, "_scheduler", LLMScheduler(max_retries=max_retries, base_delay=0.01))
+
+
+def test_token_bucket_refills_over_time() -> None:
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+    assert bucket.wait_time(60, now) == 0
+    bucket.consume(60, now)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 0.5) == pytest.approx(0.5)
+    # Requests larger than the bucket only wait for a full bucket
+    assert bucket.wait_time(1000, now + 60) == 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_run_ahead_of_batch() -> None:
+    scheduler = LLMScheduler(requests_per_minute=600)
+    scheduler._queue("model").requests.tokens = 0
+    order: List[str] = []
+
+    async def submit(name: str, priority: int) -> None:
+        await scheduler.acquire("model", tokens=1, priority=priority)
+        order.append(name)
+
+    tasks = [asyncio.create_task(submit(f"batch-{index}", PRIORITY_BATCH)) for index in range(3)]
+    await asyncio.sleep(0.01)
+    assert scheduler.stats()["queue_depth_by_priority"]["batch"] == 3
+    tasks.append(asyncio.create_task(submit("interactive", PRIORITY_INTERACTIVE)))
+    await asyncio.gather(*tasks)
+
+    assert order == ["interactive", "batch-0", "batch-1", "batch-2"]
+    stats = scheduler.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["waits"] == 4
+    assert stats["wait_max_ms"] >= 300
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_requests_honour_retry_after(monkeypatch: MonkeyPatch) -> None:
+    server = FakeLLMServer(delay=0.0, rate_limited=2, retry_after_ms=200).start()
+    try:
+        await _use_fake_llm(monkeypatch, server, max_retries=3)
+        started = time.perf_counter()
+        with parse_context() as context:
+            result = await llm_service.parse_code_with_llm("print('hello')")
+        elapsed = time.perf_counter() - started
+    finally:
+        await llm_service.configure_llm_client(base_url=None)
+        server.stop()
+
+    assert result == DEFAULT_CONTENT
+    assert server.request_count == 3
+    assert context.retries == 2
+    assert elapsed >= 0.4
+    assert context.queue_wait >= 0.4
+
+
+@pytest.mark.asyncio
+async def test_exhausted_retries_return_503(
+    client: AsyncClient, db_session: AsyncSession, monkeypatch: MonkeyPatch
+) -> None:
+    code = Code(name="limited_code")
+    db_session.add(code)
+    await db_session.commit()
+    code_version = CodeVersion(code_id=code.id, version=1, content="print('hello')")
+    db_session.add(code_version)
+    await db_session.commit()
+
+    server = FakeLLMServer(delay=0.0, rate_limited=100, retry_after_ms=1500).start()
+    try:
+        await _use_fake_llm(monkeypatch, server, max_retries=0)
+        response = await client.post(f"/parsing/code-versions/{code_version.id}", json={"name": "limited"})
+    finally:
+        await llm_service.configure_llm_client(base_url=None)
+        server.stop()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert "rate limit" in response.json()["detail"]
+
+    response = await client.get("/parsing/llm/scheduler")
+    assert response.status_code == 200
+    assert response.json()["rate_limited"] == 1
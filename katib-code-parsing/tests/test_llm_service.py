@@ -0,0 +1,77 @@
+import asyncio
+import time
+from typing import AsyncGenerator, Generator
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from app.services import llm_service
+from tests.fake_llm import DEFAULT_CONTENT, FakeLLMServer
+
+
+@pytest.fixture(scope="function")
+def fake_llm() -> Generator[FakeLLMServer, None, None]:
+    server = FakeLLMServer(delay=1.0).start()
+    yield server
+    server.stop()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(session_client: AsyncClient, fake_llm: FakeLLMServer) -> AsyncGenerator[AsyncClient, None]:
+    await llm_service.configure_llm_client(base_url=fake_llm.base_url)
+    yield session_client
+    await llm_service.configure_llm_client(base_url=None)
+
+
+async def _create_code_version(client: AsyncClient, content: str) -> int:
+    response = await client.post("/codes/", json={"name": "slow_code", "content": content})
+    return response.json()["versions"][0]["id"]
+
+
+@pytest.mark.asyncio
+async def test_parse_code_with_llm_uses_async_client(fake_llm: FakeLLMServer) -> None:
+    await llm_service.configure_llm_client(base_url=fake_llm.base_url)
+    try:
+        result = await llm_service.parse_code_with_llm("print('hello')")
+    finally:
+        await llm_service.configure_llm_client(base_url=None)
+
+    assert result == DEFAULT_CONTENT
+    assert fake_llm.request_count == 1
+
+
+@pytest.mark.asyncio
+async def test_root_stays_responsive_while_parses_in_flight(client: AsyncClient, fake_llm: FakeLLMServer) -> None:
+    code_version_ids = [await _create_code_version(client, f"print('script {i}')") for i in range(4)]
+
+    tasks = [
+        asyncio.create_task(client.post(f"/parsing/code-versions/{code_version_id}", json={"name": "slow"}))
+        for code_version_id in code_version_ids
+    ]
+    await asyncio.sleep(0.3)
+
+    started = time.perf_counter()
+    response = await client.get("/")
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    assert elapsed < 0.25
+    assert not any(task.done() for task in tasks)
+
+    responses = await asyncio.gather(*tasks)
+    assert all(response.status_code == 201 for response in responses)
+    assert fake_llm.request_count == 4
+
+
+@pytest.mark.asyncio
+async def test_concurrent_completions_are_capped(fake_llm: FakeLLMServer) -> None:
+    fake_llm.delay = 0.3
+    await llm_service.configure_llm_client(base_url=fake_llm.base_url, max_concurrency=2)
+    try:
+        await asyncio.gather(*(llm_service.parse_code_with_llm(f"print({i})") for i in range(5)))
+    finally:
+        await llm_service.configure_llm_client(base_url=None, max_concurrency=llm_service.LLM_MAX_CONCURRENCY)
+
+    assert fake_llm.request_count == 5
+    assert fake_llm.max_in_flight == 2
@@ -0,0 +1,95 @@
+from typing import AsyncGenerator
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from pytest import MonkeyPatch
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.common.constants import LLM_MODEL
+from app.core import metrics
+from app.models import Code, CodeVersion, ParseCacheEntry, ParseMetric
+from app.services import llm_service, model_router
+from app.services.model_router import PROBE_INTERVAL, TIER_LARGE, TIER_SMALL, ModelRouter
+from tests.fake_llm import DEFAULT_CONTENT, FakeLLMServer
+
+SMALL_MODEL = "small-model"
+TORCH_SCRIPT = "import torch\n\nmodel = torch.nn.Linear(4, 2)\nprint(model)\n"
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(client: AsyncClient, monkeypatch: MonkeyPatch) -> AsyncGenerator[AsyncClient, None]:
+    monkeypatch.setattr(model_router, "_router", ModelRouter(small_model=SMALL_MODEL, large_model=LLM_MODEL))
+    yield client
+
+
+async def _parse(client: AsyncClient, db_session: AsyncSession, server: FakeLLMServer, content: str) -> dict:
+    code = Code(name="routed_code")
+    db_session.add(code)
+    await db_session.commit()
+    code_version = CodeVersion(code_id=code.id, version=1, content=content)
+    db_session.add(code_version)
+    await db_session.commit()
+    try:
+        await llm_service.configure_llm_client(base_url=server.base_url)
+        response = await client.post(f"/parsing/code-versions/{code_version.id}", json={"name": "routed"})
+    finally:
+        await llm_service.configure_llm_client(base_url=None)
+        server.stop()
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_router_sends_only_small_known_framework_scripts_to_the_small_model() -> None:
+    router = ModelRouter(small_model=SMALL_MODEL, large_model=LLM_MODEL, small_max_tokens=100)
+    assert router.choose(TORCH_SCRIPT, prompt_tokens=50) == TIER_SMALL
+    assert router.choose(TORCH_SCRIPT, prompt_tokens=500) == TIER_LARGE
+    assert router.choose("print('no framework')", prompt_tokens=50) == TIER_LARGE
+    assert router.choose("import jax\n", prompt_tokens=50) == TIER_LARGE
+    assert router.choose("def broken(:\n", prompt_tokens=50) == TIER_LARGE
+    assert ModelRouter(small_model="", large_model=LLM_MODEL).choose(TORCH_SCRIPT, prompt_tokens=50) == TIER_LARGE
+
+
+def test_router_skips_small_tier_with_low_success_rate_but_keeps_probing() -> None:
+    router = ModelRouter(small_model=SMALL_MODEL, large_model=LLM_MODEL, min_success_rate=0.8, min_samples=10)
+    for index in range(10):
+        router.record(TIER_SMALL, valid=index < 5)
+    assert router.success_rate(TIER_SMALL) == 0.5
+
+    tiers = [router.choose(TORCH_SCRIPT, prompt_tokens=50) for _ in range(PROBE_INTERVAL)]
+    assert tiers.count(TIER_SMALL) == 1
+    assert router.stats()["tiers"][TIER_SMALL]["attempts"] == 10
+
+
+@pytest.mark.asyncio
+async def test_small_script_is_parsed_by_the_small_model(client: AsyncClient, db_session: AsyncSession) -> None:
+    server = FakeLLMServer(delay=0.0).start()
+    result = await _parse(client, db_session, server, TORCH_SCRIPT)
+
+    assert [request["model"] for request in server.requests] == [SMALL_MODEL]
+    assert result["versions"][0]["content"] == DEFAULT_CONTENT
+    metric = (await db_session.execute(select(ParseMetric))).scalars().one()
+    assert (metric.model, metric.model_tier) == (SMALL_MODEL, TIER_SMALL)
+    # The cache entry is keyed on the model the parse was routed to
+    entry = (await db_session.execute(select(ParseCacheEntry))).scalars().one()
+    assert entry.model_name == SMALL_MODEL
+
+
+@pytest.mark.asyncio
+async def test_invalid_small_model_output_escalates(client: AsyncClient, db_session: AsyncSession) -> None:
+    server = FakeLLMServer(delay=0.0, content_by_model={SMALL_MODEL: {"name": "incomplete", "metric": "accuracy"}})
+    result = await _parse(client, db_session, server.start(), TORCH_SCRIPT)
+
+    assert [request["model"] for request in server.requests] == [SMALL_MODEL, LLM_MODEL]
+    assert result["versions"][0]["content"] == DEFAULT_CONTENT
+    metric = (await db_session.execute(select(ParseMetric))).scalars().one()
+    assert (metric.model, metric.model_tier, metric.llm_requests) == (LLM_MODEL, TIER_LARGE, 2)
+    assert metrics.get_counter(llm_service.TIER_ESCALATIONS) == 1
+
+    response = await client.get("/parsing/llm/router")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["escalations"] == 1
+    assert stats["tiers"][TIER_SMALL] == {"model": SMALL_MODEL, "attempts": 1, "successes": 0, "success_rate": 0.0}
+    assert stats["tiers"][TIER_LARGE]["successes"] == 1
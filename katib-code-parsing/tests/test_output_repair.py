@@ -0,0 +1,111 @@
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.common.exceptions import LLMResponseError
+from app.core import metrics
+from app.models import Code, CodeVersion
+from app.services import llm_service
+from app.services.output_repair import canonical_key, decode_output, repair_fields
+from tests.fake_llm import DEFAULT_CONTENT, FakeLLMServer
+
+
+async def _parse(client: AsyncClient, db_session: AsyncSession, server: FakeLLMServer, content: str) -> dict:
+    code = Code(name="repaired_code")
+    db_session.add(code)
+    await db_session.commit()
+    code_version = CodeVersion(code_id=code.id, version=1, content=content)
+    db_session.add(code_version)
+    await db_session.commit()
+
+    await llm_service.configure_llm_client(base_url=server.base_url)
+    try:
+        response = await client.post(f"/parsing/code-versions/{code_version.id}", json={"name": "repaired"})
+    finally:
+        await llm_service.configure_llm_client(base_url=None)
+        server.stop()
+    return response.json() if response.status_code == 201 else {"status_code": response.status_code}
+
+
+def test_decode_output_strips_fences_prose_and_trailing_commas() -> None:
+    content = 'Here is the result:\n```json\n{"name": "x", "metric": ["loss",],}\n```\nLet me know if you need more.'
+    parsed, repairs = decode_output(content)
+    assert parsed == {"name": "x", "metric": ["loss"]}
+    assert repairs == ["code_fence", "trailing_comma"]
+
+    parsed, repairs = decode_output('Sure! {"name": "x"} Hope this helps.')
+    assert parsed == {"name": "x"}
+    assert repairs == ["surrounding_text"]
+
+    assert decode_output(json.dumps(DEFAULT_CONTENT)) == (DEFAULT_CONTENT, [])
+
+
+def test_decode_output_rejects_what_it_cannot_repair() -> None:
+    with pytest.raises(LLMResponseError, match="empty"):
+        decode_output("  ")
+    with pytest.raises(LLMResponseError, match="invalid JSON"):
+        decode_output('{"name": "x", "metric": [')
+    with pytest.raises(LLMResponseError, match="instead of an object"):
+        repair_fields(["a", "b"])
+
+
+def test_repair_fields_renames_aliases_and_coerces_types() -> None:
+    assert canonical_key("modelBlock") == "model_block"
+    assert canonical_key("Hyperparameters") == "parameter"
+
+    parsed, repairs = repair_fields(
+        {
+            "framework": "pytorch",
+            "metrics": "accuracy, loss",
+            "hyperparameters": ["parser.add_argument('--lr')", "parser.add_argument('--epochs')"],
+            "modelBlock": "class Net: pass",
+            "data_block": None,
+        }
+    )
+    assert parsed == {
+        "framework": "pytorch",
+        "metric": ["accuracy", "loss"],
+        "parameter": "parser.add_argument('--lr')\nparser.add_argument('--epochs')",
+        "model_block": "class Net: pass",
+        "data_block": "",
+        "name": "unnamed_code",
+    }
+    assert sorted(repairs) == ["key_alias", "key_alias", "key_alias", "list_to_string", "null_field", "string_to_list"]
+
+    # An alias next to the expected key is not allowed to overwrite it
+    parsed, repairs = repair_fields({"name": "x", "metric": ["loss"], "metrics": ["accuracy"]})
+    assert parsed == {"name": "x", "metric": ["loss"], "metrics": ["accuracy"]}
+    assert repairs == []
+
+
+@pytest.mark.asyncio
+async def test_malformed_output_is_repaired_without_another_llm_call(
+    client: AsyncClient, db_session: AsyncSession
+) -> None:
+    aliased = {**DEFAULT_CONTENT, "metrics": "accuracy"}
+    del aliased["metric"]
+    server = FakeLLMServer(delay=0, content=f"```json\n{json.dumps(aliased)}\n```").start()
+    body = await _parse(client, db_session, server, "print('repaired')")
+
+    assert server.request_count == 1
+    assert body["versions"][0]["content"] == DEFAULT_CONTENT
+    stats = (await client.get("/parsing/stats")).json()
+    assert (stats["llm_outputs"], stats["repaired_outputs"], stats["invalid_outputs"]) == (1, 1, 0)
+    assert stats["repair_rate"] == 1.0
+    assert metrics.get_counter("llm.repairs.code_fence") == 1
+    assert metrics.get_counter("llm.repairs.key_alias") == 1
+    assert metrics.get_counter("llm.repairs.string_to_list") == 1
+
+
+@pytest.mark.asyncio
+async def test_output_failing_the_strict_schema_returns_502(client: AsyncClient, db_session: AsyncSession) -> None:
+    # A number where a string belongs is not coerced
+    server = FakeLLMServer(delay=0, content={**DEFAULT_CONTENT, "parameter": 3}).start()
+    body = await _parse(client, db_session, server, "print('invalid')")
+
+    assert body == {"status_code": 502}
+    stats = (await client.get("/parsing/stats")).json()
+    assert (stats["llm_outputs"], stats["repaired_outputs"], stats["invalid_outputs"]) == (1, 0, 1)
+    assert stats["repair_rate"] == 0.0
@@ -0,0 +1,121 @@
+import pytest
+from unittest.mock import AsyncMock
+from httpx import AsyncClient
+from pytest import MonkeyPatch
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.common.constants import LLM_MODEL
+from app.models import Code, CodeVersion, ParseCacheEntry
+from app.schemas.parsing_result import ParsingResultCreate
+from app.services import parse_cache_service, parsing_service
+
+MOCK_LLM_RESPONSE = {
+    "name": "test_code",
+    "framework": "pytorch",
+    "metric": ["accuracy"],
+    "parameter": "--lr",
+    "model_block": "class Net(nn.Module): pass",
+    "data_block": "main()",
+}
+
+
+async def _create_code_version(db_session: AsyncSession, content: str) -> int:
+    code = Code(name="cached_code")
+    db_session.add(code)
+    await db_session.commit()
+    code_version = CodeVersion(code_id=code.id, version=1, content=content)
+    db_session.add(code_version)
+    await db_session.commit()
+    return code_version.id
+
+
+def test_normalize_code_ignores_whitespace_only_changes() -> None:
+    original = "import torch\n\ndef main():\n    train()\n"
+    reformatted = "import torch  \r\n\r\n\r\ndef main():\t\r\n    train()"
+    assert parse_cache_service.compute_code_hash(original) == parse_cache_service.compute_code_hash(reformatted)
+    # Indentation is significant and must change the hash
+    assert parse_cache_service.compute_code_hash("if x:\n    y()") != parse_cache_service.compute_code_hash(
+        "if x:\ny()"
+    )
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_skips_llm(
+    db_session: AsyncSession, testing_session_local: sessionmaker, monkeypatch: MonkeyPatch
+) -> None:
+    mock_parse = AsyncMock(return_value=MOCK_LLM_RESPONSE)
+    monkeypatch.setattr("app.services.parsing_service.parse_code_with_llm", mock_parse)
+
+    first_id = await _create_code_version(db_session, "import torch\nprint('train')\n")
+    second_id = await _create_code_version(db_session, "import torch   \n\nprint('train')")
+
+    first = await parsing_service.create_parsing_result(
+        db=db_session, code_version_id=first_id, result_create=ParsingResultCreate(name="first"),
+        session_factory=testing_session_local,
+    )
+    second = await parsing_service.create_parsing_result(
+        db=db_session, code_version_id=second_id, result_create=ParsingResultCreate(name="second"),
+        session_factory=testing_session_local,
+    )
+
+    mock_parse.assert_called_once()
+    assert first.versions[0].content == MOCK_LLM_RESPONSE
+    assert second.code_version_id == second_id
+    assert second.versions[0].content == MOCK_LLM_RESPONSE
+
+    stats = await parse_cache_service.get_cache_stats(db_session)
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_locates_blocks_in_the_requested_code(db_session: AsyncSession) -> None:
+    original = "import torch\n\nclass Net(nn.Module):\n    pass\n\nmain()\n"
+    reformatted = "\n\nimport torch\n\n\nclass Net(nn.Module):  \n    pass\n\n\nmain()\n"
+    parsed = {
+        **MOCK_LLM_RESPONSE,
+        "model_block": "class Net(nn.Module):\n    pass",
+        "block_spans": {"model_block": [[3, 4]], "data_block": [[6, 6]]},
+    }
+    await parse_cache_service.store_cached_parse(db_session, original, parsed, LLM_MODEL)
+    entry = (await db_session.execute(select(ParseCacheEntry))).scalars().one()
+    assert "block_spans" not in entry.content
+
+    cached = await parse_cache_service.get_cached_parse(db_session, reformatted, [LLM_MODEL])
+    assert cached is not None
+    assert cached["block_spans"] == {"model_block": [[6, 7]], "data_block": [[10, 10]]}
+    assert cached["model_block"] == "class Net(nn.Module):  \n    pass"
+    assert (await parse_cache_service.get_cached_parse(db_session, original, [LLM_MODEL]))["block_spans"] == {
+        "model_block": [[3, 4]],
+        "data_block": [[6, 6]],
+    }
+
+
+@pytest.mark.asyncio
+async def test_invalidate_cache_endpoint(client: AsyncClient, db_session: AsyncSession) -> None:
+    await parse_cache_service.store_cached_parse(db_session, "print('current')", MOCK_LLM_RESPONSE, LLM_MODEL)
+    db_session.add(
+        ParseCacheEntry(
+            cache_key="0" * 64,
+            code_hash="1" * 64,
+            model_name="gpt-4-turbo",
+            prompt_version="outdated",
+            content=MOCK_LLM_RESPONSE,
+        )
+    )
+    await db_session.commit()
+
+    response = await client.delete("/parsing/cache", params={"stale_only": True})
+    assert response.status_code == 200
+    assert response.json() == {"deleted": 1}
+
+    response = await client.get("/parsing/cache/stats")
+    assert response.status_code == 200
+    assert response.json()["entries"] == 1
+
+    response = await client.delete("/parsing/cache")
+    assert response.json() == {"deleted": 1}
@@ -0,0 +1,158 @@
+import datetime
+import pytest
+from unittest.mock import AsyncMock
+from httpx import AsyncClient
+from pytest import MonkeyPatch
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.models import ParseJob
+from app.services import parse_job_service
+from app.services.parse_job_service import ParseJobWorkerPool
+
+MOCK_LLM_RESPONSE = {
+    "name": "queued_code",
+    "framework": "tensorflow",
+    "metric": ["accuracy"],
+    "parameter": "--batch-size",
+    "model_block": "model = tf.keras.Sequential()",
+    "data_block": "(x_train, y_train)",
+}
+
+
+async def _create_code_version(client: AsyncClient) -> int:
+    response = await client.post("/codes/", json={"name": "queued_code", "content": "print('queued')"})
+    return response.json()["versions"][0]["id"]
+
+
+@pytest.mark.asyncio
+async def test_job_mode_returns_202_and_worker_completes_job(
+    client: AsyncClient, testing_session_local: sessionmaker, monkeypatch: MonkeyPatch
+) -> None:
+    mock_parse = AsyncMock(return_value=MOCK_LLM_RESPONSE)
+    monkeypatch.setattr("app.services.parsing_service.parse_code_with_llm", mock_parse)
+    code_version_id = await _create_code_version(client)
+
+    response = await client.post(
+        f"/parsing/code-versions/{code_version_id}", params={"mode": "job"}, json={"name": "Queued Result"}
+    )
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert response.json()["status"] == "queued"
+    assert response.headers["location"] == f"/parsing/jobs/{job_id}"
+    mock_parse.assert_not_called()
+
+    # A client retry attaches to the same job instead of queueing another parse
+    response = await client.post(
+        f"/parsing/code-versions/{code_version_id}", params={"mode": "job"}, json={"name": "Queued Result"}
+    )
+    assert response.json()["id"] == job_id
+
+    workers = ParseJobWorkerPool(testing_session_local, concurrency=1)
+    assert await workers.run_once("worker-1") is True
+    assert await workers.run_once("worker-1") is False
+    mock_parse.assert_called_once()
+
+    response = await client.get(f"/parsing/jobs/{job_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "succeeded"
+    result_location = response.json()["result_location"]
+    response = await client.get(result_location)
+    assert response.status_code == 200
+    assert response.json()["name"] == "Queued Result"
+    assert response.json()["versions"][0]["content"] == MOCK_LLM_RESPONSE
+
+    # Test for non-existent job and code version
+    response = await client.get("/parsing/jobs/999")
+    assert response.status_code == 404
+    response = await client.post("/parsing/code-versions/999", params={"mode": "job"}, json={"name": "x"})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_jobs_keep_the_request_options(
+    client: AsyncClient, testing_session_local: sessionmaker, monkeypatch: MonkeyPatch
+) -> None:
+    mock_parse = AsyncMock(return_value=MOCK_LLM_RESPONSE)
+    monkeypatch.setattr("app.services.parsing_service.parse_code_with_llm", mock_parse)
+    code_version_id = await _create_code_version(client)
+
+    plain = await client.post(
+        f"/parsing/code-versions/{code_version_id}", params={"mode": "job"}, json={"name": "Queued Result"}
+    )
+    with_deadline = await client.post(
+        f"/parsing/code-versions/{code_version_id}",
+        params={"mode": "job"},
+        json={"name": "Queued Result", "deadline_ms": 2500, "hedge_after_ms": 0},
+    )
+    # Different options are different jobs
+    assert with_deadline.json()["id"] != plain.json()["id"]
+
+    workers = ParseJobWorkerPool(testing_session_local, concurrency=1)
+    assert await workers.run_once("worker-1") is True
+    mock_parse.reset_mock()
+    # The cache answers the same code now; make the second job parse again to see its options
+    monkeypatch.setattr("app.services.parse_cache_service.get_cached_parse", AsyncMock(return_value=None))
+    assert await workers.run_once("worker-1") is True
+    assert mock_parse.call_args.kwargs["deadline"] == 2.5
+    assert mock_parse.call_args.kwargs["hedge_after"] == 0
+
+
+@pytest.mark.asyncio
+async def test_crashed_worker_job_is_released_after_visibility_timeout(
+    client: AsyncClient, db_session: AsyncSession, testing_session_local: sessionmaker, monkeypatch: MonkeyPatch
+) -> None:
+    mock_parse = AsyncMock(return_value=MOCK_LLM_RESPONSE)
+    monkeypatch.setattr("app.services.parsing_service.parse_code_with_llm", mock_parse)
+    code_version_id = await _create_code_version(client)
+    response = await client.post(
+        f"/parsing/code-versions/{code_version_id}", params={"mode": "job"}, json={"name": "Recovered"}
+    )
+    job_id = response.json()["id"]
+
+    # worker-1 leases the job and then "crashes" without finishing it
+    leased = await parse_job_service.lease_next_job(db_session, "worker-1", visibility_timeout=60)
+    assert leased is not None and leased.id == job_id
+
+    workers = ParseJobWorkerPool(testing_session_local, concurrency=1)
+    assert await workers.run_once("worker-2") is False
+
+    # Once the lease expires the job becomes visible again
+    db_job = await db_session.get(ParseJob, job_id)
+    db_job.lease_expires_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    await db_session.commit()
+
+    assert await workers.run_once("worker-2") is True
+    db_job = await parse_job_service.get_parse_job(db_session, job_id)
+    await db_session.refresh(db_job)
+    assert db_job.status == "succeeded"
+    assert db_job.attempts == 2
+
+    # The crashed worker can no longer overwrite the outcome
+    assert await parse_job_service.finish_job(db_session, job_id, "worker-1", error="late failure") is False
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_then_marked_failed(
+    client: AsyncClient, db_session: AsyncSession, testing_session_local: sessionmaker, monkeypatch: MonkeyPatch
+) -> None:
+    mock_parse = AsyncMock(side_effect=RuntimeError("LLM unavailable"))
+    monkeypatch.setattr("app.services.parsing_service.parse_code_with_llm", mock_parse)
+    code_version_id = await _create_code_version(client)
+    response = await client.post(
+        f"/parsing/code-versions/{code_version_id}", params={"mode": "job"}, json={"name": "Failing"}
+    )
+    job_id = response.json()["id"]
+
+    workers = ParseJobWorkerPool(testing_session_local, concurrency=1, max_attempts=2)
+    assert await workers.run_once("worker-1") is True
+    response = await client.get(f"/parsing/jobs/{job_id}")
+    assert response.json()["status"] == "queued"
+
+    assert await workers.run_once("worker-1") is True
+    response = await client.get(f"/parsing/jobs/{job_id}")
+    assert response.json()["status"] == "failed"
+    assert response.json()["error"] == "LLM unavailable"
+    assert response.json()["result_location"] is None
+    assert mock_parse.call_count == 2
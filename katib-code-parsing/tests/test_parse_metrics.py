@@ -0,0 +1,85 @@
+import datetime
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models import Code, CodeVersion, ParseMetric
+from app.services import llm_service, parse_metrics_service
+from tests.fake_llm import FakeLLMServer
+
+
+async def _create_code_version(db_session: AsyncSession, content: str) -> int:
+    code = Code(name="measured_code")
+    db_session.add(code)
+    await db_session.commit()
+    code_version = CodeVersion(code_id=code.id, version=1, content=content)
+    db_session.add(code_version)
+    await db_session.commit()
+    return code_version.id
+
+
+def test_percentile_uses_nearest_rank() -> None:
+    values = [float(value) for value in range(1, 101)]
+    assert parse_metrics_service.percentile(values, 50) == 50.0
+    assert parse_metrics_service.percentile(values, 95) == 95.0
+    assert parse_metrics_service.percentile(values, 99) == 99.0
+    assert parse_metrics_service.percentile([7.0], 99) == 7.0
+    assert parse_metrics_service.percentile([], 50) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_parse_records_metrics_per_result_version(client: AsyncClient, db_session: AsyncSession) -> None:
+    code_version_id = await _create_code_version(db_session, "print('measure me')")
+    server = FakeLLMServer(delay=0.0).start()
+    try:
+        await llm_service.configure_llm_client(base_url=server.base_url)
+        first = await client.post(f"/parsing/code-versions/{code_version_id}", json={"name": "first"})
+        second = await client.post(f"/parsing/code-versions/{code_version_id}", json={"name": "second"})
+    finally:
+        await llm_service.configure_llm_client(base_url=None)
+        server.stop()
+    assert first.status_code == 201
+    assert second.status_code == 201
+
+    result = await db_session.execute(select(ParseMetric).order_by(ParseMetric.id))
+    llm_metric, cache_metric = result.scalars().all()
+    assert llm_metric.parsing_result_version_id == first.json()["versions"][0]["id"]
+    assert llm_metric.source == "llm"
+    assert llm_metric.model == llm_service.LLM_MODEL
+    assert (llm_metric.llm_requests, llm_metric.prompt_tokens, llm_metric.completion_tokens) == (1, 100, 50)
+    assert llm_metric.latency_ms >= llm_metric.llm_latency_ms > 0
+    assert llm_metric.retries == 0
+    assert cache_metric.parsing_result_version_id == second.json()["versions"][0]["id"]
+    assert cache_metric.source == "cache"
+    assert (cache_metric.model, cache_metric.prompt_tokens) == (None, 0)
+
+    response = await client.get("/parsing/metrics/summary", params={"window_minutes": 5})
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["count"] == 2
+    assert summary["by_source"] == {"llm": 1, "cache": 1}
+    assert (summary["llm_requests"], summary["prompt_tokens"], summary["completion_tokens"]) == (1, 100, 50)
+    assert summary["total_tokens"]["p95"] == 150
+    assert summary["latency_ms"]["p99"] == max(llm_metric.latency_ms, cache_metric.latency_ms)
+
+
+@pytest.mark.asyncio
+async def test_summary_only_covers_the_window(client: AsyncClient, db_session: AsyncSession) -> None:
+    now = datetime.datetime.utcnow()
+    for minutes_ago, latency in [(5, 100.0), (10, 200.0), (120, 5000.0)]:
+        db_session.add(
+            ParseMetric(source="fast_path", latency_ms=latency, created_at=now - datetime.timedelta(minutes=minutes_ago))
+        )
+    await db_session.commit()
+
+    response = await client.get("/parsing/metrics/summary", params={"window_minutes": 60})
+    summary = response.json()
+    assert summary["count"] == 2
+    assert summary["latency_ms"] == {"p50": 100.0, "p90": 200.0, "p95": 200.0, "p99": 200.0}
+    assert summary["queue_wait_ms"]["p95"] == 0.0
+
+    since = (now - datetime.timedelta(hours=3)).isoformat()
+    response = await client.get("/parsing/metrics/summary", params={"since": since})
+    assert response.json()["count"] == 3
@@ -0,0 +1,122 @@
+import asyncio
+import json
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from pytest import MonkeyPatch
+
+
+MOCK_LLM_RESPONSE = {
+    "name": "batch_code",
+    "framework": "pytorch",
+    "metric": ["accuracy"],
+    "parameter": "--lr",
+    "model_block": "class Net(nn.Module): pass",
+    "data_block": "main()",
+}
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(session_client: AsyncClient) -> AsyncGenerator[AsyncClient, None]:
+    # A file database, so that concurrent batch items each get their own connection
+    yield session_client
+
+
+def _fake_llm(in_flight: Dict[str, int]) -> Callable[..., Awaitable[dict]]:
+    # Counts the parses running at the same time, and the most seen at once
+    async def parse(code_content: str, **options: Any) -> dict:
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        try:
+            if "broken" in code_content:
+                raise ValueError("LLM returned invalid JSON")
+            # The first script is the slowest, so completion order differs from request order
+            await asyncio.sleep(1.0 if code_content.endswith("#1") else 0.05)
+            return MOCK_LLM_RESPONSE
+        finally:
+            in_flight["now"] -= 1
+
+    return parse
+
+
+@pytest.mark.asyncio
+async def test_batch_streams_items_as_they_complete(client: AsyncClient, monkeypatch: MonkeyPatch) -> None:
+    in_flight = {"now": 0, "peak": 0}
+    monkeypatch.setattr("app.services.parsing_service.parse_code_with_llm", _fake_llm(in_flight))
+
+    response = await client.post("/codes/", json={"name": "batch", "content": "print('v') #1"})
+    code_id = response.json()["id"]
+    code_version_ids = [response.json()["versions"][0]["id"]]
+    for i in range(2, 5):
+        content = "print('broken') #3" if i == 3 else f"print('v') #{i}"
+        response = await client.post(f"/codes/{code_id}/versions/", json={"content": content})
+        code_version_ids.append(response.json()["id"])
+
+    response = await client.post(
+        "/parsing/batch",
+        json={"code_version_ids": code_version_ids + [999], "name": "Batch", "concurrency": 2},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    items = [json.loads(line) for line in response.text.splitlines()]
+
+    assert sorted(item["code_version_id"] for item in items) == sorted(code_version_ids + [999])
+    by_id = {item["code_version_id"]: item for item in items}
+    assert by_id[code_version_ids[2]]["status"] == "error"
+    assert by_id[code_version_ids[2]]["error"] == "LLM returned invalid JSON"
+    assert by_id[999]["error"] == "Code version not found"
+
+    # With two workers, items are written in completion order rather than request order
+    ok_items = [item for item in items if item["status"] == "ok"]
+    assert len(ok_items) == 3
+    assert ok_items[-1]["code_version_id"] == code_version_ids[0]
+    # Items ran two at a time, never more
+    assert in_flight["peak"] == 2
+
+    response = await client.get(f"/parsing/results/{ok_items[0]['parsing_result_id']}")
+    assert response.status_code == 200
+    assert response.json()["name"] == "Batch"
+
+
+@pytest.mark.asyncio
+async def test_batch_parses_only_unparsed_versions_of_code(client: AsyncClient, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr("app.services.parsing_service.parse_code_with_llm", _fake_llm({"now": 0, "peak": 0}))
+
+    response = await client.post("/codes/", json={"name": "batch", "content": "print('v') #1"})
+    code_id = response.json()["id"]
+    first_version_id = response.json()["versions"][0]["id"]
+    response = await client.post(f"/codes/{code_id}/versions/", json={"content": "print('v') #2"})
+    second_version_id = response.json()["id"]
+    await client.post(f"/parsing/code-versions/{first_version_id}", json={"name": "Already parsed"})
+
+    response = await client.post("/parsing/batch", json={"code_id": code_id})
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["code_version_id"] for item in items] == [second_version_id]
+    assert items[0]["status"] == "ok"
+
+    # Test for non-existent code and an invalid request
+    response = await client.post("/parsing/batch", json={"code_id": 999})
+    assert response.status_code == 404
+    response = await client.post("/parsing/batch", json={"code_id": code_id, "code_version_ids": [1]})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_batch_forwards_the_parse_options(client: AsyncClient, monkeypatch: MonkeyPatch) -> None:
+    seen_options: List[Dict[str, Any]] = []
+
+    async def parse(code_content: str, **options: Any) -> dict:
+        seen_options.append(options)
+        return MOCK_LLM_RESPONSE
+
+    monkeypatch.setattr("app.services.parsing_service.parse_code_with_llm", parse)
+    response = await client.post("/codes/", json={"name": "batch", "content": "print('v') #1"})
+
+    response = await client.post(
+        "/parsing/batch", json={"code_id": response.json()["id"], "deadline_ms": 1500, "hedge_after_ms": 0}
+    )
+    assert [json.loads(line)["status"] for line in response.text.splitlines()] == ["ok"]
+    assert seen_options[0]["deadline"] == 1.5
+    assert seen_options[0]["hedge_after"] == 0
@@ -1,23 +1,14 @@
 import pytest
-import pytest_asyncio
 from unittest.mock import AsyncMock
-from typing import AsyncGenerator
 from pytest import MonkeyPatch
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 
-from app.models import Base, Code, CodeVersion
+from app.models import Code, CodeVersion
 from app.schemas.parsing_result import ParsingResultCreate
-from app.services import parsing_service, llm_service
-
-# In-memory SQLite database for testing
-DATABASE_URL = "sqlite+aiosqlite:///:memory:"
-
-engine = create_async_engine(DATABASE_URL, echo=True)
-TestingSessionLocal = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
-)
+from app.services import parsing_service
+from app.services.model_router import TIER_LARGE
 
 # Mock LLM response
 MOCK_LLM_RESPONSE = {
@@ -30,21 +21,9 @@ MOCK_LLM_RESPONSE = {
 }
 
 
-@pytest_asyncio.fixture(scope="function")
-async def db_session() -> AsyncGenerator[AsyncSession, None]:
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-    async with TestingSessionLocal() as session:
-        yield session
-
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-
-
 @pytest.mark.asyncio
 async def test_create_parsing_result_with_mock_llm(
-    db_session: AsyncSession, monkeypatch: MonkeyPatch
+    db_session: AsyncSession, testing_session_local: sessionmaker, monkeypatch: MonkeyPatch
 ) -> None:
     # 1. Arrange: Create test data and mock the LLM service
 
@@ -78,6 +57,7 @@ async def test_create_parsing_result_with_mock_llm(
         db=db_session,
         code_version_id=test_code_version_id,
         result_create=result_create,
+        session_factory=testing_session_local,
     )
 
     # 3. Assert: Check if the data was created correctly
@@ -86,7 +66,7 @@ async def test_create_parsing_result_with_mock_llm(
     assert parsing_result.code_version_id == test_code_version_id
 
     # Verify that the LLM mock was called
-    mock_parse.assert_called_once_with("print('hello')")
+    mock_parse.assert_called_once_with("print('hello')", model_tier=TIER_LARGE)
 
     # Check the content of the created parsing result version
     # Since the relationship is loaded, we can access versions directly.
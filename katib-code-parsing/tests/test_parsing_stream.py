@@ -0,0 +1,180 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncGenerator, Generator, List, Tuple
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from pytest import MonkeyPatch
+from sqlalchemy.orm import sessionmaker
+
+from app.common.constants import LLM_MODEL
+from app.models import Code, CodeVersion
+from app.schemas.parsing_result import ParsingResultCreate
+from app.services import llm_service, model_router, parsing_service
+from app.services.json_stream_parser import JsonMemberScanner
+from app.services.model_router import ModelRouter
+from tests.fake_llm import DEFAULT_CONTENT, FakeLLMServer
+
+
+@pytest.fixture(scope="function")
+def fake_llm() -> Generator[FakeLLMServer, None, None]:
+    server = FakeLLMServer(delay=0.0, chunk_size=8, chunk_delay=0.02).start()
+    yield server
+    server.stop()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def session_factory(session_factory: sessionmaker, fake_llm: FakeLLMServer) -> AsyncGenerator[sessionmaker, None]:
+    await llm_service.configure_llm_client(base_url=fake_llm.base_url)
+    yield session_factory
+    await llm_service.configure_llm_client(base_url=None)
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(session_client: AsyncClient) -> AsyncGenerator[AsyncClient, None]:
+    yield session_client
+
+
+async def _create_code_version(session_factory: sessionmaker, content: str) -> int:
+    async with session_factory() as db:
+        code = Code(name="streamed_code")
+        db.add(code)
+        await db.commit()
+        code_version = CodeVersion(code_id=code.id, version=1, content=content)
+        db.add(code_version)
+        await db.commit()
+        return code_version.id
+
+
+def _parse_sse(body: str) -> List[Tuple[str, dict]]:
+    events = []
+    for message in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_json_member_scanner_emits_members_as_they_close() -> None:
+    text = json.dumps(
+        {"name": 'say "hi", {not a brace}', "metric": ["a", "b"], "nested": {"x": [1, {"y": 2}]}, "data_block": "main()"}
+    )
+    scanner = JsonMemberScanner()
+    members = []
+    for index in range(0, len(text), 3):
+        members.extend(scanner.feed(text[index : index + 3]))
+
+    assert members == [
+        ("name", 'say "hi", {not a brace}'),
+        ("metric", ["a", "b"]),
+        ("nested", {"x": [1, {"y": 2}]}),
+        ("data_block", "main()"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stream_pushes_fields_before_llm_finishes(session_factory: sessionmaker) -> None:
+    code_version_id = await _create_code_version(session_factory, "print('hello')\n")
+
+    started = time.perf_counter()
+    arrivals = []
+    async for event, data in parsing_service.stream_parsing_result(
+        session_factory, code_version_id, ParsingResultCreate(name="streamed")
+    ):
+        arrivals.append((event, time.perf_counter() - started))
+
+    events = [event for event, _ in arrivals]
+    assert events == ["started", "name", "framework", "metric", "parameter", "model_block", "data_block", "result"]
+    times = dict(arrivals)
+    # The framework is known long before the whole output has been streamed
+    assert times["framework"] < times["data_block"] / 2
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_persists_result(client: AsyncClient, session_factory: sessionmaker) -> None:
+    code_version_id = await _create_code_version(session_factory, "print('hello')\n")
+
+    response = await client.post(f"/parsing/code-versions/{code_version_id}/stream", json={"name": "streamed"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(response.text)
+    assert events[0] == ("started", {"code_version_id": code_version_id})
+    assert ("framework", {"value": DEFAULT_CONTENT["framework"]}) in events
+    event, result = events[-1]
+    assert event == "result"
+    assert result["versions"][0]["content"] == DEFAULT_CONTENT
+
+    response = await client.get(f"/parsing/results/{result['id']}")
+    assert response.status_code == 200
+    assert response.json()["versions"][0]["content"] == DEFAULT_CONTENT
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_unknown_code_version(client: AsyncClient) -> None:
+    response = await client.post("/parsing/code-versions/999/stream", json={"name": "streamed"})
+    assert response.status_code == 404
+
+
+async def _collect(session_factory: sessionmaker, code_version_id: int) -> List[Tuple[str, Any]]:
+    return [
+        event
+        async for event in parsing_service.stream_parsing_result(
+            session_factory, code_version_id, ParsingResultCreate(name="streamed")
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stream_shares_the_llm_call_with_concurrent_parses(
+    session_factory: sessionmaker, fake_llm: FakeLLMServer
+) -> None:
+    code_version_id = await _create_code_version(session_factory, "print('hello')\n")
+
+    async def parse() -> Any:
+        async with session_factory() as db:
+            return await parsing_service.create_parsing_result(
+                db, code_version_id, ParsingResultCreate(name="parsed"), session_factory
+            )
+
+    streamed, other_stream, parsed = await asyncio.gather(
+        _collect(session_factory, code_version_id), _collect(session_factory, code_version_id), parse()
+    )
+
+    assert fake_llm.request_count == 1
+    for events in (streamed, other_stream):
+        # Whichever request started the call, every field reaches every stream
+        assert {event for event, _ in events} == {
+            "started", "name", "framework", "metric", "parameter", "model_block", "data_block", "result"
+        }
+        assert events[-1][1].versions[0].content == DEFAULT_CONTENT
+    assert parsed.versions[0].content == DEFAULT_CONTENT
+
+
+@pytest.mark.asyncio
+async def test_stream_pushes_small_model_results_at_once(
+    session_factory: sessionmaker, fake_llm: FakeLLMServer, monkeypatch: MonkeyPatch
+) -> None:
+    monkeypatch.setattr(model_router, "_router", ModelRouter(small_model="small-model", large_model=LLM_MODEL))
+    code_version_id = await _create_code_version(
+        session_factory, "import torch\n\nmodel = torch.nn.Linear(4, 2)\nprint(model)\n"
+    )
+
+    events = await _collect(session_factory, code_version_id)
+
+    assert [request["model"] for request in fake_llm.requests] == ["small-model"]
+    assert not fake_llm.requests[0].get("stream")
+    assert ("framework", {"value": DEFAULT_CONTENT["framework"]}) in events
+    assert events[-1][0] == "result"
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_rejects_hedge_and_deadline(client: AsyncClient, session_factory: sessionmaker) -> None:
+    code_version_id = await _create_code_version(session_factory, "print('hello')\n")
+
+    for options in ({"hedge_after_ms": 100}, {"deadline_ms": 1000}):
+        response = await client.post(
+            f"/parsing/code-versions/{code_version_id}/stream", json={"name": "streamed", **options}
+        )
+        assert response.status_code == 422
@@ -0,0 +1,104 @@
+import pytest
+
+from app.services import llm_service
+from app.services.prompt_slicer import restore_blocks, slice_code
+from tests.fake_llm import FakeLLMServer
+
+SCRIPT = '''"""Training script."""
+import argparse
+
+import torch.nn as nn
+
+
+def plot_curves(history):
+    """Plots the loss curve."""
+    import matplotlib.pyplot as plt
+    plt.plot(history)
+    plt.show()
+
+
+def unused_helper(x):
+    return x * 2
+
+
+class Net(nn.Module):
+    """A tiny model."""
+
+    def forward(self, x):
+        return x  # identity
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lr', type=float, default=0.1)  # learning rate
+
+    args = parser.parse_args()
+    model = Net()
+    model.fit(args.lr)
+    plot_curves([1, 2])
+
+
+if __name__ == "__main__":
+    main()
+'''
+
+
+def test_slice_code_drops_irrelevant_definitions_docstrings_and_comments() -> None:
+    sliced = slice_code(SCRIPT)
+
+    assert "unused_helper" not in sliced.text
+    assert "def plot_curves" not in sliced.text
+    assert '"""' not in sliced.text
+    assert "#" not in sliced.text
+    assert "\n\n" not in sliced.text
+    assert "class Net(nn.Module):" in sliced.text
+    assert "parser.add_argument('--lr', type=float, default=0.1)" in sliced.text
+    assert "plot_curves([1, 2])" in sliced.text
+    # Every sliced line maps back to the identical original line
+    original = SCRIPT.splitlines()
+    for line, number in zip(sliced.text.split("\n"), sliced.line_map):
+        assert original[number - 1].startswith(line)
+
+
+def test_restore_blocks_maps_llm_blocks_to_original_spans() -> None:
+    sliced = slice_code(SCRIPT)
+    parsed = {
+        "model_block": "class Net(nn.Module):\n    def forward(self, x):\n        return x",
+        "parameter": "parser.add_argument('--lr', type=float, default=0.1)",
+        "data_block": "not in the script",
+    }
+
+    restored = restore_blocks(parsed, sliced)
+
+    assert restored["block_spans"]["model_block"] == [[18, 22]]
+    assert restored["model_block"].startswith("class Net(nn.Module):\n    \"\"\"A tiny model.\"\"\"")
+    assert restored["model_block"].endswith("return x  # identity")
+    assert restored["block_spans"]["parameter"] == [[27, 27]]
+    assert restored["parameter"].endswith("# learning rate")
+    assert restored["data_block"] == "not in the script"
+    assert "data_block" not in restored["block_spans"]
+
+
+@pytest.mark.asyncio
+async def test_parse_code_with_llm_sends_sliced_prompt() -> None:
+    fake_llm = FakeLLMServer(
+        delay=0,
+        content={
+            "framework": "pytorch",
+            "metric": [],
+            "parameter": "",
+            "model_block": "class Net(nn.Module):\n    def forward(self, x):\n        return x",
+            "data_block": "",
+        },
+    ).start()
+    await llm_service.configure_llm_client(base_url=fake_llm.base_url)
+    try:
+        result = await llm_service.parse_code_with_llm(SCRIPT)
+    finally:
+        await llm_service.configure_llm_client(base_url=None)
+        fake_llm.stop()
+
+    prompt = fake_llm.requests[0]["messages"][1]["content"]
+    assert "unused_helper" not in prompt
+    assert llm_service.estimate_tokens(prompt) < llm_service.estimate_tokens(llm_service.get_llm_prompt(SCRIPT))
+    assert result["block_spans"] == {"model_block": [[18, 22]]}
@@ -0,0 +1,89 @@
+import logging
+from typing import AsyncGenerator, Optional
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from pytest import LogCaptureFixture, MonkeyPatch
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.common.exceptions import QueryBudgetExceededError
+from app.core import metrics
+from app.core.query_stats import QUERY_BUDGETS_EXCEEDED, configure_query_stats, reset_query_stats
+from app.models import Code
+from app.services import code_service
+
+@pytest_asyncio.fixture(scope="function")
+async def client(session_client: AsyncClient) -> AsyncGenerator[AsyncClient, None]:
+    reset_query_stats()
+    configure_query_stats(enforce_budgets=True)
+    yield session_client
+    configure_query_stats()
+
+
+@pytest.mark.asyncio
+async def test_responses_report_their_sql_statements(client: AsyncClient) -> None:
+    response = await client.post("/codes/", json={"name": "code", "content": "print('hello')"})
+    code_id = response.json()["id"]
+    for _ in range(2):
+        response = await client.get(f"/codes/{code_id}")
+
+    # The code, its versions and their parsing results
+    assert response.headers["X-DB-Queries"] == "3"
+    assert float(response.headers["X-DB-Time-Ms"]) >= float(response.headers["X-DB-Slowest-Ms"]) > 0
+    stats = (await client.get("/parsing/db/stats")).json()
+    endpoint = stats["endpoints"]["GET /codes/{code_id}"]
+    assert (endpoint["requests"], endpoint["statements"], endpoint["max_statements"]) == (2, 6, 3)
+    assert endpoint["slowest_statement"].startswith("SELECT")
+    assert stats["statements"] >= 6 + stats["endpoints"]["POST /codes/"]["statements"]
+
+
+@pytest.mark.asyncio
+async def test_endpoints_stay_within_their_query_budgets(client: AsyncClient) -> None:
+    response = await client.post("/codes/", json={"name": "code", "content": "print('hello')"})
+    assert response.status_code == 201
+    code_id = response.json()["id"]
+    response = await client.post(f"/codes/{code_id}/versions/", json={"content": "print('hello again')"})
+    assert response.status_code == 201
+    version_id = response.json()["id"]
+
+    assert (await client.get("/codes/")).status_code == 200
+    assert (await client.put(f"/codes/{code_id}", json={"name": "renamed"})).status_code == 200
+    assert (await client.get(f"/codes/{code_id}/versions/{version_id}/similar")).status_code == 200
+    assert metrics.get_counter(QUERY_BUDGETS_EXCEEDED) == 0
+
+
+@pytest.mark.asyncio
+async def test_extra_round_trip_exceeds_the_query_budget(client: AsyncClient, monkeypatch: MonkeyPatch) -> None:
+    response = await client.post("/codes/", json={"name": "code", "content": "print('hello')"})
+    code_id = response.json()["id"]
+    get_code = code_service.get_code
+
+    async def get_code_and_refresh(db: AsyncSession, code_id: int) -> Optional[Code]:
+        db_code = await get_code(db, code_id)
+        await db.refresh(db_code)
+        return db_code
+
+    monkeypatch.setattr(code_service, "get_code", get_code_and_refresh)
+
+    # The refresh reloads the code and its eager relationships
+    with pytest.raises(QueryBudgetExceededError, match="GET /codes/{code_id} ran 6 SQL statements, over its budget of 4"):
+        await client.get(f"/codes/{code_id}")
+
+    # Outside of tests the request goes through and is only logged
+    configure_query_stats(enforce_budgets=False)
+    assert (await client.get(f"/codes/{code_id}")).status_code == 200
+    assert metrics.get_counter(QUERY_BUDGETS_EXCEEDED) == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_logged(client: AsyncClient, session_factory: sessionmaker, caplog: LogCaptureFixture) -> None:
+    configure_query_stats(slow_query_ms=0.001, enforce_budgets=True)
+
+    with caplog.at_level(logging.WARNING, logger="app.core.query_stats"):
+        async with session_factory() as session:
+            await session.execute(text("SELECT 42"))
+
+    assert any("Slow query" in record.message and "SELECT 42" in record.message for record in caplog.records)
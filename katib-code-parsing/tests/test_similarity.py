@@ -0,0 +1,88 @@
+from pathlib import Path
+
+import pytest
+from httpx import AsyncClient
+from pytest import MonkeyPatch
+
+from app.services import llm_service
+from app.services.minhash import code_tokens, compute_signature, estimate_similarity, lsh_buckets
+from app.services.static_parser import analyze_code
+from tests.fake_llm import FakeLLMServer
+
+EXAMPLES_DIR = Path(__file__).resolve().parent.parent / "examples"
+IRIS_CODE = (EXAMPLES_DIR / "org_code_iris.py").read_text()
+MNIST_CODE = (EXAMPLES_DIR / "org_code_mnist.py").read_text()
+# A fork of the iris script with different defaults
+IRIS_FORK = IRIS_CODE.replace("default=0.001", "default=0.01").replace("default=100", "default=50")
+
+
+async def _create_code(client: AsyncClient, name: str, content: str) -> dict:
+    response = await client.post("/codes/", json={"name": name, "content": content})
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_signatures_match_forks_but_not_other_scripts() -> None:
+    assert code_tokens("lr = torch.optim.Adam(model.parameters(), lr=0.01)  # fast") == [
+        "_", "=", "_", ".", "optim", ".", "Adam", "(", "_", ".", "parameters", "(", ")", ",", "_", "=", "0", ")",
+    ]
+    renamed = IRIS_FORK.replace("iris_model", "build_model")
+    signature = compute_signature(IRIS_CODE)
+
+    assert estimate_similarity(signature, compute_signature(renamed)) > 0.9
+    assert estimate_similarity(signature, compute_signature(MNIST_CODE)) < 0.5
+    assert set(lsh_buckets(signature)) & set(lsh_buckets(compute_signature(renamed)))
+
+
+@pytest.mark.asyncio
+async def test_similar_endpoint_finds_forks_in_other_codes(client: AsyncClient) -> None:
+    original = await _create_code(client, "iris", IRIS_CODE)
+    await _create_code(client, "mnist", MNIST_CODE)
+    fork = await _create_code(client, "iris_fork", IRIS_FORK)
+
+    response = await client.get(f"/codes/{fork['id']}/versions/{fork['versions'][0]['id']}/similar")
+
+    assert response.status_code == 200
+    similar = response.json()
+    assert [entry["code_version_id"] for entry in similar] == [original["versions"][0]["id"]]
+    assert similar[0]["code_id"] == original["id"]
+    assert similar[0]["similarity"] >= 0.8
+    assert similar[0]["parsed"] is False
+
+    response = await client.get(f"/codes/{original['id']}/versions/{fork['versions'][0]['id']}/similar")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_is_parsed_incrementally_without_the_llm(
+    client: AsyncClient, monkeypatch: MonkeyPatch
+) -> None:
+    monkeypatch.setattr("app.services.parsing_service.NEAR_DUPLICATE_REUSE", True)
+    # Keep the static fast path from answering either script
+    monkeypatch.setattr(llm_service, "FAST_PATH_MIN_CONFIDENCE", 2.0)
+    original = await _create_code(client, "iris", IRIS_CODE)
+    fork = await _create_code(client, "iris_fork", IRIS_FORK)
+
+    # The LLM answers the original with the blocks the static parser finds in it
+    iris_result, _ = analyze_code(IRIS_CODE)
+    server = FakeLLMServer(delay=0, content=iris_result).start()
+    try:
+        await llm_service.configure_llm_client(base_url=server.base_url)
+        response = await client.post(f"/parsing/code-versions/{original['versions'][0]['id']}", json={"name": "iris"})
+        assert response.status_code == 201
+        response = await client.post(f"/parsing/code-versions/{fork['versions'][0]['id']}", json={"name": "fork"})
+    finally:
+        await llm_service.configure_llm_client(base_url=None)
+        server.stop()
+
+    assert response.status_code == 201
+    assert server.request_count == 1
+    content = response.json()["versions"][0]["content"]
+    assert content["incremental"]["similarity"] >= 0.8
+    # Only the blocks around the changed defaults are re-derived
+    assert "parameter" in content["incremental"]["rederived_blocks"]
+    assert "model_block" in content["incremental"]["reused_blocks"]
+    assert "default=0.01" in content["parameter"]
+    assert content["model_block"].split() == iris_result["model_block"].split()
+    stats = (await client.get("/parsing/stats")).json()
+    assert (stats["llm"], stats["similar"]) == (1, 1)
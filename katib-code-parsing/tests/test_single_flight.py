@@ -0,0 +1,90 @@
+import asyncio
+from typing import AsyncGenerator, Generator
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from app.core import metrics
+from app.services import llm_service
+from app.services.single_flight import SingleFlight
+from tests.fake_llm import DEFAULT_CONTENT, FakeLLMServer
+
+
+@pytest.fixture(scope="function")
+def fake_llm() -> Generator[FakeLLMServer, None, None]:
+    server = FakeLLMServer(delay=1.0).start()
+    yield server
+    server.stop()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(session_client: AsyncClient, fake_llm: FakeLLMServer) -> AsyncGenerator[AsyncClient, None]:
+    await llm_service.configure_llm_client(base_url=fake_llm.base_url)
+    yield session_client
+    await llm_service.configure_llm_client(base_url=None)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_result_and_errors() -> None:
+    flight: SingleFlight[int] = SingleFlight()
+    calls = []
+
+    async def work() -> int:
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+    assert results == [(42, False)] + [(42, True)] * 4
+    assert len(calls) == 1
+    assert not flight.in_flight("key")
+
+    async def fail() -> int:
+        await asyncio.sleep(0.05)
+        raise ValueError("boom")
+
+    outcomes = await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_parses_of_same_content_make_one_llm_call(
+    client: AsyncClient, fake_llm: FakeLLMServer
+) -> None:
+    response = await client.post("/codes/", json={"name": "popular_code", "content": "print('hello')"})
+    code_version_id = response.json()["versions"][0]["id"]
+
+    responses = await asyncio.gather(
+        *(
+            client.post(f"/parsing/code-versions/{code_version_id}", json={"name": f"request {index}"})
+            for index in range(20)
+        )
+    )
+
+    assert fake_llm.request_count == 1
+    assert all(response.status_code == 201 for response in responses)
+    results = [response.json() for response in responses]
+    # Every caller still gets its own parsing result row
+    assert len({result["id"] for result in results}) == 20
+    assert all(result["versions"][0]["content"] == DEFAULT_CONTENT for result in results)
+    # Requests arriving after the LLM call finished are served by the parse cache instead
+    assert metrics.get_counter("parse.coalesced") + metrics.get_counter("parse.source.cache") == 19
+
+
+@pytest.mark.asyncio
+async def test_parses_with_different_deadlines_do_not_share_a_call(
+    client: AsyncClient, fake_llm: FakeLLMServer
+) -> None:
+    response = await client.post("/codes/", json={"name": "popular_code", "content": "print('hello')"})
+    code_version_id = response.json()["versions"][0]["id"]
+
+    patient, hurried = await asyncio.gather(
+        client.post(f"/parsing/code-versions/{code_version_id}", json={"name": "patient"}),
+        client.post(f"/parsing/code-versions/{code_version_id}", json={"name": "hurried", "deadline_ms": 100}),
+    )
+
+    # The short deadline is not held to the default one's call, nor the default one to the short deadline
+    assert patient.json()["versions"][0]["content"] == DEFAULT_CONTENT
+    assert hurried.json()["versions"][0]["content"].get("degraded") is True
+    assert metrics.get_counter("parse.coalesced") == 0
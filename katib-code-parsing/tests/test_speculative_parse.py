@@ -0,0 +1,103 @@
+import asyncio
+from typing import AsyncGenerator, Generator, List
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy.orm import sessionmaker
+
+from app.core.parse_context import PRIORITY_BATCH, PRIORITY_INTERACTIVE, PRIORITY_SPECULATIVE, ParseContext
+from app.services import llm_service, parsing_service
+from app.services.llm_scheduler import LLMScheduler
+from tests.fake_llm import DEFAULT_CONTENT, FakeLLMServer
+
+CODE = "print('speculative')"
+
+
+@pytest.fixture(scope="function")
+def fake_llm() -> Generator[FakeLLMServer, None, None]:
+    server = FakeLLMServer(delay=0.5).start()
+    yield server
+    server.stop()
+
+
+@pytest_asyncio.fixture(scope="function")
+async def session_factory(session_factory: sessionmaker, fake_llm: FakeLLMServer) -> AsyncGenerator[sessionmaker, None]:
+    await llm_service.configure_llm_client(base_url=fake_llm.base_url)
+    yield session_factory
+    await parsing_service.cancel_speculative_parses()
+    await llm_service.configure_llm_client(base_url=None)
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(session_client: AsyncClient) -> AsyncGenerator[AsyncClient, None]:
+    yield session_client
+
+
+@pytest.mark.asyncio
+async def test_parse_attaches_to_in_flight_speculative_parse(client: AsyncClient, fake_llm: FakeLLMServer) -> None:
+    response = await client.post("/codes/?speculative_parse=true", json={"name": "uploaded", "content": CODE})
+    assert response.status_code == 201
+    code_version_id = response.json()["versions"][0]["id"]
+    await asyncio.sleep(0.1)
+    assert fake_llm.request_count == 1
+
+    response = await client.post(f"/parsing/code-versions/{code_version_id}", json={"name": "explicit"})
+
+    assert response.status_code == 201
+    assert response.json()["versions"][0]["content"] == DEFAULT_CONTENT
+    assert fake_llm.request_count == 1
+    stats = (await client.get("/parsing/stats")).json()
+    assert (stats["speculative_started"], stats["speculative_attached"], stats["llm"]) == (1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_parse_reuses_finished_speculative_parse(client: AsyncClient, fake_llm: FakeLLMServer) -> None:
+    response = await client.post("/codes/", json={"name": "uploaded", "content": "print('first')"})
+    code_id = response.json()["id"]
+    response = await client.post(f"/codes/{code_id}/versions/?speculative_parse=true", json={"content": CODE})
+    assert response.status_code == 201
+    await asyncio.gather(*parsing_service._speculative_tasks)
+
+    response = await client.post(f"/parsing/code-versions/{response.json()['id']}", json={"name": "explicit"})
+
+    assert response.status_code == 201
+    assert response.json()["versions"][0]["content"] == DEFAULT_CONTENT
+    # Only the new version was pre-parsed, and the explicit parse did not call the LLM again
+    assert fake_llm.request_count == 1
+    stats = (await client.get("/parsing/stats")).json()
+    assert (stats["speculative_started"], stats["speculative_reused"], stats["cache"]) == (1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_speculative_parse_is_opt_in(client: AsyncClient, fake_llm: FakeLLMServer) -> None:
+    response = await client.post("/codes/", json={"name": "uploaded", "content": CODE})
+    assert response.status_code == 201
+    await asyncio.sleep(0.1)
+
+    assert parsing_service._speculative_tasks == set()
+    assert fake_llm.request_count == 0
+
+
+@pytest.mark.asyncio
+async def test_promoted_parse_moves_ahead_of_batch_requests() -> None:
+    scheduler = LLMScheduler(requests_per_minute=600)
+    scheduler._queue("model").requests.tokens = 0
+    speculative = ParseContext(priority=PRIORITY_SPECULATIVE)
+    order: List[str] = []
+
+    async def submit(name: str, priority: int, context: ParseContext) -> None:
+        await scheduler.acquire("model", tokens=1, priority=priority, context=context)
+        order.append(name)
+
+    tasks = [asyncio.create_task(submit(f"batch-{index}", PRIORITY_BATCH, ParseContext())) for index in range(2)]
+    tasks.append(asyncio.create_task(submit("speculative", PRIORITY_SPECULATIVE, speculative)))
+    await asyncio.sleep(0.01)
+    assert scheduler.stats()["queue_depth_by_priority"]["speculative"] == 1
+
+    await scheduler.promote(speculative, PRIORITY_INTERACTIVE)
+    assert scheduler.stats()["queue_depth_by_priority"]["interactive"] == 1
+    await asyncio.gather(*tasks)
+
+    assert order == ["speculative", "batch-0", "batch-1"]
+    assert speculative.priority == PRIORITY_INTERACTIVE
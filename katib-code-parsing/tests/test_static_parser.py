@@ -0,0 +1,65 @@
+import json
+import pytest
+from pathlib import Path
+from unittest.mock import AsyncMock
+from httpx import AsyncClient
+from pytest import MonkeyPatch
+
+
+from app.services import llm_service
+from app.services.static_parser import analyze_code
+
+EXAMPLES_DIR = Path(__file__).resolve().parent.parent / "examples"
+
+
+@pytest.mark.parametrize("example", ["iris", "mnist"])
+def test_analyze_code_matches_golden_examples(example: str) -> None:
+    code = (EXAMPLES_DIR / f"org_code_{example}.py").read_text()
+    golden = json.loads((EXAMPLES_DIR / f"parsing_result_{example}.json").read_text())
+
+    result, confidence = analyze_code(code)
+
+    assert confidence == 1.0
+    assert result["framework"] == golden["framework"]
+    assert result["metric"] == golden["metric"]
+    assert result["parameter"].count("parser.add_argument(") == golden["parameter"].count("parser.add_argument(")
+    for argument in ("--batch-size", "--learning-rate", "--epochs"):
+        assert argument in result["parameter"]
+    assert result["model_block"].startswith("import argparse")
+    assert "class MetricsPrint" in result["model_block"]
+    assert "def main()" not in result["model_block"]
+    assert result["data_block"].split("\n")[0].split("(")[0] == golden["data_block"].split("\n")[0].split("(")[0]
+    assert result["data_block"].rstrip().endswith("main()")
+
+
+def test_analyze_code_low_confidence_for_unstructured_scripts() -> None:
+    result, confidence = analyze_code("import numpy as np\nprint(np.arange(3))\n")
+    assert result is not None
+    assert confidence < 0.5
+    assert llm_service.parse_code_with_fast_path("import numpy as np\nprint(np.arange(3))\n") is None
+
+    result, confidence = analyze_code("def broken(:\n")
+    assert result is None
+    assert confidence == 0.0
+
+
+@pytest.mark.asyncio
+async def test_fast_path_bypasses_llm(client: AsyncClient, monkeypatch: MonkeyPatch) -> None:
+    mock_parse = AsyncMock(return_value={"name": "llm"})
+    monkeypatch.setattr("app.services.parsing_service.parse_code_with_llm", mock_parse)
+
+    code = (EXAMPLES_DIR / "org_code_mnist.py").read_text()
+    response = await client.post("/codes/", json={"name": "mnist", "content": code})
+    code_version_id = response.json()["versions"][0]["id"]
+
+    response = await client.post(f"/parsing/code-versions/{code_version_id}", json={"name": "Fast"})
+    assert response.status_code == 201
+    content = response.json()["versions"][0]["content"]
+    assert content["framework"] == "pytorch"
+    assert content["confidence"] == 1.0
+    mock_parse.assert_not_called()
+
+    response = await client.get("/parsing/stats")
+    assert response.status_code == 200
+    assert response.json()["fast_path"] == 1
+    assert response.json()["fast_path_share"] == 1.0
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Code, CodeVersion, ParsingResult, ParsingResultVersion
+from app.schemas.code import CodeCreate, CodeVersionCreate
+from app.schemas.parsing_result import ParsingResultVersionCreate
+from app.services.code_service import create_code
+from app.services.code_version_service import create_code_version, delete_code_version
+from app.services.parsing_service import create_parsing_result_version
+
+CONCURRENT_UPLOADS = 50
+
+
+@pytest.mark.asyncio
+async def test_concurrent_code_versions_get_distinct_numbers(session_factory: sessionmaker) -> None:
+    async with session_factory() as session:
+        code_id = (await create_code(session, CodeCreate(name="train", content="print(0)"))).id
+
+    async def upload(index: int) -> int:
+        async with session_factory() as session:
+            code_version = await create_code_version(session, code_id, CodeVersionCreate(content=f"print({index})"))
+            return code_version.version
+
+    numbers = await asyncio.gather(*(upload(index) for index in range(1, CONCURRENT_UPLOADS + 1)))
+    assert sorted(numbers) == list(range(2, CONCURRENT_UPLOADS + 2))
+
+    async with session_factory() as session:
+        assert (await session.get(Code, code_id)).latest_version == CONCURRENT_UPLOADS + 1
+        # Unknown codes get no number
+        assert await create_code_version(session, 999, CodeVersionCreate(content="print(1)")) is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_parsing_result_versions_get_distinct_numbers(session_factory: sessionmaker) -> None:
+    # The first version is inserted without the counter, as older rows were
+    async with session_factory() as session:
+        code = await create_code(session, CodeCreate(name="train", content="print(0)"))
+        db_result = ParsingResult(code_version_id=code.versions[0].id, name="train")
+        session.add(db_result)
+        await session.flush()
+        session.add(ParsingResultVersion(parsing_result_id=db_result.id, version=1, content={"name": "train"}))
+        await session.commit()
+        result_id = db_result.id
+
+    async def edit(index: int) -> int:
+        async with session_factory() as session:
+            version = ParsingResultVersionCreate(content={"name": f"train-{index}"})
+            return (await create_parsing_result_version(session, result_id, version)).version
+
+    numbers = await asyncio.gather(*(edit(index) for index in range(CONCURRENT_UPLOADS)))
+    assert sorted(numbers) == list(range(2, CONCURRENT_UPLOADS + 2))
+
+
+@pytest.mark.asyncio
+async def test_version_numbers_are_unique_and_not_reused(session_factory: sessionmaker) -> None:
+    async with session_factory() as session:
+        code_id = (await create_code(session, CodeCreate(name="train", content="print(0)"))).id
+        second = await create_code_version(session, code_id, CodeVersionCreate(content="print(1)"))
+        await delete_code_version(session, second.id)
+        # The number of the deleted version is not handed out again
+        third = await create_code_version(session, code_id, CodeVersionCreate(content="print(2)"))
+        assert third.version == 3
+
+        session.add(CodeVersion(code_id=code_id, version=3, content="print(3)"))
+        with pytest.raises(IntegrityError):
+            await session.commit()
+        await session.rollback()
+
+        versions = (await session.execute(select(CodeVersion.version).filter(CodeVersion.code_id == code_id))).scalars()
+        assert sorted(versions) == [1, 3]
@@ -0,0 +1,172 @@
+from pathlib import Path
+from typing import AsyncGenerator, List
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import CodeBlob, CodeVersion, ParsingResult, ParsingResultVersion
+from app.services import version_storage
+from app.services.version_storage import (
+    VersionedSession,
+    apply_delta,
+    configure_version_storage,
+    install_version_storage,
+    make_delta,
+)
+
+EXAMPLES_DIR = Path(__file__).resolve().parent.parent / "examples"
+IRIS_CODE = (EXAMPLES_DIR / "org_code_iris.py").read_text()
+
+@pytest_asyncio.fixture(scope="function")
+async def client(session_client: AsyncClient) -> AsyncGenerator[AsyncClient, None]:
+    configure_version_storage(delta_storage=True, keyframe_interval=4)
+    yield session_client
+    configure_version_storage()
+
+
+def _edit(content: str, version: int) -> str:
+    # A small edit per version, like a hyperparameter tweak
+    return content.replace("default=0.001", f"default=0.00{version}").replace("default=100", f"default={version}00")
+
+
+async def _upload_versions(client: AsyncClient, count: int) -> List[dict]:
+    code = (await client.post("/codes/", json={"name": "iris", "content": _edit(IRIS_CODE, 1)})).json()
+    for version in range(2, count + 1):
+        response = await client.post(f"/codes/{code['id']}/versions/", json={"content": _edit(IRIS_CODE, version)})
+        assert response.status_code == 201
+    return (await client.get(f"/codes/{code['id']}")).json()
+
+
+def test_delta_round_trip() -> None:
+    for base, target in [
+        (IRIS_CODE, _edit(IRIS_CODE, 2)),
+        (IRIS_CODE, IRIS_CODE + "print('done')"),
+        ("", IRIS_CODE),
+        (IRIS_CODE, ""),
+        ("a\nb", "a\nb\n"),
+    ]:
+        delta = make_delta(base, target)
+        assert delta is not None and apply_delta(base, delta) == target
+
+    delta = make_delta(IRIS_CODE, _edit(IRIS_CODE, 2))
+    assert delta is not None
+    assert sum(len(op) for op in delta if isinstance(op, str)) < len(IRIS_CODE) / 10
+
+    # Only the changed region counts against the limit
+    changed = IRIS_CODE.replace("default=0.001", "default=0.002")
+    assert make_delta(IRIS_CODE, changed, max_lines=1) is not None
+    assert make_delta(IRIS_CODE, _edit(IRIS_CODE, 2), max_lines=1) is None
+
+
+@pytest.mark.asyncio
+async def test_large_changes_are_stored_in_full(client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("app.services.version_storage.VERSION_DELTA_MAX_LINES", 1)
+    code = await _upload_versions(client, 3)
+    assert [version["content"] for version in code["versions"]] == [_edit(IRIS_CODE, v) for v in range(1, 4)]
+
+    stats = (await client.get("/codes/storage/stats")).json()
+    assert stats["blobs"] == 3 and stats["delta_blobs"] == 0
+
+
+@pytest.mark.asyncio
+async def test_code_versions_are_stored_as_delta_chains(client: AsyncClient, session_factory: sessionmaker) -> None:
+    code = await _upload_versions(client, 10)
+    assert [version["content"] for version in code["versions"]] == [_edit(IRIS_CODE, v) for v in range(1, 11)]
+
+    async with session_factory() as session:
+        blobs = (
+            await session.execute(
+                select(CodeBlob).join(CodeVersion, CodeVersion.content_hash == CodeBlob.sha256).order_by(CodeVersion.version)
+            )
+        ).scalars().all()
+        # A keyframe every 4 versions
+        assert [blob.chain_depth for blob in blobs] == [0, 1, 2, 3, 0, 1, 2, 3, 0, 1]
+        assert [blob.base_sha256 is None for blob in blobs] == [depth == 0 for depth in [0, 1, 2, 3, 0, 1, 2, 3, 0, 1]]
+        assert blobs[1].stored_size < blobs[0].stored_size / 4
+
+    stats = (await client.get("/codes/storage/stats")).json()
+    assert stats["delta_blobs"] == 7
+    assert stats["stored_bytes"] < stats["unique_bytes"] / 5
+
+    # Read back without the cache: the chains are loaded with one more statement
+    warm = await client.get(f"/codes/{code['id']}")
+    configure_version_storage(delta_storage=True, keyframe_interval=4)
+    cold = await client.get(f"/codes/{code['id']}")
+    assert cold.json() == warm.json() == code
+    assert int(cold.headers["X-DB-Queries"]) == int(warm.headers["X-DB-Queries"]) + 1
+
+
+@pytest.mark.asyncio
+async def test_deleting_versions_keeps_the_chain_readable(client: AsyncClient) -> None:
+    code = await _upload_versions(client, 6)
+    versions = code["versions"]
+
+    # The second version is the base of the third
+    response = await client.delete(f"/codes/{code['id']}/versions/{versions[1]['id']}")
+    assert response.status_code == 204
+    configure_version_storage(delta_storage=True, keyframe_interval=4)
+    remaining = (await client.get(f"/codes/{code['id']}")).json()["versions"]
+    assert [version["content"] for version in remaining] == [_edit(IRIS_CODE, v) for v in (1, 3, 4, 5, 6)]
+    assert (await client.get("/codes/storage/stats")).json()["blobs"] == 6
+
+    # Once nothing uses the chain, it is deleted with its bases
+    assert (await client.delete(f"/codes/{code['id']}")).status_code == 204
+    assert (await client.get("/codes/storage/stats")).json()["blobs"] == 0
+
+
+@pytest.mark.asyncio
+async def test_parsing_result_versions_are_stored_as_deltas(client: AsyncClient, session_factory: sessionmaker) -> None:
+    code = (await client.post("/codes/", json={"name": "iris", "content": IRIS_CODE})).json()
+    content = {
+        "name": "iris",
+        "framework": "sklearn",
+        "metric": ["accuracy"],
+        "parameter": {"lr": {"type": "double", "default": 0.001}, "epochs": {"type": "int", "default": 100}},
+    }
+    async with session_factory() as session:
+        db_result = ParsingResult(code_version_id=code["versions"][0]["id"], name="iris")
+        session.add(db_result)
+        await session.flush()
+        session.add(ParsingResultVersion(parsing_result_id=db_result.id, version=1, content=content))
+        await session.commit()
+        result_id = db_result.id
+
+    contents = [content]
+    for version in range(2, 7):
+        content = {**content, "parameter": {**content["parameter"], "epochs": {"type": "int", "default": version}}}
+        response = await client.post(f"/parsing/results/{result_id}/versions", json={"content": content})
+        assert response.status_code == 201
+        assert response.json()["content"] == content
+        contents.append(content)
+
+    async with session_factory() as session:
+        table = ParsingResultVersion.__table__
+        rows = (await session.execute(select(table.c.content, table.c.chain_depth).order_by(table.c.version))).all()
+        assert [depth for _, depth in rows] == [0, 1, 2, 3, 0, 1]
+        assert [isinstance(stored, list) for stored, _ in rows] == [False, True, True, True, False, True]
+
+    configure_version_storage(delta_storage=True, keyframe_interval=4)
+    result = (await client.get(f"/parsing/results/{result_id}")).json()
+    assert [version["content"] for version in result["versions"]] == contents
+
+    # Deleting a base stores the version after it in full
+    version_ids = [version["id"] for version in result["versions"]]
+    assert (await client.delete(f"/parsing/results/{result_id}/versions/{version_ids[1]}")).status_code == 204
+    configure_version_storage(delta_storage=True, keyframe_interval=4)
+    result = (await client.get(f"/parsing/results/{result_id}")).json()
+    assert [version["content"] for version in result["versions"]] == contents[:1] + contents[2:]
+    async with session_factory() as session:
+        rebased = await session.get(ParsingResultVersion, version_ids[2])
+        assert (rebased.base_version_id, rebased.chain_depth) == (None, 0)
+
+
+def test_hooks_apply_only_to_installed_session_factories(session_factory: sessionmaker) -> None:
+    assert not event.contains(Session, "before_flush", version_storage._store_versions)
+    assert event.contains(VersionedSession, "before_flush", version_storage._store_versions)
+    install_version_storage(session_factory)
+    assert session_factory.kw["sync_session_class"] is VersionedSession
+    assert not isinstance(sessionmaker(class_=Session)(), VersionedSession)